@@ -10,7 +10,9 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'aeries-importer=main:run_aeries_importer'
+            'aeries-importer=main:run_aeries_importer',
+            'aeries-importer-plan=main:plan_aeries_import',
+            'aeries-importer-apply=main:apply_aeries_import'
         ],
     },
 )
\ No newline at end of file
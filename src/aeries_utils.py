@@ -1,16 +1,27 @@
+import codecs
 import concurrent
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from itertools import zip_longest
-from typing import Optional, List
+from threading import Lock
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Callable, Optional, List, TypeVar, Union
 
 import click
 from arrow import Arrow
 from bs4 import BeautifulSoup
 from curl_cffi import requests
 
-from constants import MILPITAS_SCHOOL_CODE
+from constants import (AERIES_READ_BACKEND_API, DEFAULT_AERIES_READ_BACKEND, DEFAULT_HTML_PARSER,
+                       DEFAULT_MAX_STUDENT_WORKERS, DEFAULT_MAX_WORKERS, DEFAULT_MAX_WRITE_WORKERS,
+                       MILPITAS_SCHOOL_CODE)
+from html_parsing import HtmlTarget, parse_html
+
+if TYPE_CHECKING:
+    from write_journal import WriteJournal
 
 GRADEBOOK_URL = 'https://milpitasusd.aeries.net/teacher/gradebook'
 GRADEBOOK_HTML_ID = 'ValidGradebookList'
@@ -24,7 +35,16 @@ SCORES_BY_CLASS_URL = 'https://milpitasusd.aeries.net/teacher/gradebook/{gradebo
 SCORES_BY_CLASS_ASSIGNMENT_INFO_TABLE_CLASS_NAME = 'assignment-header'
 SCORES_BY_CLASS_ASSIGNMENT_NAME_CLASS_NAME = 'scores-by-class-override'
 SCORES_BY_CLASS_STUDENT_INFO_TABLE_CLASS_NAME = 'students'
+SCORES_BY_CLASS_SUBMISSIONS_TABLE_CLASS_NAME = 'assignments'
 SCORES_BY_STUDENT_URL = 'https://milpitasusd.aeries.net/teacher/gradebook/{gradebook_id}/ScoresByStudent/{student_num}/{MILPITAS_SCHOOL_CODE}'
+OVERALL_PERCENT_DISPLAY_ID = 'overallPercentDisplay'
+OVERALL_PERCENT_DISPLAY_PATTERN = re.compile(
+    r'<div\b[^>]*\bid\s*=\s*["\']?' + OVERALL_PERCENT_DISPLAY_ID + r'\b[^>]*>\s*([0-9]+(?:\.[0-9]+)?)\s*%\s*</div>',
+    re.IGNORECASE
+)
+# The overall percent element is short, so only this much of the already-scanned page needs to be searched again
+OVERALL_PERCENT_DISPLAY_MAX_LENGTH = 512
+STREAM_CHUNK_SIZE = 8192
 STUDENT_ID_TAG_NAME = 'data-stuid'
 STUDENT_NUMBER_TAG_NAME = 'data-sn'
 SCORE_TAG_NAME = 'data-original-value'
@@ -38,6 +58,9 @@ ASSIGNMENT_NUMBER_TAG_NAME = 'data-an'
 ASSIGNMENT_SCORES_ROW = 'scores row'
 ASSIGNMENT_TOTAL_SCORE_TITLE = '# Correct Possible'
 ASSIGNMENT_SUBMISSION_CLASS_ROW_TAG_NAME = 'cell text-center hidden-text cell-by-class'
+BLANK_MARK = ''
+MISSING_MARK = 'MI'
+NOT_APPLICABLE_MARK = 'N/A'
 
 GRADEBOOK_INFORMATION_URL = 'https://milpitasusd.aeries.net/teacher/gradebook/{gradebook_id}/manage'
 WEIGHT_CATEGORY_TABLE_ID = 'manageManageCategoriesTable'
@@ -50,6 +73,41 @@ CREATE_ASSIGNMENT_URL = 'https://milpitasusd.aeries.net/teacher/gradebook/manage
 UPDATE_ASSIGNMENT_GRADE_URL = 'https://milpitasusd.aeries.net/teacher/api/schools/{school_code}/gradebooks/{gradebook_id}/students/'\
                               '{student_number}/{school_code}/scores/{assignment_number}'
 
+# The teacher API returns the same gradebook data as the scoresByClass page, as JSON lists
+GRADEBOOK_API_URL = 'https://milpitasusd.aeries.net/teacher/api/schools/{school_code}/gradebooks/{gradebook_id}'
+GRADEBOOK_STUDENTS_API_URL = GRADEBOOK_API_URL + '/students'
+GRADEBOOK_ASSIGNMENTS_API_URL = GRADEBOOK_API_URL + '/assignments'
+GRADEBOOK_SCORES_API_URL = GRADEBOOK_API_URL + '/scores'
+API_SCHOOL_CODE_FIELD = 'SchoolCode'
+API_STUDENT_NUMBER_FIELD = 'StudentNumber'
+API_STUDENT_ID_FIELD = 'PermanentID'
+API_ASSIGNMENT_NUMBER_FIELD = 'AssignmentNumber'
+API_ASSIGNMENT_DESCRIPTION_FIELD = 'Description'
+API_ASSIGNMENT_POINT_TOTAL_FIELD = 'NumberCorrectPossible'
+API_ASSIGNMENT_CATEGORY_FIELD = 'Category'
+API_MARK_FIELD = 'Mark'
+
+GRADEBOOK_PAGE_TARGETS = (HtmlTarget(tag_name=None, attribute='id', value=GRADEBOOK_HTML_ID),
+                          HtmlTarget(tag_name=None, attribute='id', value=LIST_VIEW_ID))
+SCORES_BY_CLASS_TARGETS = (HtmlTarget(tag_name='table', attribute='class', value=SCORES_BY_CLASS_STUDENT_INFO_TABLE_CLASS_NAME),
+                           HtmlTarget(tag_name='table', attribute='class', value=SCORES_BY_CLASS_ASSIGNMENT_INFO_TABLE_CLASS_NAME),
+                           HtmlTarget(tag_name='table', attribute='class', value=SCORES_BY_CLASS_SUBMISSIONS_TABLE_CLASS_NAME))
+GRADEBOOK_INFORMATION_TARGETS = (HtmlTarget(tag_name='table', attribute='id', value=WEIGHT_CATEGORY_TABLE_ID),
+                                 HtmlTarget(tag_name='table', attribute='class', value=END_TERMS_TABLE_ID))
+ASSIGNMENT_FORM_TARGETS = (HtmlTarget(tag_name='form'),)
+SCORES_BY_STUDENT_TARGETS = (HtmlTarget(tag_name='div', attribute='id', value=OVERALL_PERCENT_DISPLAY_ID),)
+
+DEFAULT_STUDENT_PAGE_TIMEOUT_SECONDS = 30
+GRADE_UPDATE_MAX_ATTEMPTS = 3
+GRADE_UPDATE_RETRY_BACKOFF_SECONDS = 0.5
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+ASSIGNMENT_CREATE = 'create'
+ASSIGNMENT_PATCH = 'patch'
+FORM_TOKEN_TTL_SECONDS = 600
+STALE_FORM_TOKEN_STATUS_CODES = frozenset({400, 403})
+
+T = TypeVar('T')
+
 
 @dataclass(frozen=True)
 class AeriesAssignmentData:
@@ -65,6 +123,26 @@ class AssignmentPatchData:
     grade: Optional[float]
 
 
+@dataclass(frozen=True)
+class GradeUpdateFailure:
+    gradebook_id: str
+    patch_data: AssignmentPatchData
+    reason: str
+
+
+@dataclass(frozen=True)
+class GradeUpdateSummary:
+    succeeded: dict[str, list[AssignmentPatchData]]
+    failed: list[GradeUpdateFailure]
+
+
+@dataclass(frozen=True)
+class OverallGradeFailure:
+    period: int
+    student_id: int
+    reason: str
+
+
 @dataclass(frozen=True)
 class AeriesCategory:
     name: str
@@ -78,11 +156,42 @@ class AeriesClassroomData:
     end_term_dates: dict[str, Arrow]
 
 
+@dataclass(frozen=True)
+class AssignmentWrite:
+    # ASSIGNMENT_CREATE or ASSIGNMENT_PATCH
+    action: str
+    gradebook_number: str
+    assignment_id: int
+    assignment_name: str
+    point_total: int
+    category: AeriesCategory
+    end_term_date: Arrow
+
+
 class AeriesData:
 
-    def __init__(self, periods: List[int], s_cookie: str):
+    def __init__(self,
+                 periods: List[int],
+                 s_cookie: str,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_write_workers: int = DEFAULT_MAX_WRITE_WORKERS,
+                 html_parser: str = DEFAULT_HTML_PARSER,
+                 max_student_workers: int = DEFAULT_MAX_STUDENT_WORKERS,
+                 student_page_timeout: float = DEFAULT_STUDENT_PAGE_TIMEOUT_SECONDS,
+                 stream_student_pages: bool = True,
+                 read_backend: str = DEFAULT_AERIES_READ_BACKEND,
+                 write_journal: Optional['WriteJournal'] = None):
         self.periods = periods
         self.s_cookie = s_cookie
+        self.max_workers = max_workers
+        self.max_write_workers = max_write_workers
+        self.max_student_workers = max_student_workers
+        self.student_page_timeout = student_page_timeout
+        self.stream_student_pages = stream_student_pages
+        self.html_parser = html_parser
+        self.read_backend = read_backend
+        # If supplied, every write to Aeries is journaled before it is sent and acknowledged once Aeries accepts it
+        self.write_journal = write_journal
         self.request_verification_token = ''
         self.periods_to_gradebook_ids = {}
         self.periods_to_student_ids_to_student_nums = {}
@@ -90,6 +199,16 @@ class AeriesData:
         self.periods_to_assignment_submissions = {}
         self.periods_to_gradebook_information = {}
         self.periods_to_student_ids_to_overall_grades = {}
+        self.overall_grade_failures: list[OverallGradeFailure] = []
+        self.gradebook_ids_to_scores_by_class_pages: dict[str, BeautifulSoup] = {}
+        # Gradebooks the teacher API could not be read for, which are read from their scoresByClass page instead
+        self.api_fallback_gradebook_ids: set[str] = set()
+        # gradebook number -> (form request verification token, monotonic time it was fetched)
+        self.gradebook_numbers_to_form_tokens: dict[str, tuple[str, float]] = {}
+        # Each gradebook's token is fetched under its own lock, so that gradebooks fetch their tokens concurrently.
+        # form_token_lock only guards creating those locks.
+        self.gradebook_numbers_to_form_token_locks: dict[str, Lock] = {}
+        self.form_token_lock = Lock()
         self.session = requests.Session()
         self.session.cookies.set("s", self.s_cookie, domain="milpitasusd.aeries.net")  # Must happen before warmup call to prevent gradebook stickiness in subsequent calls
 
@@ -100,7 +219,7 @@ class AeriesData:
         headers = {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
                    'Cookie': f's={self.s_cookie}'}
         response = requests.get(GRADEBOOK_URL, headers=headers)
-        beautiful_soup = BeautifulSoup(response.text, 'html.parser')
+        beautiful_soup = parse_html(response.text, parser=self.html_parser, targets=GRADEBOOK_PAGE_TARGETS)
         self._get_periods_to_gradebook_and_term(beautiful_soup=beautiful_soup)
 
         beautiful_soup.find(id=GRADEBOOK_HTML_ID)
@@ -125,7 +244,7 @@ class AeriesData:
         }
 
         response = self.session.get(GRADEBOOK_URL, headers=headers, impersonate=BROWSER_NAME)
-        beautiful_soup = BeautifulSoup(response.text, 'html.parser')
+        beautiful_soup = parse_html(response.text, parser=self.html_parser, targets=GRADEBOOK_PAGE_TARGETS)
         self.periods_to_gradebook_ids = self._get_periods_to_gradebook_and_term(beautiful_soup=beautiful_soup)
 
     def _get_periods_to_gradebook_and_term(self, beautiful_soup: BeautifulSoup) -> dict[int, str]:
@@ -166,6 +285,39 @@ class AeriesData:
         that are used in Google Classroom.
         """
         click.echo('Fetching Student Numbers (not IDs!) from Aeries...')
+        self.periods_to_student_ids_to_student_nums.update(self._run_for_each_gradebook(
+            lambda gradebook_id: AeriesData._get_student_ids_to_student_nums(
+                beautiful_soup=self._get_scores_by_class_page(gradebook_id=gradebook_id)
+            )
+        ))
+
+    def _run_for_each_gradebook(self, function: Callable[[str], T]) -> dict[int, T]:
+        """
+        Runs the function on the gradebook id of every period, with at most max_workers periods in flight at once.
+
+        :param function: Function taking a gradebook id. Each gradebook is handled by exactly one worker.
+        :return: Mapping of period to the function's result, in the order of periods_to_gradebook_ids regardless of
+                 which period finished first.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            periods_to_futures = {}
+            for period, gradebook_id in self.periods_to_gradebook_ids.items():
+                click.echo(f'\tProcessing Period {period}...')
+                periods_to_futures[period] = executor.submit(function, gradebook_id)
+
+            return {period: future.result() for period, future in periods_to_futures.items()}
+
+    def _get_scores_by_class_page(self, gradebook_id: str) -> BeautifulSoup:
+        """
+        Returns the parsed scoresByClass page for the gradebook. The student, assignment, and submission extractors
+        all read from this page, so it is fetched and parsed at most once per run and shared between them.
+
+        :param gradebook_id: Gradebook id and term of the class, e.g. '4532451/S'.
+        :return: The parsed scoresByClass page.
+        """
+        if gradebook_id in self.gradebook_ids_to_scores_by_class_pages:
+            return self.gradebook_ids_to_scores_by_class_pages[gradebook_id]
+
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -180,14 +332,11 @@ class AeriesData:
             'Cookie': f's={self.s_cookie}'
         }
 
-        for period, gradebook_id in self.periods_to_gradebook_ids.items():
-            click.echo(f'\tProcessing Period {period}...')
-            response = self.session.get(SCORES_BY_CLASS_URL.format(gradebook_id=gradebook_id), headers=headers, impersonate=BROWSER_NAME)
-            beautiful_soup = BeautifulSoup(response.text, 'html.parser')
+        response = self.session.get(SCORES_BY_CLASS_URL.format(gradebook_id=gradebook_id), headers=headers, impersonate=BROWSER_NAME)
+        beautiful_soup = parse_html(response.text, parser=self.html_parser, targets=SCORES_BY_CLASS_TARGETS)
+        self.gradebook_ids_to_scores_by_class_pages[gradebook_id] = beautiful_soup
 
-            self.periods_to_student_ids_to_student_nums[period] = AeriesData._get_student_ids_to_student_nums(
-                beautiful_soup=beautiful_soup
-            )
+        return beautiful_soup
 
     @staticmethod
     def _get_student_ids_to_student_nums(beautiful_soup: BeautifulSoup) -> dict[int, int]:
@@ -208,28 +357,11 @@ class AeriesData:
         and category.
         """
         click.echo('Fetching Assignment information from Aeries...')
-        headers = {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-            'Referer': 'https://milpitasusd.aeries.net/teacher/Default.aspx',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'same-origin',
-            'Sec-Fetch-User': '?1',
-            'Priority': 'u=0,i',
-            'Cookie': f's={self.s_cookie}'
-        }
-
-        for period, gradebook_id in self.periods_to_gradebook_ids.items():
-            click.echo(f'\tProcessing Period {period}...')
-            response = self.session.get(SCORES_BY_CLASS_URL.format(gradebook_id=gradebook_id), headers=headers, impersonate=BROWSER_NAME)
-            beautiful_soup = BeautifulSoup(response.text, 'html.parser')
-
-            self.periods_to_assignment_information[period] = AeriesData._get_assignment_information(
-                beautiful_soup=beautiful_soup
+        self.periods_to_assignment_information.update(self._run_for_each_gradebook(
+            lambda gradebook_id: AeriesData._get_assignment_information(
+                beautiful_soup=self._get_scores_by_class_page(gradebook_id=gradebook_id)
             )
+        ))
 
     @staticmethod
     def _get_assignment_information(beautiful_soup: BeautifulSoup) -> dict[str, AeriesAssignmentData]:
@@ -280,28 +412,11 @@ class AeriesData:
         Returns a mapping of period -> assignment_id -> student_num -> score
         """
         click.echo('Fetching Assignment submissions from Aeries...')
-        headers = {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-            'Referer': 'https://milpitasusd.aeries.net/teacher/Default.aspx',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'same-origin',
-            'Sec-Fetch-User': '?1',
-            'Priority': 'u=0,i',
-            'Cookie': f's={self.s_cookie}'
-        }
-
-        for period, gradebook_id in self.periods_to_gradebook_ids.items():
-            click.echo(f'\tProcessing Period {period}...')
-            response = self.session.get(SCORES_BY_CLASS_URL.format(gradebook_id=gradebook_id), headers=headers, impersonate=BROWSER_NAME)
-            beautiful_soup = BeautifulSoup(response.text, 'html.parser')
-
-            self.periods_to_assignment_submissions[period] = AeriesData._get_assignment_submissions_information(
-                beautiful_soup=beautiful_soup
+        self.periods_to_assignment_submissions.update(self._run_for_each_gradebook(
+            lambda gradebook_id: AeriesData._get_assignment_submissions_information(
+                beautiful_soup=self._get_scores_by_class_page(gradebook_id=gradebook_id)
             )
+        ))
 
     @staticmethod
     def _get_assignment_submissions_information(beautiful_soup: BeautifulSoup) -> dict[int, dict[int, str]]:
@@ -310,7 +425,7 @@ class AeriesData:
         """
         assignment_submissions = {}
         for tag in (beautiful_soup
-                    .find('table', class_='assignments')
+                    .find('table', class_=SCORES_BY_CLASS_SUBMISSIONS_TABLE_CLASS_NAME)
                     .find_all('td', attrs={'data-stusc': MILPITAS_SCHOOL_CODE})):
             assignment_number = int(tag.get(ASSIGNMENT_NUMBER_TAG_NAME))
 
@@ -324,6 +439,125 @@ class AeriesData:
 
         return assignment_submissions
 
+    def extract_student_ids_to_student_nums_from_api(self) -> None:
+        """
+        Like extract_student_ids_to_student_nums_from_html, but reads each gradebook's roster from the teacher API.
+        """
+        click.echo('Fetching Student Numbers (not IDs!) from Aeries...')
+        self.periods_to_student_ids_to_student_nums.update(self._run_for_each_gradebook(
+            lambda gradebook_id: self._read_gradebook_from_api(
+                gradebook_id=gradebook_id,
+                url=GRADEBOOK_STUDENTS_API_URL,
+                parse_json=AeriesData._get_student_ids_to_student_nums_from_api,
+                parse_html=AeriesData._get_student_ids_to_student_nums
+            )
+        ))
+
+    @staticmethod
+    def _get_student_ids_to_student_nums_from_api(students: list[dict]) -> dict[int, int]:
+        return {int(student[API_STUDENT_ID_FIELD]): int(student[API_STUDENT_NUMBER_FIELD]) for student in students}
+
+    def extract_assignment_information_from_api(self) -> None:
+        """
+        Like extract_assignment_information_from_html, but reads each gradebook's assignments from the teacher API.
+        """
+        click.echo('Fetching Assignment information from Aeries...')
+        self.periods_to_assignment_information.update(self._run_for_each_gradebook(
+            lambda gradebook_id: self._read_gradebook_from_api(
+                gradebook_id=gradebook_id,
+                url=GRADEBOOK_ASSIGNMENTS_API_URL,
+                parse_json=AeriesData._get_assignment_information_from_api,
+                parse_html=AeriesData._get_assignment_information
+            )
+        ))
+
+    @staticmethod
+    def _get_assignment_information_from_api(assignments: list[dict]) -> dict[str, AeriesAssignmentData]:
+        return {
+            assignment[API_ASSIGNMENT_DESCRIPTION_FIELD]: AeriesAssignmentData(
+                id=int(assignment[API_ASSIGNMENT_NUMBER_FIELD]),
+                point_total=int(assignment[API_ASSIGNMENT_POINT_TOTAL_FIELD]),
+                category=assignment[API_ASSIGNMENT_CATEGORY_FIELD]
+            )
+            for assignment in assignments
+        }
+
+    def extract_assignment_submissions_from_api(self) -> None:
+        """
+        Like extract_assignment_submissions_from_html, but reads each gradebook's scores from the teacher API.
+        """
+        click.echo('Fetching Assignment submissions from Aeries...')
+        self.periods_to_assignment_submissions.update(self._run_for_each_gradebook(
+            lambda gradebook_id: self._read_gradebook_from_api(
+                gradebook_id=gradebook_id,
+                url=GRADEBOOK_SCORES_API_URL,
+                parse_json=AeriesData._get_assignment_submissions_information_from_api,
+                parse_html=AeriesData._get_assignment_submissions_information
+            )
+        ))
+
+    @staticmethod
+    def _get_assignment_submissions_information_from_api(scores: list[dict]) -> dict[int, dict[int, str]]:
+        """
+        Returns a mapping of assignment_id -> student_num -> score, with the scores formatted as the scoresByClass page
+        shows them.
+        """
+        assignment_submissions = {}
+        for score in scores:
+            if int(score[API_SCHOOL_CODE_FIELD]) != MILPITAS_SCHOOL_CODE:
+                continue
+
+            mark = score[API_MARK_FIELD]
+            if mark is None:
+                mark = BLANK_MARK
+            elif not isinstance(mark, str):
+                mark = str(int(mark)) if float(mark).is_integer() else str(mark)
+
+            (assignment_submissions
+             .setdefault(int(score[API_ASSIGNMENT_NUMBER_FIELD]), {})[int(score[API_STUDENT_NUMBER_FIELD])]) = mark
+
+        return assignment_submissions
+
+    def _read_gradebook_from_api(self,
+                                 gradebook_id: str,
+                                 url: str,
+                                 parse_json: Callable[[list[dict]], T],
+                                 parse_html: Callable[[BeautifulSoup], T]) -> T:
+        """
+        Reads gradebook data from the teacher API. If the API cannot be read or its response is not in the expected
+        shape, the gradebook falls back to its scoresByClass page for this and every later read.
+
+        :param url: The teacher API URL template for the data.
+        :param parse_json: Parses the API's JSON response.
+        :param parse_html: Parses the same data from the scoresByClass page.
+        """
+        if gradebook_id not in self.api_fallback_gradebook_ids:
+            try:
+                return parse_json(self._get_gradebook_api_json(gradebook_id=gradebook_id, url=url))
+            except (requests.RequestsError, ValueError, KeyError, TypeError) as e:
+                click.echo(f'\tCould not read gradebook {gradebook_id} from the Aeries API, reading its scoresByClass '
+                           f'page instead: {e!r}')
+                self.api_fallback_gradebook_ids.add(gradebook_id)
+
+        return parse_html(self._get_scores_by_class_page(gradebook_id=gradebook_id))
+
+    def _get_gradebook_api_json(self, gradebook_id: str, url: str) -> list[dict]:
+        headers = {
+            'accept': 'application/json',
+            'cookie': f's={self.s_cookie}'
+        }
+
+        response = self.session.get(url.format(school_code=MILPITAS_SCHOOL_CODE, gradebook_id=gradebook_id),
+                                    headers=headers,
+                                    impersonate=BROWSER_NAME)
+        if response.status_code != 200:
+            raise ValueError(f'Aeries API request has unexpected status code: {response.status_code}')
+
+        contents = response.json()
+        if not isinstance(contents, list):
+            raise ValueError(f'Expected a list from the Aeries API, but got {type(contents).__name__}')
+        return contents
+
     def extract_gradebook_information_from_html(self) -> None:
         """
         Fetch the gradebook information from Aeries, which includes the weights for each category
@@ -347,20 +581,21 @@ class AeriesData:
             'Cookie': f's={self.s_cookie}'
         }
 
-        for period, gradebook_id in self.periods_to_gradebook_ids.items():
-            click.echo(f'\tProcessing Period {period}...')
+        def fetch_gradebook_information(gradebook_id: str) -> tuple[AeriesClassroomData, str]:
             response = self.session.get(GRADEBOOK_INFORMATION_URL.format(gradebook_id=gradebook_id),
                                         headers=headers,
                                         impersonate=BROWSER_NAME)
-            beautiful_soup = BeautifulSoup(response.text, 'html.parser')
+            beautiful_soup = parse_html(response.text, parser=self.html_parser, targets=GRADEBOOK_INFORMATION_TARGETS)
             categories = AeriesData._get_aeries_category_information(beautiful_soup=beautiful_soup)
             end_term_dates = AeriesData._get_aeries_end_term_information(beautiful_soup=beautiful_soup)
 
-            self.periods_to_gradebook_information[period] = AeriesClassroomData(
-                categories=categories,
-                end_term_dates=end_term_dates
-            )
-            self.request_verification_token = response.cookies.get('__RequestVerificationToken_L3RlYWNoZXI1')
+            return (AeriesClassroomData(categories=categories, end_term_dates=end_term_dates),
+                    response.cookies.get('__RequestVerificationToken_L3RlYWNoZXI1'))
+
+        for period, (gradebook_information, request_verification_token) in self._run_for_each_gradebook(
+                fetch_gradebook_information).items():
+            self.periods_to_gradebook_information[period] = gradebook_information
+            self.request_verification_token = request_verification_token
 
     @staticmethod
     def _get_aeries_category_information(beautiful_soup: BeautifulSoup) -> dict[str, AeriesCategory]:
@@ -418,8 +653,6 @@ class AeriesData:
         :param end_term_date: End term date for the class.
         :return: AeriesAssignmentData object with the assignment id, point total, and category.
         """
-        form_request_verification_token = self._get_form_request_verification_token(gradebook_number=gradebook_number)
-
         timestamp = Arrow.now()
         if timestamp >= end_term_date:
             timestamp = end_term_date.shift(days=-1)
@@ -441,7 +674,6 @@ class AeriesData:
             'Cookie': f'__RequestVerificationToken_L3RlYWNoZXI1={self.request_verification_token}; s={self.s_cookie}'
         }
         data = {
-            '__RequestVerificationToken': form_request_verification_token,
             'Assignment.GradebookNumber': gradebook_number,
             'SourceGradebook.SchoolCode': MILPITAS_SCHOOL_CODE,
             'SourceGradebook.Name': 'blah',
@@ -457,13 +689,25 @@ class AeriesData:
             'Assignment.ScoresVisibleToParents': True
         }
 
-        response = self.session.post(CREATE_ASSIGNMENT_URL,
-                                     params={'gn': gradebook_number, 'an': assignment_id},
-                                     data=data,
-                                     headers=headers,
-                                     impersonate=BROWSER_NAME)
+        assignment_write = AssignmentWrite(action=ASSIGNMENT_CREATE,
+                                           gradebook_number=gradebook_number,
+                                           assignment_id=assignment_id,
+                                           assignment_name=assignment_name,
+                                           point_total=point_total,
+                                           category=category,
+                                           end_term_date=end_term_date)
+        if self.write_journal is not None:
+            self.write_journal.plan_assignment_write(assignment_write=assignment_write)
+
+        response = self._send_assignment_form(send=self.session.post,
+                                              gradebook_number=gradebook_number,
+                                              assignment_id=assignment_id,
+                                              data=data,
+                                              headers=headers)
         if response.status_code != 200:
             raise ValueError(f'Assignment creation has unexpected status code: {response.status_code}')
+        if self.write_journal is not None:
+            self.write_journal.acknowledge_assignment_write(assignment_write=assignment_write)
 
         return AeriesAssignmentData(id=assignment_id,
                                     point_total=point_total,
@@ -486,8 +730,6 @@ class AeriesData:
         :param end_term_date: End term date for the class.
         :return: AeriesAssignmentData object with the assignment id, point total, and category.
         """
-        form_request_verification_token = self._get_form_request_verification_token(gradebook_number=gradebook_number)
-
         timestamp = Arrow.now()
         if timestamp >= end_term_date:
             timestamp = end_term_date.shift(days=-1)
@@ -507,7 +749,6 @@ class AeriesData:
             'Cookie': f'__RequestVerificationToken_L3RlYWNoZXI1={self.request_verification_token}; s={self.s_cookie}'
         }
         data = {
-            '__RequestVerificationToken': form_request_verification_token,
             'Assignment.GradebookNumber': gradebook_number,
             'SourceGradebook.SchoolCode': MILPITAS_SCHOOL_CODE,
             'SourceGradebook.Name': 'blah',
@@ -523,68 +764,211 @@ class AeriesData:
             'Assignment.ScoresVisibleToParents': True
         }
 
-        response = self.session.put(CREATE_ASSIGNMENT_URL,
-                                    params={'gn': gradebook_number, 'an': assignment_id},
-                                    data=data,
-                                    headers=headers,
-                                    impersonate=BROWSER_NAME)
+        assignment_write = AssignmentWrite(action=ASSIGNMENT_PATCH,
+                                           gradebook_number=gradebook_number,
+                                           assignment_id=assignment_id,
+                                           assignment_name=assignment_name,
+                                           point_total=point_total,
+                                           category=category,
+                                           end_term_date=end_term_date)
+        if self.write_journal is not None:
+            self.write_journal.plan_assignment_write(assignment_write=assignment_write)
+
+        response = self._send_assignment_form(send=self.session.put,
+                                              gradebook_number=gradebook_number,
+                                              assignment_id=assignment_id,
+                                              data=data,
+                                              headers=headers)
 
         if response.status_code != 200:
             raise ValueError(f'Assignment update has unexpected status code: {response.status_code}')
+        if self.write_journal is not None:
+            self.write_journal.acknowledge_assignment_write(assignment_write=assignment_write)
 
         return AeriesAssignmentData(id=assignment_id,
                                     point_total=point_total,
                                     category=category.name)
 
-    def _get_form_request_verification_token(self, gradebook_number: str) -> str:
-        params = {'gn': gradebook_number,
-                  'an': 0}
-        headers = {'Cookie': f'__RequestVerificationToken_L3RlYWNoZXI1={self.request_verification_token}; s={self.s_cookie}'}
+    def send_assignment_write(self, assignment_write: AssignmentWrite) -> AeriesAssignmentData:
+        """
+        Sends an assignment create or update, e.g. one from a patch plan or one a previous import journaled but never
+        had acknowledged.
+        """
+        send_assignment_write = (self.create_aeries_assignment if assignment_write.action == ASSIGNMENT_CREATE
+                                 else self.patch_aeries_assignment)
+        return send_assignment_write(gradebook_number=assignment_write.gradebook_number,
+                                     assignment_id=assignment_write.assignment_id,
+                                     assignment_name=assignment_write.assignment_name,
+                                     point_total=assignment_write.point_total,
+                                     category=assignment_write.category,
+                                     end_term_date=assignment_write.end_term_date)
+
+    def _send_assignment_form(self,
+                              send: Callable[..., requests.Response],
+                              gradebook_number: str,
+                              assignment_id: int,
+                              data: dict,
+                              headers: dict[str, str]) -> requests.Response:
+        """
+        Submits the assignment form with the cached form token for the gradebook. If Aeries rejects the token, it is
+        refreshed and the form is submitted once more.
 
-        response = self.session.get(CREATE_ASSIGNMENT_URL, params=params, headers=headers, impersonate=BROWSER_NAME)
-        beautiful_soup = BeautifulSoup(response.text, 'html.parser')
+        :param send: The session method to submit the form with.
+        :return: The response to the last submission.
+        """
+        response = None
+        for refresh in (False, True):
+            form_request_verification_token = self._get_form_request_verification_token(
+                gradebook_number=gradebook_number, refresh=refresh)
+
+            response = send(CREATE_ASSIGNMENT_URL,
+                            params={'gn': gradebook_number, 'an': assignment_id},
+                            data={'__RequestVerificationToken': form_request_verification_token, **data},
+                            headers=headers,
+                            impersonate=BROWSER_NAME)
+            if response.status_code not in STALE_FORM_TOKEN_STATUS_CODES:
+                break
+
+        return response
+
+    def _get_form_request_verification_token(self, gradebook_number: str, refresh: bool = False) -> str:
+        """
+        Returns the form token for the gradebook's assignment form. Tokens are cached per gradebook for
+        FORM_TOKEN_TTL_SECONDS so that assignment writes do not each load the form first.
+
+        :param refresh: Whether to load a new token even if a cached one has not expired.
+        """
+        with self.form_token_lock:
+            gradebook_form_token_lock = self.gradebook_numbers_to_form_token_locks.setdefault(gradebook_number, Lock())
 
-        return beautiful_soup.find('form').find('input', attrs={'name': '__RequestVerificationToken'}).get('value')
+        with gradebook_form_token_lock:
+            cached_token = self.gradebook_numbers_to_form_tokens.get(gradebook_number)
+            if (not refresh and cached_token is not None
+                    and monotonic() - cached_token[1] < FORM_TOKEN_TTL_SECONDS):
+                return cached_token[0]
 
-    def update_grades_in_aeries(self, assignment_patch_data: dict[str, list[AssignmentPatchData]]) -> None:
+            params = {'gn': gradebook_number,
+                      'an': 0}
+            headers = {'Cookie': f'__RequestVerificationToken_L3RlYWNoZXI1={self.request_verification_token}; s={self.s_cookie}'}
+
+            response = self.session.get(CREATE_ASSIGNMENT_URL, params=params, headers=headers, impersonate=BROWSER_NAME)
+            beautiful_soup = parse_html(response.text, parser=self.html_parser, targets=ASSIGNMENT_FORM_TARGETS)
+
+            form_request_verification_token = (beautiful_soup.find('form')
+                                               .find('input', attrs={'name': '__RequestVerificationToken'})
+                                               .get('value'))
+            self.gradebook_numbers_to_form_tokens[gradebook_number] = (form_request_verification_token, monotonic())
+            return form_request_verification_token
+
+    def update_grades_in_aeries(self, assignment_patch_data: dict[str, list[AssignmentPatchData]]) -> GradeUpdateSummary:
         """
-        Update the grades in Aeries with the given patch data.
+        Update the grades in Aeries with the given patch data. At most max_write_workers grade updates are in flight at
+        once. A failed grade update does not stop the others; failures are reported in the summary.
 
         :param assignment_patch_data: Mapping of gradebook id to list of AssignmentPatchData objects.
+        :return: Summary of the grade updates that succeeded and failed.
         """
         click.echo('Updating Aeries grades...')
-        for gradebook_id, patch_datas in assignment_patch_data.items():
-            click.echo(f'\tProcessing Gradebook Number {gradebook_id}...')
-            for patch_data in patch_datas:
-                self._send_patch_request(gradebook_id=gradebook_id,
-                                         assignment_number=patch_data.assignment_number,
-                                         student_number=patch_data.student_num,
-                                         grade=patch_data.grade)
+        succeeded = {gradebook_id: [] for gradebook_id in assignment_patch_data}
+        failed = []
+        if self.write_journal is not None:
+            self.write_journal.plan_grade_updates(assignment_patch_data=assignment_patch_data)
+
+        with ThreadPoolExecutor(max_workers=self.max_write_workers) as executor:
+            gradebook_ids_to_futures = {}
+            for gradebook_id, patch_datas in assignment_patch_data.items():
+                click.echo(f'\tProcessing Gradebook Number {gradebook_id}...')
+                gradebook_ids_to_futures[gradebook_id] = [
+                    (executor.submit(self._send_patch_request_with_retries,
+                                     gradebook_id=gradebook_id,
+                                     patch_data=patch_data), patch_data)
+                    for patch_data in patch_datas
+                ]
+
+            # Iterate in submission order so that the summary is deterministic.
+            for gradebook_id, futures in gradebook_ids_to_futures.items():
+                for future, patch_data in futures:
+                    try:
+                        future.result()
+                    except (ValueError, requests.RequestsError) as e:
+                        failed.append(GradeUpdateFailure(gradebook_id=gradebook_id,
+                                                         patch_data=patch_data,
+                                                         reason=str(e)))
+                    else:
+                        succeeded[gradebook_id].append(patch_data)
+                        self._record_grade_update(gradebook_id=gradebook_id, patch_data=patch_data)
+
+                # Acknowledged once the whole gradebook is done, rather than with a flush to disk per grade
+                if self.write_journal is not None and succeeded[gradebook_id]:
+                    self.write_journal.acknowledge_grade_updates(gradebook_id=gradebook_id,
+                                                                 patch_datas=succeeded[gradebook_id])
+
+        summary = GradeUpdateSummary(succeeded=succeeded, failed=failed)
+        AeriesData._log_grade_update_summary(summary=summary)
+
+        return summary
+
+    def _record_grade_update(self, gradebook_id: str, patch_data: AssignmentPatchData) -> None:
+        """
+        Keep the local copy of the Aeries scores in sync with a grade update that Aeries accepted, so that overall
+        grades can be calculated locally after the import.
+        """
+        for period, period_gradebook_id in self.periods_to_gradebook_ids.items():
+            if period_gradebook_id == gradebook_id:
+                assignment_submissions = self.periods_to_assignment_submissions.setdefault(period, {})
+                (assignment_submissions
+                 .setdefault(patch_data.assignment_number, {})[patch_data.student_num]) = str(
+                    AeriesData._grade_to_mark(grade=patch_data.grade))
+
+    @staticmethod
+    def _log_grade_update_summary(summary: GradeUpdateSummary) -> None:
+        succeeded_count = sum(len(patch_datas) for patch_datas in summary.succeeded.values())
+        click.echo(f'Updated {succeeded_count} grade(s) in Aeries; {len(summary.failed)} failed.')
+        for failure in summary.failed:
+            click.echo(f'\tGradebook {failure.gradebook_id}, Assignment {failure.patch_data.assignment_number}, '
+                       f'Student Number {failure.patch_data.student_num}: {failure.reason}')
+
+    def _send_patch_request_with_retries(self, gradebook_id: str, patch_data: AssignmentPatchData) -> None:
+        """
+        Sends the grade update, retrying with exponential backoff when Aeries responds with a transient status code or
+        the request fails at the network level.
+        """
+        for attempt in range(1, GRADE_UPDATE_MAX_ATTEMPTS + 1):
+            try:
+                response = self._send_patch_request(gradebook_id=gradebook_id,
+                                                    assignment_number=patch_data.assignment_number,
+                                                    student_number=patch_data.student_num,
+                                                    grade=patch_data.grade)
+            except requests.RequestsError:
+                if attempt == GRADE_UPDATE_MAX_ATTEMPTS:
+                    raise
+            else:
+                if response.status_code == 200:
+                    return
+                if response.status_code not in TRANSIENT_STATUS_CODES or attempt == GRADE_UPDATE_MAX_ATTEMPTS:
+                    raise ValueError(f'Grade update has unexpected status code: {response.status_code}')
+
+            sleep(GRADE_UPDATE_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
 
     def _send_patch_request(self,
                             gradebook_id: str,
                             assignment_number: int,
                             student_number: int,
-                            grade: Optional[float]) -> None:
+                            grade: Optional[float]) -> requests.Response:
         headers = {
             'content-type': 'application/json; charset=UTF-8',
             'cookie': f's={self.s_cookie}'
         }
 
-        if grade is None:
-            grade = ''
-        elif grade == 0:
-            grade = 'MI'
-
         data = {
             "SchoolCode": MILPITAS_SCHOOL_CODE,
             "GradebookNumber": gradebook_id[:-2],
             "AssignmentNumber": assignment_number,
             "StudentNumber": student_number,
-            "Mark": grade
+            "Mark": AeriesData._grade_to_mark(grade=grade)
         }
 
-        self.session.post(
+        return self.session.post(
             UPDATE_ASSIGNMENT_GRADE_URL.format(school_code=MILPITAS_SCHOOL_CODE,
                                                gradebook_id=gradebook_id,
                                                student_number=student_number,
@@ -595,46 +979,206 @@ class AeriesData:
             impersonate=BROWSER_NAME
         )
 
-    def fetch_aeries_overall_grades(self) -> None:
+    @staticmethod
+    def _grade_to_mark(grade: Optional[float]) -> Union[str, float]:
+        """
+        Zeros are imported as MI so that they show up in red for students, and ungraded work is imported as a blank.
+        """
+        if grade is None:
+            return BLANK_MARK
+        elif grade == 0:
+            return MISSING_MARK
+        return grade
+
+    def compute_aeries_overall_grades(self) -> dict[int, dict[int, float]]:
         """
-        Extract the overall grades from the Aeries HTML for all periods. This function will create a thread for each
-        period so that the overall grades extraction is consistent no matter how many periods are being processed.
+        Calculate the overall grades for all periods from the scores, point totals and category weights already
+        fetched from Aeries, instead of loading every student's ScoresByStudent page. The result also populates
+        periods_to_student_ids_to_overall_grades.
+
+        :return: Mapping of period to student id to overall grade, rounded like Aeries to 0.01%.
         """
-        with ThreadPoolExecutor(max_workers=len(self.periods)) as executor:
-            future_to_period = {executor.submit(self._extract_overall_grades_from_html, period=period): period
-                                for period in self.periods}
+        periods_to_student_ids_to_overall_grades = {}
+        for period in self.periods:
+            periods_to_student_ids_to_overall_grades[period] = AeriesData._calculate_overall_grades(
+                student_ids_to_student_nums=self.periods_to_student_ids_to_student_nums[period],
+                assignments=self.periods_to_assignment_information[period].values(),
+                assignment_submissions=self.periods_to_assignment_submissions[period],
+                categories=self.periods_to_gradebook_information[period].categories
+            )
+            self.periods_to_student_ids_to_overall_grades[period] = dict(periods_to_student_ids_to_overall_grades[period])
 
-            for future in as_completed(future_to_period):
-                period = future_to_period[future]
-                student_ids_to_overall_grades = future.result()
-                self.periods_to_student_ids_to_overall_grades[period] = student_ids_to_overall_grades
+        return periods_to_student_ids_to_overall_grades
 
-    def _extract_overall_grades_from_html(self, period: int) -> dict[int, float]:
+    @staticmethod
+    def _calculate_overall_grades(student_ids_to_student_nums: dict[int, int],
+                                  assignments: Iterable[AeriesAssignmentData],
+                                  assignment_submissions: dict[int, dict[int, str]],
+                                  categories: dict[str, AeriesCategory]) -> dict[int, float]:
         """
-        Extract the overall grades from the Aeries HTML for the given period. This function not very efficient compared
-        to extracting grades from the overall Gradebook page. It uses individual student score pages to get the
-        0.01%-precise overall grade.
+        Reproduces Aeries' weighted percentage. MI counts as zero points earned out of the point total, while blank and
+        N/A scores are left out entirely. Each category's percentage is weighted by the category weight, and the weights
+        are renormalized over the categories the student has scores in. Gradebooks without category weights fall back to
+        total points earned over total points possible.
 
-        :return: Mapping of student id to overall grade.
+        :return: Mapping of student id to overall grade. Students without any scores are left out, like Aeries does.
         """
         overall_grades = {}
+        for student_id, student_num in student_ids_to_student_nums.items():
+            points_earned_by_category = defaultdict(float)
+            points_possible_by_category = defaultdict(float)
+
+            for assignment in assignments:
+                mark = assignment_submissions.get(assignment.id, {}).get(student_num, BLANK_MARK)
+                if mark in (BLANK_MARK, NOT_APPLICABLE_MARK):
+                    continue
+
+                points_earned_by_category[assignment.category] += 0 if mark == MISSING_MARK else float(mark)
+                points_possible_by_category[assignment.category] += assignment.point_total
+
+            graded_categories = [category for category, points_possible in points_possible_by_category.items()
+                                 if points_possible > 0]
+            if not graded_categories:
+                continue
+
+            total_weight = sum(categories[category].weight for category in graded_categories if category in categories)
+            if total_weight > 0:
+                weighted_percentage = sum(
+                    (points_earned_by_category[category] / points_possible_by_category[category])
+                    * categories[category].weight
+                    for category in graded_categories if category in categories
+                )
+                overall_grade = weighted_percentage / total_weight * 100
+            else:
+                overall_grade = (sum(points_earned_by_category[category] for category in graded_categories)
+                                 / sum(points_possible_by_category[category] for category in graded_categories)
+                                 * 100)
+
+            overall_grades[student_id] = round(overall_grade, 2)
+
+        return overall_grades
+
+    def fetch_aeries_overall_grades(self,
+                                    periods_to_student_ids: Optional[dict[int, Iterable[int]]] = None
+                                    ) -> dict[int, dict[int, float]]:
+        """
+        Extract the overall grades from the Aeries HTML. Every student page is its own task on a single pool of
+        max_student_workers threads, so large periods do not hold up the rest of the run. Students whose page could not
+        be loaded are recorded in overall_grade_failures instead of aborting the whole fetch.
+
+        :param periods_to_student_ids: The students to fetch overall grades for in each period. Defaults to every
+                                       student in every period.
+        :return: Mapping of period to student id to the overall grade shown by Aeries. These grades are also merged
+                 into periods_to_student_ids_to_overall_grades.
+        """
+        if periods_to_student_ids is None:
+            periods_to_student_ids = {period: self.periods_to_student_ids_to_student_nums[period].keys()
+                                      for period in self.periods}
+
+        periods_to_fetched_overall_grades = {period: {} for period in periods_to_student_ids}
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_student_workers) as executor:
+            futures_to_students = {
+                executor.submit(self._extract_overall_grade_from_html, period=period, student_id=student_id):
+                    (period, student_id)
+                for period, student_ids in periods_to_student_ids.items()
+                for student_id in student_ids
+            }
+
+            # Iterate in submission order so that the results and failures are deterministic.
+            for future, (period, student_id) in futures_to_students.items():
+                try:
+                    periods_to_fetched_overall_grades[period][student_id] = future.result()
+                except (ValueError, requests.RequestsError) as e:
+                    failures.append(OverallGradeFailure(period=period, student_id=student_id, reason=str(e)))
+
+        for period, student_ids_to_overall_grades in periods_to_fetched_overall_grades.items():
+            self.periods_to_student_ids_to_overall_grades.setdefault(period, {}).update(student_ids_to_overall_grades)
+        self.overall_grade_failures.extend(failures)
+        AeriesData._log_overall_grade_failures(failures=failures)
+
+        return periods_to_fetched_overall_grades
+
+    @staticmethod
+    def _log_overall_grade_failures(failures: list[OverallGradeFailure]) -> None:
+        if not failures:
+            return
+
+        click.echo(f'Could not load the Aeries overall grade for {len(failures)} student(s):')
+        for failure in failures:
+            click.echo(f'\tPeriod {failure.period}, Student {failure.student_id}: {failure.reason}')
+
+    def _extract_overall_grade_from_html(self, period: int, student_id: int) -> float:
+        """
+        Extract the overall grade for one student from their ScoresByStudent page. This is not very efficient compared
+        to extracting grades from the overall Gradebook page, but it is the only page with the 0.01%-precise overall
+        grade.
+
+        :return: The student's overall grade.
+        """
         headers = {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
                    'Cookie': f's={self.s_cookie}'}
 
         gradebook_id = self.periods_to_gradebook_ids[period]
-        student_ids_to_student_nums = self.periods_to_student_ids_to_student_nums[period]
+        student_num = self.periods_to_student_ids_to_student_nums[period][student_id]
+        url = SCORES_BY_STUDENT_URL.format(gradebook_id=gradebook_id,
+                                           student_num=student_num,
+                                           MILPITAS_SCHOOL_CODE=MILPITAS_SCHOOL_CODE)
 
-        for student_id, student_num in student_ids_to_student_nums.items():
-            response = self.session.get(SCORES_BY_STUDENT_URL
-                                        .format(gradebook_id=gradebook_id,
-                                                student_num=student_num,
-                                                MILPITAS_SCHOOL_CODE=MILPITAS_SCHOOL_CODE),
+        if self.stream_student_pages:
+            response = self.session.get(url,
+                                        headers=headers,
+                                        timeout=self.student_page_timeout,
+                                        impersonate=BROWSER_NAME,
+                                        stream=True)
+            try:
+                overall_grade, html = AeriesData._scan_for_overall_grade(
+                    chunks=response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                )
+            finally:
+                response.close()
+
+            if overall_grade is not None:
+                return overall_grade
+        else:
+            response = self.session.get(url,
                                         headers=headers,
+                                        timeout=self.student_page_timeout,
                                         impersonate=BROWSER_NAME)
-            beautiful_soup = BeautifulSoup(response.text, 'html.parser')
+            html = response.text
 
-            score = beautiful_soup.find('div', id='overallPercentDisplay').string
-            overall_grade = float(score[:-1])  # strip off % sign
-            overall_grades[student_id] = overall_grade
+        beautiful_soup = parse_html(html, parser=self.html_parser, targets=SCORES_BY_STUDENT_TARGETS)
 
-        return overall_grades
+        overall_percent_display = beautiful_soup.find('div', id=OVERALL_PERCENT_DISPLAY_ID)
+        if overall_percent_display is None or overall_percent_display.string is None:
+            raise ValueError(f'Could not find the overall grade on the Aeries page for student number {student_num}')
+
+        return float(overall_percent_display.string[:-1])  # strip off % sign
+
+    @staticmethod
+    def _scan_for_overall_grade(chunks: Iterable[bytes]) -> tuple[Optional[float], str]:
+        """
+        Scans the ScoresByStudent page as it is downloaded and stops reading once the overall percent element has
+        arrived, which is well before the end of the page.
+
+        :param chunks: The response body chunks.
+        :return: The overall grade and the HTML read so far. The overall grade is None if the page did not contain an
+                 overall percent element the scan could recognize, in which case the HTML is the whole page.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # The page is joined once at the end; only the new text and the tail of the text before it are searched, in
+        # case the element is split across chunks
+        texts = []
+        tail = ''
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            texts.append(text)
+
+            window = tail + text
+            match = OVERALL_PERCENT_DISPLAY_PATTERN.search(window)
+            if match:
+                return float(match.group(1)), ''.join(texts)
+            tail = window[-OVERALL_PERCENT_DISPLAY_MAX_LENGTH:]
+
+        texts.append(decoder.decode(b'', final=True))
+        return None, ''.join(texts)
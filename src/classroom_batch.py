@@ -0,0 +1,106 @@
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass, field
+from time import sleep
+from typing import Any, Callable, Optional
+
+from googleapiclient.errors import HttpError
+
+# Google Classroom accepts at most 50 calls in a single batch request
+CLASSROOM_BATCH_LIMIT = 50
+BATCH_ITEM_MAX_ATTEMPTS = 3
+BATCH_ITEM_RETRY_BACKOFF_SECONDS = 0.5
+TRANSIENT_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class PagedListRequest:
+    """
+    A Classroom list call whose results may span several pages.
+
+    :param key: Identifies the request's results in the returned mapping.
+    :param list_method: The resource's list method, e.g. classroom_service.courses().students().list.
+    :param items_key: The response field that holds the listed resources, e.g. 'students'.
+    :param list_kwargs: The arguments to the list method, not including the page token.
+    """
+    key: Hashable
+    list_method: Callable[..., Any]
+    items_key: str
+    list_kwargs: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class _PendingPage:
+    request: PagedListRequest
+    page_token: Optional[str] = None
+    attempt: int = 1
+
+
+def execute_paged_list_requests(classroom_service,
+                                paged_list_requests: Iterable[PagedListRequest],
+                                batch_limit: int = CLASSROOM_BATCH_LIMIT,
+                                on_response: Optional[Callable[[dict], None]] = None) -> dict[Hashable, list[dict]]:
+    """
+    Executes the list calls as multipart batch requests of up to batch_limit calls each. A call whose response has a
+    nextPageToken is continued in a following batch, until every call has reached its last page.
+
+    Calls that fail with a transient status code are retried in a following batch, after an exponential backoff. Any
+    other failure is raised once the rest of the batch has been handled, just as the call would have raised if it had
+    been executed on its own.
+
+    :param classroom_service: The Google Classroom service object.
+    :param paged_list_requests: The list calls to execute.
+    :param batch_limit: The maximum number of calls per batch request.
+    :param on_response: If supplied, called with every successful page response, e.g. to measure payload sizes.
+    :return: Mapping of each request's key to every resource it listed, across all of its pages.
+    """
+    keys_to_items = {}
+    pending_pages = []
+    for paged_list_request in paged_list_requests:
+        keys_to_items[paged_list_request.key] = []
+        pending_pages.append(_PendingPage(request=paged_list_request))
+
+    while pending_pages:
+        next_pending_pages = []
+        errors = []
+        # The attempt numbers of the calls that failed with a transient status code
+        failed_attempts = []
+
+        for batch_start in range(0, len(pending_pages), batch_limit):
+            batch_pages = pending_pages[batch_start:batch_start + batch_limit]
+
+            def callback(request_id: str, response: Optional[dict], exception: Optional[Exception]) -> None:
+                pending_page = batch_pages[int(request_id)]
+                if exception is not None:
+                    if (isinstance(exception, HttpError) and exception.status_code in TRANSIENT_STATUS_CODES
+                            and pending_page.attempt < BATCH_ITEM_MAX_ATTEMPTS):
+                        failed_attempts.append(pending_page.attempt)
+                        next_pending_pages.append(_PendingPage(request=pending_page.request,
+                                                               page_token=pending_page.page_token,
+                                                               attempt=pending_page.attempt + 1))
+                    else:
+                        errors.append(exception)
+                    return
+
+                if on_response is not None:
+                    on_response(response)
+                keys_to_items[pending_page.request.key].extend(response.get(pending_page.request.items_key, []))
+                next_page_token = response.get('nextPageToken')
+                if next_page_token:
+                    next_pending_pages.append(_PendingPage(request=pending_page.request, page_token=next_page_token))
+
+            batch = classroom_service.new_batch_http_request(callback=callback)
+            for index, pending_page in enumerate(batch_pages):
+                list_kwargs = dict(pending_page.request.list_kwargs)
+                if pending_page.page_token:
+                    list_kwargs['pageToken'] = pending_page.page_token
+                batch.add(pending_page.request.list_method(**list_kwargs), request_id=str(index))
+            batch.execute()
+
+        if errors:
+            raise errors[0]
+        if failed_attempts:
+            # Back off before retrying, so that a rate limit or an overloaded server has time to recover
+            sleep(BATCH_ITEM_RETRY_BACKOFF_SECONDS * 2 ** (max(failed_attempts) - 1))
+        pending_pages = next_pending_pages
+
+    return keys_to_items
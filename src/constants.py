@@ -1 +1,24 @@
+from importlib.util import find_spec
+
 MILPITAS_SCHOOL_CODE = 341
+
+# The CLI reads these defaults before any prompt appears, so this module must not import any third-party packages
+
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_MAX_WRITE_WORKERS = 8
+DEFAULT_MAX_STUDENT_WORKERS = 12
+DEFAULT_MAX_CLASSROOM_WORKERS = 4
+DEFAULT_SPOT_CHECK_SAMPLE_SIZE = 3
+# How often a gradebook mirror compares every assignment to Aeries, rather than only the assignments whose
+# fingerprint changed, so that edits made in Aeries are caught
+DEFAULT_FULL_VERIFY_INTERVAL_SECONDS = 7 * 24 * 60 * 60
+
+HTML_PARSER_BUILTIN = 'html.parser'
+HTML_PARSER_LXML = 'lxml'
+HTML_PARSER_SELECTOLAX = 'selectolax'
+# Checks that lxml is installed without importing it
+DEFAULT_HTML_PARSER = HTML_PARSER_LXML if find_spec('lxml') is not None else HTML_PARSER_BUILTIN
+
+AERIES_READ_BACKEND_HTML = 'html'
+AERIES_READ_BACKEND_API = 'api'
+DEFAULT_AERIES_READ_BACKEND = AERIES_READ_BACKEND_HTML
@@ -1,14 +1,39 @@
+import hashlib
+import json
 import re
 from collections import defaultdict
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
+from itertools import chain
+from threading import Event, local
+from typing import Any, Callable, Optional, Union
 
+import arrow
 import click
+import numpy as np
 from arrow import Arrow
 
+from classroom_batch import PagedListRequest, execute_paged_list_requests
+from roster_cache import RosterCache
+from sync_state import SyncState
+
 COURSEWORK_PAGE_SIZE = 1000
 COURSEWORK_SUBMISSION_PAGE_SIZE = 100
+ALL_COURSEWORK_ID = '-'
+
+# Partial-response field masks, limited to the fields the importer reads
+COURSE_FIELDS = 'courses(id,section,courseState)'
+STUDENT_FIELDS = 'nextPageToken,students(userId,profile(emailAddress,name/fullName))'
+COURSEWORK_FIELDS = 'nextPageToken,courseWork(id,title,maxPoints,dueDate,gradeCategory/name)'
+STUDENT_SUBMISSION_FIELDS = 'nextPageToken,studentSubmissions(courseWorkId,userId,assignedGrade)'
+# Incremental imports also compare update times against the last import's watermark
+INCREMENTAL_COURSEWORK_FIELDS = 'nextPageToken,courseWork(id,title,maxPoints,dueDate,gradeCategory/name,updateTime)'
+INCREMENTAL_STUDENT_SUBMISSION_FIELDS = 'nextPageToken,studentSubmissions(courseWorkId,userId,assignedGrade,updateTime)'
+
+ACTIVE_COURSE_STATES = ['ACTIVE']
+PUBLISHED_COURSEWORK_STATES = ['PUBLISHED']
+RETURNED_SUBMISSION_STATES = ['RETURNED']
 
 EMAIL_ADDRESS_PATTERN = r'^[A-Za-z]{2}([0-9]+)@student\.musd\.org$'
 EMAIL_ADDRESS_PATTERN_COMPILE = re.compile(EMAIL_ADDRESS_PATTERN)
@@ -21,39 +46,282 @@ class GoogleClassroomAssignment:
     point_total: int
     category: str
 
+    def fingerprint(self) -> str:
+        """
+        Returns a digest of everything about the assignment that is written to Aeries: its name, point total, category
+        and grades. Two assignments with the same fingerprint import identically.
+        """
+        contents = json.dumps([self.assignment_name, self.point_total, self.category,
+                               sorted(self.submissions.items())])
+        return hashlib.sha256(contents.encode()).hexdigest()
+
+
+# (user id -> student id, coursework id -> assignment, coursework id -> user id -> grade)
+CourseData = tuple[dict[int, int], dict[int, GoogleClassroomAssignment], dict[int, dict[int, Optional[float]]]]
+
+
+class ThreadLocalClassroomService:
+    """
+    Gives each thread its own Classroom service. A service object and its HTTP transport are not thread-safe, so every
+    thread that makes Classroom calls gets a service built by create_classroom_service from the same credentials.
+    """
+
+    def __init__(self, create_classroom_service: Callable[[], Any], classroom_service=None) -> None:
+        """
+        :param create_classroom_service: Builds a new Classroom service with its own authorized HTTP transport.
+        :param classroom_service: An already built service for the calling thread to use, if there is one.
+        """
+        self.create_classroom_service = create_classroom_service
+        self.local = local()
+        if classroom_service is not None:
+            self.local.classroom_service = classroom_service
+
+    def get(self):
+        """
+        Returns the calling thread's Classroom service, building it on first use.
+        """
+        if not hasattr(self.local, 'classroom_service'):
+            self.local.classroom_service = self.create_classroom_service()
+        return self.local.classroom_service
+
 
 class GoogleClassroomData:
 
-    def __init__(self, periods: Iterable[int], classroom_service) -> None:
+    def __init__(self,
+                 periods: Iterable[int],
+                 classroom_service,
+                 batch_requests: bool = False,
+                 field_masks: bool = True,
+                 returned_only: bool = False,
+                 roster_cache: Optional[RosterCache] = None,
+                 sync_state: Optional[SyncState] = None,
+                 thread_local_classroom_service: Optional[ThreadLocalClassroomService] = None,
+                 max_workers: int = 1) -> None:
+        """
+        :param batch_requests: Whether to send the list calls for all periods as batch requests.
+        :param field_masks: Whether to request only the fields the importer reads from each Classroom call.
+        :param returned_only: Whether to only import grades that have been returned to students.
+        :param roster_cache: The cache of course ids and rosters to use. If not supplied, a cache that only lasts for
+                             this object is used.
+        :param sync_state: If supplied, only assignments updated since the last successful import are marked as
+                           changed, see the periods_to_changed_assignment_names attribute.
+        :param thread_local_classroom_service: If supplied, Classroom calls use the calling thread's service from it
+                                               instead of classroom_service, so this object may be used from any thread.
+        :param max_workers: The maximum number of periods to fetch at once. Periods are only fetched in parallel if
+                            thread_local_classroom_service is supplied.
+        """
         self.classroom_service = classroom_service
         self.periods = periods
+        self.batch_requests = batch_requests
+        self.field_masks = field_masks
+        self.returned_only = returned_only
+        self.response_bytes = 0
+        self.roster_cache = roster_cache if roster_cache is not None else RosterCache()
+        self.sync_state = sync_state
+        self.thread_local_classroom_service = thread_local_classroom_service
+        self.max_workers = max_workers
+        self.course_ids_to_coursework_ids_to_update_times: dict[int, dict[int, Arrow]] = defaultdict(dict)
+        self.periods_to_changed_assignment_names: dict[int, set[str]] = {}
         self.periods_to_assignments: dict[int, list[GoogleClassroomAssignment]] = defaultdict(list)
         self.user_ids_to_names: dict[int, str] = {}
 
-    def get_submissions(self) -> None:
+    def get_submissions(self, cancel_event: Optional[Event] = None) -> None:
         """
         Gets all student submissions of assignments for the periods and populates result as a mapping of period
         to list of assignment data, which contains assignment metadata and submissions.
 
+        :param cancel_event: If supplied and set, stops before fetching the next period.
         :return: Nothing, populates the periods_to_assignments attribute.
         """
         click.echo('Retrieving assignment submissions from Google Classroom...')
         periods_to_course_ids = self._get_periods_to_course_ids()
+        if self.batch_requests:
+            course_ids_to_course_data = self._get_course_data_batched(course_ids=periods_to_course_ids.values())
+            for period, course_id in periods_to_course_ids.items():
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                self._get_period_submissions(period=period,
+                                             course_id=course_id,
+                                             course_data=course_ids_to_course_data[course_id])
+        elif (self.thread_local_classroom_service is not None and self.max_workers > 1
+              and len(periods_to_course_ids) > 1):
+            self._get_submissions_in_parallel(periods_to_course_ids=periods_to_course_ids, cancel_event=cancel_event)
+        else:
+            for period, course_id in periods_to_course_ids.items():
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                self._get_period_submissions(period=period, course_id=course_id)
 
-        for period, course_id in periods_to_course_ids.items():
-            click.echo(f'\tProcessing Period {period}...')
-            user_ids_to_student_ids = self._get_user_ids_to_student_ids(course_id=course_id)
+        click.echo(f'\tReceived {self.response_bytes / 1024:.1f} KiB from Google Classroom.')
+        self.roster_cache.save()
+
+    def _get_period_submissions(self, period: int, course_id: int, course_data: Optional[CourseData] = None) -> None:
+        """
+        Populates the period's assignments with their submissions.
 
+        :param course_data: The course's already listed roster, coursework and grades. If not supplied, they are
+                            listed here.
+        """
+        click.echo(f'\tProcessing Period {period}...')
+        if course_data is not None:
+            (user_ids_to_student_ids,
+             coursework_ids_to_assignment_data,
+             coursework_ids_to_user_ids_to_grades) = course_data
+        else:
+            user_ids_to_student_ids = self._get_user_ids_to_student_ids(course_id=course_id)
             coursework_ids_to_assignment_data = self._get_all_published_coursework(course_id=course_id)
+            coursework_ids_to_user_ids_to_grades = self._get_grades_for_course(course_id=course_id)
+
+        if any(user_id not in user_ids_to_student_ids
+               for coursework_id in coursework_ids_to_assignment_data
+               for user_id in coursework_ids_to_user_ids_to_grades.get(coursework_id, {})):
+            # A student joined the course after its roster was cached
+            user_ids_to_student_ids = self._get_user_ids_to_student_ids(course_id=course_id, refresh=True)
+
+        for coursework_id, assignment_data in coursework_ids_to_assignment_data.items():
+            user_ids_to_grades = coursework_ids_to_user_ids_to_grades.get(coursework_id, {})
+            for user_id, grade in user_ids_to_grades.items():
+                student_id = user_ids_to_student_ids[user_id]
+                assignment_data.submissions[student_id] = grade
+
+            self.periods_to_assignments[period].append(assignment_data)
+
+        if self.sync_state is not None:
+            self._find_changed_assignments(period=period,
+                                           course_id=course_id,
+                                           coursework_ids_to_assignment_data=coursework_ids_to_assignment_data)
+
+    def _get_submissions_in_parallel(self, periods_to_course_ids: dict[int, int], cancel_event: Optional[Event]) -> None:
+        """
+        Fetches the periods on max_workers threads, each with its own Classroom service. Every period is fetched into a
+        separate GoogleClassroomData, and the results are merged in period order once all periods are done, so the
+        populated attributes do not depend on which period finished first.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._get_period_submissions_on_worker,
+                                       period=period,
+                                       course_id=course_id,
+                                       cancel_event=cancel_event)
+                       for period, course_id in periods_to_course_ids.items()]
+            period_google_classroom_datas = [future.result() for future in futures]
+
+        for period_google_classroom_data in period_google_classroom_datas:
+            if period_google_classroom_data is None:
+                continue
+            for period, assignments in period_google_classroom_data.periods_to_assignments.items():
+                self.periods_to_assignments[period].extend(assignments)
+            self.user_ids_to_names.update(period_google_classroom_data.user_ids_to_names)
+            self.response_bytes += period_google_classroom_data.response_bytes
+            self.course_ids_to_coursework_ids_to_update_times.update(
+                period_google_classroom_data.course_ids_to_coursework_ids_to_update_times)
+            self.periods_to_changed_assignment_names.update(
+                period_google_classroom_data.periods_to_changed_assignment_names)
+
+    def _get_period_submissions_on_worker(self,
+                                          period: int,
+                                          course_id: int,
+                                          cancel_event: Optional[Event]) -> Optional['GoogleClassroomData']:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+        period_google_classroom_data = GoogleClassroomData(
+            periods=[period],
+            classroom_service=self.thread_local_classroom_service.get(),
+            field_masks=self.field_masks,
+            returned_only=self.returned_only,
+            roster_cache=self.roster_cache,
+            sync_state=self.sync_state
+        )
+        period_google_classroom_data._get_period_submissions(period=period, course_id=course_id)
+        return period_google_classroom_data
+
+    def _find_changed_assignments(self,
+                                  period: int,
+                                  course_id: int,
+                                  coursework_ids_to_assignment_data: dict[int, GoogleClassroomAssignment]) -> None:
+        """
+        Populates the period's changed assignment names with the assignments that were updated, or had a submission
+        updated, after the course's watermark.
+        """
+        watermark = self.sync_state.get_watermark(course_id=course_id)
+        coursework_ids_to_update_times = self.course_ids_to_coursework_ids_to_update_times[course_id]
+        self.periods_to_changed_assignment_names[period] = {
+            assignment_data.assignment_name
+            for coursework_id, assignment_data in coursework_ids_to_assignment_data.items()
+            if watermark is None or coursework_id not in coursework_ids_to_update_times
+            or coursework_ids_to_update_times[coursework_id] > watermark
+        }
+        click.echo(f'\t\t{len(self.periods_to_changed_assignment_names[period])} of '
+                   f'{len(coursework_ids_to_assignment_data)} assignments changed since the last import.')
+
+    def _record_update_times(self, course_id: int, items: Iterable[dict], coursework_id_key: str) -> None:
+        """
+        Keeps the latest update time of each coursework in the course, from the coursework itself or its submissions.
+        """
+        if self.sync_state is None:
+            return
+
+        coursework_ids_to_update_times = self.course_ids_to_coursework_ids_to_update_times[course_id]
+        for item in items:
+            if 'updateTime' not in item:
+                continue
+            coursework_id = item[coursework_id_key]
+            update_time = arrow.get(item['updateTime'])
+            if coursework_id not in coursework_ids_to_update_times \
+                    or update_time > coursework_ids_to_update_times[coursework_id]:
+                coursework_ids_to_update_times[coursework_id] = update_time
+
+    def commit_sync_state(self) -> None:
+        """
+        Advances the watermark of each fetched course to the latest update time seen, once its grades have been
+        imported successfully.
+        """
+        if self.sync_state is None:
+            return
+
+        for course_id, coursework_ids_to_update_times in self.course_ids_to_coursework_ids_to_update_times.items():
+            if not coursework_ids_to_update_times:
+                continue
+            latest_update_time = max(coursework_ids_to_update_times.values())
+            watermark = self.sync_state.get_watermark(course_id=course_id)
+            if watermark is None or latest_update_time > watermark:
+                self.sync_state.set_watermark(course_id=course_id, watermark=latest_update_time)
+        self.sync_state.save()
+
+    def _coursework_fields(self) -> dict[str, str]:
+        return self._fields(COURSEWORK_FIELDS if self.sync_state is None else INCREMENTAL_COURSEWORK_FIELDS)
 
-            for coursework_id, assignment_data in coursework_ids_to_assignment_data.items():
-                user_ids_to_grades = self._get_grades_for_coursework(course_id=course_id,
-                                                                     coursework_id=coursework_id)
-                for user_id, grade in user_ids_to_grades.items():
-                    student_id = user_ids_to_student_ids[user_id]
-                    assignment_data.submissions[student_id] = grade
+    def _get_classroom_service(self):
+        if self.thread_local_classroom_service is not None:
+            return self.thread_local_classroom_service.get()
+        return self.classroom_service
 
-                self.periods_to_assignments[period].append(assignment_data)
+    def _execute(self, request) -> dict:
+        """
+        Executes a Classroom request, adding the size of its response to the response_bytes attribute.
+        """
+        response = request.execute()
+        self._record_response(response=response)
+        return response
+
+    def _record_response(self, response: dict) -> None:
+        self.response_bytes += len(json.dumps(response))
+
+    def _fields(self, fields: str) -> dict[str, str]:
+        """
+        Returns the fields argument for a Classroom call, or no argument if field masks are turned off.
+        """
+        return {'fields': fields} if self.field_masks else {}
+
+    def _student_submission_list_kwargs(self, course_id: int, coursework_id: Union[int, str]) -> dict:
+        list_kwargs = {'courseId': course_id,
+                       'courseWorkId': coursework_id,
+                       'pageSize': COURSEWORK_SUBMISSION_PAGE_SIZE,
+                       **self._fields(STUDENT_SUBMISSION_FIELDS if self.sync_state is None
+                                      else INCREMENTAL_STUDENT_SUBMISSION_FIELDS)}
+        if self.returned_only:
+            list_kwargs['states'] = RETURNED_SUBMISSION_STATES
+        return list_kwargs
 
     def _get_periods_to_course_ids(self) -> dict[int, int]:
         """
@@ -61,7 +329,14 @@ class GoogleClassroomData:
 
         :return: The period number mapped to its corresponding Course Id.
         """
-        courses = self.classroom_service.courses().list().execute().get('courses', [])
+        cached_periods_to_course_ids = self.roster_cache.get_periods_to_course_ids(periods=self.periods)
+        if cached_periods_to_course_ids is not None:
+            return cached_periods_to_course_ids
+
+        courses = self._execute(self._get_classroom_service()
+                                .courses()
+                                .list(courseStates=ACTIVE_COURSE_STATES, **self._fields(COURSE_FIELDS))
+                                ).get('courses', [])
         valid_courses = {course['section'][:len('Period 1')]: course['id']
                          for course in courses if 'Period ' in course.get('section', '')
                          and course.get('courseState') == 'ACTIVE'}
@@ -73,47 +348,146 @@ class GoogleClassroomData:
                 raise ValueError(f'{section_name} is not a valid period number.')
             periods_to_course_ids[period] = valid_courses[section_name]
 
+        self.roster_cache.set_periods_to_course_ids(periods_to_course_ids=periods_to_course_ids)
         return periods_to_course_ids
 
-    def _get_user_ids_to_student_ids(self, course_id: int) -> dict[int, int]:
+    def _get_user_ids_to_student_ids(self, course_id: int, refresh: bool = False) -> dict[int, int]:
         """
-        Returns Google service user id mapped to the student id.
+        Returns Google service user id mapped to the student id, from the roster cache if it holds the course.
         Also populates the user_ids_to_names attribute.
 
         :param course_id: The Course Id to fetch student emails from.
+        :param refresh: Whether to list the roster even if it is cached.
         :return: The student user id mapped to their student id.
         """
+        roster = None if refresh else self.roster_cache.get_roster(course_id=course_id)
+        if roster is not None:
+            self.user_ids_to_names.update(roster.student_ids_to_names)
+            return dict(roster.user_ids_to_student_ids)
+
         user_ids_to_student_ids: dict[int, int] = {}
-        query = self.classroom_service.courses().students().list(courseId=course_id).execute()
+        query = self._execute(self._get_classroom_service()
+                              .courses()
+                              .students()
+                              .list(courseId=course_id, **self._fields(STUDENT_FIELDS)))
         students = query.get('students', [])
 
         while True:
-            for student in students:
-                email = student['profile']['emailAddress']
-                google_id = student['userId']
-
-                match = EMAIL_ADDRESS_PATTERN_COMPILE.match(email)
-
-                if not match:
-                    raise ValueError(f'Student email address is in an unexpected format: {email}')
-                user_ids_to_student_ids[google_id] = int(match.group(1))
-
-                # Maintain a backwards mapping to names
-                self.user_ids_to_names[int(match.group(1))] = student['profile']['name']['fullName']
+            user_ids_to_student_ids.update(self._parse_students(students=students))
 
             next_page_token = query.get('nextPageToken')
             if next_page_token:
-                query = (self.classroom_service
-                         .courses()
-                         .students()
-                         .list(courseId=course_id, pageToken=next_page_token)
-                         .execute())
+                query = self._execute(self._get_classroom_service()
+                                      .courses()
+                                      .students()
+                                      .list(courseId=course_id, pageToken=next_page_token,
+                                            **self._fields(STUDENT_FIELDS)))
                 students = query.get('students', [])
             else:
                 break
 
+        self._cache_roster(course_id=course_id, user_ids_to_student_ids=user_ids_to_student_ids)
         return user_ids_to_student_ids
 
+    def _cache_roster(self, course_id: int, user_ids_to_student_ids: dict[int, int]) -> None:
+        self.roster_cache.set_roster(course_id=course_id,
+                                     user_ids_to_student_ids=user_ids_to_student_ids,
+                                     student_ids_to_names={student_id: self.user_ids_to_names[student_id]
+                                                           for student_id in user_ids_to_student_ids.values()})
+
+    def _parse_students(self, students: Iterable[dict]) -> dict[int, int]:
+        """
+        Returns Google service user id mapped to the student id for the listed students.
+        Also populates the user_ids_to_names attribute.
+        """
+        user_ids_to_student_ids: dict[int, int] = {}
+        for student in students:
+            email = student['profile']['emailAddress']
+            google_id = student['userId']
+
+            match = EMAIL_ADDRESS_PATTERN_COMPILE.match(email)
+
+            if not match:
+                raise ValueError(f'Student email address is in an unexpected format: {email}')
+            user_ids_to_student_ids[google_id] = int(match.group(1))
+
+            # Maintain a backwards mapping to names
+            self.user_ids_to_names[int(match.group(1))] = student['profile']['name']['fullName']
+
+        return user_ids_to_student_ids
+
+    def _get_course_data_batched(self, course_ids: Iterable[int]) -> dict[int, CourseData]:
+        """
+        Lists the roster, coursework and submissions of every course with batched requests, so the lists for all
+        periods share a few HTTP requests instead of each taking their own. Rosters held by the roster cache are not
+        listed again.
+
+        :param course_ids: The Course Ids to fetch.
+        :return: The course id mapped to its student user id to student id mapping, its published coursework, and its
+                 grades by coursework.
+        """
+        course_ids = list(course_ids)
+        course_ids_to_rosters = {course_id: self.roster_cache.get_roster(course_id=course_id)
+                                 for course_id in course_ids}
+        courses = self._get_classroom_service().courses()
+        keys_to_items = execute_paged_list_requests(
+            classroom_service=self._get_classroom_service(),
+            on_response=self._record_response,
+            paged_list_requests=[
+                PagedListRequest(key=('students', course_id),
+                                 list_method=courses.students().list,
+                                 items_key='students',
+                                 list_kwargs={'courseId': course_id, **self._fields(STUDENT_FIELDS)})
+                for course_id, roster in course_ids_to_rosters.items() if roster is None
+            ] + [
+                paged_list_request
+                for course_id in course_ids
+                for paged_list_request in (
+                    PagedListRequest(key=('courseWork', course_id),
+                                     list_method=courses.courseWork().list,
+                                     items_key='courseWork',
+                                     list_kwargs={'courseId': course_id,
+                                                  'courseWorkStates': PUBLISHED_COURSEWORK_STATES,
+                                                  'pageSize': COURSEWORK_PAGE_SIZE,
+                                                  'orderBy': 'dueDate desc',
+                                                  **self._coursework_fields()}),
+                    PagedListRequest(key=('studentSubmissions', course_id),
+                                     list_method=courses.courseWork().studentSubmissions().list,
+                                     items_key='studentSubmissions',
+                                     list_kwargs=self._student_submission_list_kwargs(
+                                         course_id=course_id, coursework_id=ALL_COURSEWORK_ID))
+                )
+            ]
+        )
+
+        course_ids_to_user_ids_to_student_ids = {}
+        for course_id, roster in course_ids_to_rosters.items():
+            if roster is None:
+                user_ids_to_student_ids = self._parse_students(students=keys_to_items[('students', course_id)])
+                self._cache_roster(course_id=course_id, user_ids_to_student_ids=user_ids_to_student_ids)
+            else:
+                user_ids_to_student_ids = dict(roster.user_ids_to_student_ids)
+                self.user_ids_to_names.update(roster.student_ids_to_names)
+            course_ids_to_user_ids_to_student_ids[course_id] = user_ids_to_student_ids
+
+        for course_id in course_ids:
+            self._record_update_times(course_id=course_id,
+                                      items=keys_to_items[('courseWork', course_id)],
+                                      coursework_id_key='id')
+            self._record_update_times(course_id=course_id,
+                                      items=keys_to_items[('studentSubmissions', course_id)],
+                                      coursework_id_key='courseWorkId')
+
+        return {
+            course_id: (
+                course_ids_to_user_ids_to_student_ids[course_id],
+                GoogleClassroomData._parse_published_coursework(coursework=keys_to_items[('courseWork', course_id)]),
+                GoogleClassroomData._group_grades_by_coursework(
+                    student_submissions=keys_to_items[('studentSubmissions', course_id)])
+            )
+            for course_id in course_ids
+        }
+
     def _get_all_published_coursework(self, course_id: int) -> dict[int, GoogleClassroomAssignment]:
         """
         Returns a mapping of assignment id to assignment metadata for published coursework in the given course_id.
@@ -121,15 +495,25 @@ class GoogleClassroomData:
         :param course_id: The Course Id to get all published coursework for.
         :return: The assignment id mapped to assignment metadata
         """
-        coursework = (self.classroom_service
-                      .courses()
-                      .courseWork()
-                      .list(courseId=course_id,
-                            pageSize=COURSEWORK_PAGE_SIZE,
-                            orderBy='dueDate desc')
-                      .execute()
-                      .get('courseWork', []))
+        coursework = self._execute(self._get_classroom_service()
+                                   .courses()
+                                   .courseWork()
+                                   .list(courseId=course_id,
+                                         courseWorkStates=PUBLISHED_COURSEWORK_STATES,
+                                         pageSize=COURSEWORK_PAGE_SIZE,
+                                         orderBy='dueDate desc',
+                                         **self._coursework_fields())
+                                   ).get('courseWork', [])
+        self._record_update_times(course_id=course_id, items=coursework, coursework_id_key='id')
+
+        return GoogleClassroomData._parse_published_coursework(coursework=coursework)
 
+    @staticmethod
+    def _parse_published_coursework(coursework: Iterable[dict]) -> dict[int, GoogleClassroomAssignment]:
+        """
+        Returns a mapping of assignment id to assignment metadata for the current semester's graded coursework, given
+        coursework ordered by due date, latest first.
+        """
         coursework_assignments = {}
         for coursework_obj in coursework:
             if not GoogleClassroomData._is_current_semester(coursework_obj['dueDate']['month']):
@@ -160,32 +544,52 @@ class GoogleClassroomData:
         else:
             return 7 <= month <= 12
 
-    def _get_grades_for_coursework(self,
-                                   course_id: int,
-                                   coursework_id: int) -> dict[int, Optional[float]]:
-        """
-        Returns the grades for the assignment as a map of user id to the point total.
-        If the grade is None, that means that the assignment is not graded. This could mean that grading is unfinished,
-        or that the student is excused from this work.
-
-        :param course_id: The Course Id that is relevant to the coursework id.
-        :param coursework_id: The Coursework Id to get all student submissions for.
-        :return: The student user id mapped to their grade for the assignment.
-        """
-        student_submissions = (self.classroom_service
-                               .courses()
-                               .courseWork()
-                               .studentSubmissions()
-                               .list(courseId=course_id,
-                                     courseWorkId=coursework_id,
-                                     pageSize=COURSEWORK_SUBMISSION_PAGE_SIZE)
-                               .execute()
-                               .get('studentSubmissions', []))
-        return {submission['userId']: submission.get('assignedGrade') for submission in student_submissions}
+    def _get_grades_for_course(self, course_id: int) -> dict[int, dict[int, Optional[float]]]:
+        """
+        Returns the grades for every coursework in the course, listed with a single paged stream of submissions rather
+        than one request per coursework.
+
+        :param course_id: The Course Id to get all student submissions for.
+        :return: The coursework id mapped to student user id mapped to their grade for the assignment.
+        """
+        student_submissions = self._list_student_submissions(course_id=course_id, coursework_id=ALL_COURSEWORK_ID)
+        self._record_update_times(course_id=course_id, items=student_submissions, coursework_id_key='courseWorkId')
+        return GoogleClassroomData._group_grades_by_coursework(student_submissions=student_submissions)
+
+    @staticmethod
+    def _group_grades_by_coursework(student_submissions: Iterable[dict]) -> dict[int, dict[int, Optional[float]]]:
+        coursework_ids_to_user_ids_to_grades = defaultdict(dict)
+        for submission in student_submissions:
+            coursework_ids_to_user_ids_to_grades[submission['courseWorkId']][submission['userId']] = \
+                submission.get('assignedGrade')
+
+        return coursework_ids_to_user_ids_to_grades
+
+    def _list_student_submissions(self, course_id: int, coursework_id: Union[int, str]) -> list[dict]:
+        """
+        Lists the student submissions for the coursework, following every page of results.
+
+        :param coursework_id: The Coursework Id, or ALL_COURSEWORK_ID for every coursework in the course.
+        """
+        student_submissions = []
+        list_kwargs = self._student_submission_list_kwargs(course_id=course_id, coursework_id=coursework_id)
+        while True:
+            query = self._execute(self._get_classroom_service()
+                                  .courses()
+                                  .courseWork()
+                                  .studentSubmissions()
+                                  .list(**list_kwargs))
+            student_submissions.extend(query.get('studentSubmissions', []))
+
+            next_page_token = query.get('nextPageToken')
+            if not next_page_token:
+                return student_submissions
+            list_kwargs['pageToken'] = next_page_token
 
     def get_student_ids_to_names(self) -> dict[int, dict[int, str]]:
         """
         Returns the periods mapped to student ids mapped to the names of the students.
+        Rosters already listed by get_submissions, or held by the roster cache, are not listed again.
 
         :return: The periods student ids mapped to the student names.
         """
@@ -193,34 +597,11 @@ class GoogleClassroomData:
         periods_to_course_ids = self._get_periods_to_course_ids()
 
         for period, course_id in periods_to_course_ids.items():
-            student_ids_to_names = {}
-            query = self.classroom_service.courses().students().list(courseId=course_id).execute()
-            students = query.get('students', [])
-
-            while True:
-                for student in students:
-                    email = student['profile']['emailAddress']
-                    name = student['profile']['name']['fullName']
-
-                    match = EMAIL_ADDRESS_PATTERN_COMPILE.match(email)
-
-                    if not match:
-                        raise ValueError(f'Student email address is in an unexpected format: {email}')
-                    student_ids_to_names[int(match.group(1))] = name
-
-                next_page_token = query.get('nextPageToken')
-                if next_page_token:
-                    query = (self.classroom_service
-                             .courses()
-                             .students()
-                             .list(courseId=course_id, pageToken=next_page_token)
-                             .execute())
-                    students = query.get('students', [])
-                else:
-                    break
-
-            periods_to_student_ids_to_names[period] = student_ids_to_names
+            user_ids_to_student_ids = self._get_user_ids_to_student_ids(course_id=course_id)
+            periods_to_student_ids_to_names[period] = {student_id: self.user_ids_to_names[student_id]
+                                                       for student_id in user_ids_to_student_ids.values()}
 
+        self.roster_cache.save()
         return periods_to_student_ids_to_names
 
     def get_overall_grades(self, period: int, categories_to_weights: dict[str, float]) -> dict[int, float]:
@@ -228,6 +609,9 @@ class GoogleClassroomData:
         Returns the overall grades for the students in the given period. This assumes that get_submissions has already
         populated the Google Classroom data.
 
+        The submissions are flattened into arrays, so the per category sums and weighted percentages are computed for
+        every student at once.
+
         :param period: The period to get overall_grades for.
         :param categories_to_weights: The categories mapped to their respective weights (from Aeries).
         :return: The student id mapped to overall grade.
@@ -236,31 +620,54 @@ class GoogleClassroomData:
             raise ValueError('Google Classroom data has not been populated yet.')
 
         assignments = self.periods_to_assignments[period]
-        student_ids_to_points_received_by_category = defaultdict(lambda: defaultdict(float))
-        student_ids_to_total_points_by_category = defaultdict(lambda: defaultdict(float))
-
+        categories_to_columns = {category: column for column, category in enumerate(categories_to_weights)}
         for assignment in assignments:
-            for student_id, grade in assignment.submissions.items():
-                if grade is None:
-                    continue
-
-                student_ids_to_points_received_by_category[student_id][assignment.category] += grade
-                student_ids_to_total_points_by_category[student_id][assignment.category] += assignment.point_total
-
-        student_ids_to_overall_grades = defaultdict(float)
-
-        for student_id, category_to_points_received in student_ids_to_points_received_by_category.items():
-            for category, points_received in category_to_points_received.items():
-                total_points_for_category = student_ids_to_total_points_by_category[student_id][category]
-                if total_points_for_category == 0:
-                    continue
-                student_ids_to_overall_grades[student_id] += (points_received / total_points_for_category) * (categories_to_weights[category] * 100)
-
-            # Make the overall grade out of the sum of weights for only categories in which the student has grades for
-            total_weight = sum((weight * 100)
-                               for category, weight in categories_to_weights.items()
-                               if category in category_to_points_received)
-            if total_weight != 100:
-                student_ids_to_overall_grades[student_id] = (student_ids_to_overall_grades[student_id] / total_weight) * 100
-
-        return student_ids_to_overall_grades
+            categories_to_columns.setdefault(assignment.category, len(categories_to_columns))
+
+        # Flatten every submission into parallel arrays; ungraded submissions become NaN and are dropped
+        submission_count = sum(len(assignment.submissions) for assignment in assignments)
+        student_ids = np.fromiter(chain.from_iterable(assignment.submissions for assignment in assignments),
+                                  dtype=np.int64, count=submission_count)
+        grades = np.array(list(chain.from_iterable(assignment.submissions.values() for assignment in assignments)),
+                          dtype=np.float64)
+        assignment_indexes = np.repeat(np.arange(len(assignments)),
+                                       [len(assignment.submissions) for assignment in assignments])
+        graded = ~np.isnan(grades)
+        student_ids, grades, assignment_indexes = student_ids[graded], grades[graded], assignment_indexes[graded]
+
+        unique_student_ids, rows = np.unique(student_ids, return_inverse=True)
+
+        # Student by category sums, computed for every student at once
+        shape = (len(unique_student_ids), len(categories_to_columns))
+        cell_count = shape[0] * shape[1]
+        category_columns = np.array([categories_to_columns[assignment.category] for assignment in assignments],
+                                    dtype=np.intp)[assignment_indexes]
+        cells = rows * shape[1] + category_columns
+        point_totals = np.array([assignment.point_total for assignment in assignments],
+                                dtype=np.float64)[assignment_indexes]
+        points_received_by_category = np.bincount(cells, weights=grades, minlength=cell_count).reshape(shape)
+        total_points_by_category = np.bincount(cells, weights=point_totals, minlength=cell_count).reshape(shape)
+        graded_categories = np.bincount(cells, minlength=cell_count).reshape(shape) > 0
+        scored_categories = total_points_by_category != 0
+
+        unweighted_categories = [category for category, column in categories_to_columns.items()
+                                 if category not in categories_to_weights and scored_categories[:, column].any()]
+        if unweighted_categories:
+            raise KeyError(unweighted_categories[0])
+
+        weights = np.zeros(len(categories_to_columns))
+        weights[:len(categories_to_weights)] = [weight * 100 for weight in categories_to_weights.values()]
+        category_percentages = np.divide(points_received_by_category, total_points_by_category,
+                                         out=np.zeros(shape), where=scored_categories)
+        overall_grades = (category_percentages * weights).sum(axis=1)
+
+        # Make the overall grade out of the sum of weights for only categories in which the student has grades for
+        total_weights = np.where(graded_categories, weights, 0).sum(axis=1)
+        renormalized = total_weights != 100
+        overall_grades[renormalized] = overall_grades[renormalized] / total_weights[renormalized] * 100
+
+        # Students are ordered by their first graded submission. Assigning in reverse leaves each student's first index.
+        first_indexes = np.empty(len(unique_student_ids), dtype=np.intp)
+        first_indexes[rows[::-1]] = np.arange(len(rows))[::-1]
+        order = np.argsort(first_indexes)
+        return dict(zip(unique_student_ids[order].tolist(), overall_grades[order].tolist()))
@@ -0,0 +1,144 @@
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import numpy as np
+
+from aeries_utils import MISSING_MARK, NOT_APPLICABLE_MARK, AssignmentPatchData
+
+# Grades and scores are never negative, so negative codes stand in for the marks that are not numbers. A cell with
+# no grade or score at all is NaN, which compares unequal to everything.
+BLANK_CODE = -1.0
+MISSING_CODE = -2.0
+NOT_APPLICABLE_CODE = -3.0
+UNRECOGNIZED_AERIES_MARK_CODE = -4.0
+NEGATIVE_GOOGLE_CLASSROOM_GRADE_CODE = -5.0
+
+
+def encode_google_classroom_grade(grade: Optional[float]) -> float:
+    """
+    Returns the matrix code for a Google Classroom grade. An ungraded submission is blank and a grade of 0 is missing,
+    matching how they are written to Aeries.
+    """
+    if grade is None:
+        return BLANK_CODE
+    if grade == 0:
+        return MISSING_CODE
+    if grade < 0:
+        return NEGATIVE_GOOGLE_CLASSROOM_GRADE_CODE
+    return float(grade)
+
+
+def encode_aeries_score(score: Union[str, float]) -> float:
+    """
+    Returns the matrix code for a score read from the Aeries gradebook.
+    """
+    if score == '':
+        return BLANK_CODE
+    if score == MISSING_MARK:
+        return MISSING_CODE
+    if score == NOT_APPLICABLE_MARK:
+        return NOT_APPLICABLE_CODE
+    try:
+        value = float(score)
+    except (TypeError, ValueError):
+        return UNRECOGNIZED_AERIES_MARK_CODE
+    return value if value >= 0 else UNRECOGNIZED_AERIES_MARK_CODE
+
+
+@dataclass(frozen=True, eq=False)
+class PeriodGradeMatrix:
+    """
+    A period's Google Classroom grades and Aeries scores, index aligned as student rows by assignment columns.
+
+    :param student_ids: The Google Classroom student id of each row.
+    :param student_nums: The Aeries student number of each row.
+    :param assignment_numbers: The Aeries assignment number of each column.
+    :param assignment_submissions: The Google Classroom submissions of each column, which the patched grades are
+        taken from.
+    :param google_classroom_grades: The encoded Google Classroom grades, NaN where the student has no submission.
+    :param aeries_scores: The encoded Aeries scores, NaN where Aeries has no score for the student.
+    :param new_assignments: For each column, whether Aeries has no scores for the assignment at all.
+    """
+    student_ids: list[int]
+    student_nums: np.ndarray
+    assignment_numbers: np.ndarray
+    assignment_submissions: list[Mapping[int, Optional[float]]]
+    google_classroom_grades: np.ndarray
+    aeries_scores: np.ndarray
+    new_assignments: np.ndarray
+
+    @staticmethod
+    def build(assignment_submissions: Iterable[tuple[int, Mapping[int, Optional[float]]]],
+              aeries_assignment_submissions: Mapping[int, Mapping[int, Union[str, float]]],
+              student_ids_to_student_nums: Mapping[int, int]) -> 'PeriodGradeMatrix':
+        """
+        :param assignment_submissions: Each assignment's Aeries assignment number, and its Google Classroom
+            submissions as a mapping of student id to grade.
+        :param aeries_assignment_submissions: Mapping of Aeries assignment number to the assignment's scores, as a
+            mapping of student number to score.
+        :param student_ids_to_student_nums: Mapping of student id to Aeries student number. Every student with a
+            Google Classroom submission must be in it.
+        """
+        assignment_submissions = list(assignment_submissions)
+
+        # Rows are ordered by each student's first submission
+        student_ids_to_rows = {}
+        for _, submissions in assignment_submissions:
+            for student_id in submissions:
+                student_ids_to_rows.setdefault(student_id, len(student_ids_to_rows))
+        student_ids = list(student_ids_to_rows)
+        student_nums = np.array([student_ids_to_student_nums[student_id] for student_id in student_ids],
+                                dtype=np.int64)
+        student_nums_to_rows = {student_num: row for row, student_num in enumerate(student_nums.tolist())}
+
+        shape = (len(student_ids), len(assignment_submissions))
+        google_classroom_grades = np.full(shape, np.nan)
+        aeries_scores = np.full(shape, np.nan)
+        new_assignments = np.zeros(len(assignment_submissions), dtype=bool)
+
+        for column, (assignment_number, submissions) in enumerate(assignment_submissions):
+            rows = np.fromiter((student_ids_to_rows[student_id] for student_id in submissions),
+                               dtype=np.intp, count=len(submissions))
+            google_classroom_grades[rows, column] = np.fromiter(
+                (encode_google_classroom_grade(grade) for grade in submissions.values()),
+                dtype=np.float64, count=len(submissions))
+
+            aeries_submissions = aeries_assignment_submissions.get(assignment_number, {})
+            new_assignments[column] = len(aeries_submissions) == 0
+            scored_rows_and_scores = [(student_nums_to_rows[student_num], encode_aeries_score(score))
+                                      for student_num, score in aeries_submissions.items()
+                                      if student_num in student_nums_to_rows]
+            if scored_rows_and_scores:
+                scored_rows, scores = zip(*scored_rows_and_scores)
+                aeries_scores[list(scored_rows), column] = scores
+
+        return PeriodGradeMatrix(student_ids=student_ids,
+                                 student_nums=student_nums,
+                                 assignment_numbers=np.array([assignment_number
+                                                              for assignment_number, _ in assignment_submissions],
+                                                             dtype=np.int64),
+                                 assignment_submissions=[submissions for _, submissions in assignment_submissions],
+                                 google_classroom_grades=google_classroom_grades,
+                                 aeries_scores=aeries_scores,
+                                 new_assignments=new_assignments)
+
+    def changed_cells(self) -> np.ndarray:
+        """
+        Returns a boolean matrix of the cells whose Google Classroom grade needs to be written to Aeries: every
+        submission to an assignment that has no Aeries scores yet, and every submission whose grade differs from the
+        Aeries score.
+        """
+        return (~np.isnan(self.google_classroom_grades)
+                & (self.new_assignments[np.newaxis, :] | (self.google_classroom_grades != self.aeries_scores)))
+
+    def generate_patch_data(self) -> list[AssignmentPatchData]:
+        """
+        Returns the grade updates for the changed cells, assignment by assignment.
+        """
+        # Transposing first gives the changed cells in column-major order
+        columns, rows = np.nonzero(self.changed_cells().T)
+        return [AssignmentPatchData(student_num=int(self.student_nums[row]),
+                                    assignment_number=int(self.assignment_numbers[column]),
+                                    grade=self.assignment_submissions[column][self.student_ids[row]])
+                for column, row in zip(columns.tolist(), rows.tolist())]
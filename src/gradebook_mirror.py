@@ -0,0 +1,262 @@
+import sqlite3
+from collections.abc import Iterable
+from threading import Lock
+from time import time
+from typing import Optional
+
+import arrow
+
+from aeries_utils import AeriesAssignmentData, AeriesCategory, AeriesClassroomData, AeriesData
+from constants import DEFAULT_FULL_VERIFY_INTERVAL_SECONDS
+
+# Bump whenever the schema changes. The mirror only holds copies of data kept elsewhere, so a mirror with another
+# version is dropped and rebuilt rather than migrated.
+GRADEBOOK_MIRROR_VERSION = 3
+
+SCHEMA = '''
+CREATE TABLE aeries_gradebooks (
+    period INTEGER PRIMARY KEY,
+    gradebook_id TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE aeries_students (
+    period INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    student_num INTEGER NOT NULL,
+    PRIMARY KEY (period, student_id)
+);
+CREATE TABLE aeries_assignments (
+    period INTEGER NOT NULL,
+    assignment_name TEXT NOT NULL,
+    assignment_number INTEGER NOT NULL,
+    point_total INTEGER NOT NULL,
+    category TEXT,
+    PRIMARY KEY (period, assignment_name)
+);
+CREATE TABLE aeries_categories (
+    period INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    weight REAL NOT NULL,
+    category_id INTEGER NOT NULL,
+    PRIMARY KEY (period, name)
+);
+CREATE TABLE aeries_end_terms (
+    period INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    PRIMARY KEY (period, term)
+);
+CREATE TABLE aeries_scores (
+    period INTEGER NOT NULL,
+    assignment_number INTEGER NOT NULL,
+    student_num INTEGER NOT NULL,
+    score TEXT NOT NULL,
+    PRIMARY KEY (period, assignment_number, student_num)
+);
+CREATE TABLE assignment_fingerprints (
+    gradebook_id TEXT NOT NULL,
+    assignment_name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (gradebook_id, assignment_name)
+);
+CREATE TABLE full_verifications (
+    gradebook_id TEXT PRIMARY KEY,
+    verified_at REAL NOT NULL
+);
+'''
+AERIES_PERIOD_TABLES = ('aeries_gradebooks', 'aeries_students', 'aeries_assignments', 'aeries_categories',
+                        'aeries_end_terms', 'aeries_scores')
+
+
+class GradebookMirror:
+    """
+    A local SQLite copy of the Aeries gradebooks, rosters, assignments, categories and scores as of the last import,
+    including the grades it wrote, and the fingerprint of each assignment last fully written to Aeries. Each period is
+    saved as a whole, so a mirrored period is always a consistent snapshot.
+
+    The mirror may be shared by imports running on different threads.
+    """
+
+    def __init__(self, path: str, full_verify_interval_seconds: float = DEFAULT_FULL_VERIFY_INTERVAL_SECONDS) -> None:
+        """
+        :param path: The SQLite database file to keep the mirror in. It is created if it does not exist.
+        :param full_verify_interval_seconds: How long after a gradebook's last full verify another one is due.
+        """
+        self.path = path
+        self.full_verify_interval_seconds = full_verify_interval_seconds
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._create_schema()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def save_aeries_data(self, aeries_data: AeriesData, periods: Iterable[int]) -> None:
+        """
+        Replaces the mirrored Aeries gradebooks of the periods with those in aeries_data.
+        """
+        periods = list(periods)
+        synced_at = time()
+
+        with self.lock, self.connection:
+            self._delete_periods(tables=AERIES_PERIOD_TABLES, periods=periods)
+            for period in periods:
+                gradebook_information = aeries_data.periods_to_gradebook_information[period]
+                self.connection.execute(
+                    'INSERT INTO aeries_gradebooks (period, gradebook_id, synced_at) VALUES (?, ?, ?)',
+                    (period, aeries_data.periods_to_gradebook_ids[period], synced_at)
+                )
+                self.connection.executemany(
+                    'INSERT INTO aeries_students (period, student_id, student_num) VALUES (?, ?, ?)',
+                    [(period, student_id, student_num)
+                     for student_id, student_num in aeries_data.periods_to_student_ids_to_student_nums[period].items()]
+                )
+                self.connection.executemany(
+                    'INSERT INTO aeries_assignments (period, assignment_name, assignment_number, point_total, '
+                    'category) VALUES (?, ?, ?, ?, ?)',
+                    [(period, assignment_name, assignment.id, assignment.point_total, assignment.category)
+                     for assignment_name, assignment in aeries_data.periods_to_assignment_information[period].items()]
+                )
+                self.connection.executemany(
+                    'INSERT INTO aeries_categories (period, name, weight, category_id) VALUES (?, ?, ?, ?)',
+                    [(period, category.name, category.weight, category.id)
+                     for category in gradebook_information.categories.values()]
+                )
+                self.connection.executemany(
+                    'INSERT INTO aeries_end_terms (period, term, end_date) VALUES (?, ?, ?)',
+                    [(period, term, end_date.isoformat())
+                     for term, end_date in gradebook_information.end_term_dates.items()]
+                )
+                self.connection.executemany(
+                    'INSERT INTO aeries_scores (period, assignment_number, student_num, score) VALUES (?, ?, ?, ?)',
+                    [(period, assignment_number, student_num, score)
+                     for assignment_number, scores in aeries_data.periods_to_assignment_submissions[period].items()
+                     for student_num, score in scores.items()]
+                )
+
+    def load_aeries_data(self, aeries_data: AeriesData, periods: Iterable[int]) -> list[int]:
+        """
+        Loads the mirrored Aeries gradebooks of the periods into aeries_data, as if they had been fetched from Aeries.
+        A period is only loaded if its mirrored gradebook id is still the one in aeries_data.periods_to_gradebook_ids,
+        which should be extracted from Aeries first, since a period's gradebook changes when the term rolls over.
+
+        :return: The periods that were loaded. Other periods are left untouched in aeries_data.
+        """
+        periods = list(periods)
+        placeholders = ', '.join('?' * len(periods))
+
+        with self.lock:
+            periods_to_gradebook_ids = dict(self.connection.execute(
+                f'SELECT period, gradebook_id FROM aeries_gradebooks WHERE period IN ({placeholders})', periods
+            ).fetchall())
+            mirrored_periods = [period for period in periods
+                                if period in periods_to_gradebook_ids
+                                and periods_to_gradebook_ids[period] == aeries_data.periods_to_gradebook_ids.get(period)]
+
+            for period in mirrored_periods:
+                aeries_data.periods_to_student_ids_to_student_nums[period] = dict(self.connection.execute(
+                    'SELECT student_id, student_num FROM aeries_students WHERE period = ?', (period,)
+                ).fetchall())
+                aeries_data.periods_to_assignment_information[period] = {
+                    assignment_name: AeriesAssignmentData(id=assignment_number, point_total=point_total,
+                                                          category=category)
+                    for assignment_name, assignment_number, point_total, category in self.connection.execute(
+                        'SELECT assignment_name, assignment_number, point_total, category FROM aeries_assignments '
+                        'WHERE period = ?', (period,)
+                    )
+                }
+
+                assignment_submissions = {}
+                for assignment_number, student_num, score in self.connection.execute(
+                        'SELECT assignment_number, student_num, score FROM aeries_scores WHERE period = ?', (period,)):
+                    assignment_submissions.setdefault(assignment_number, {})[student_num] = score
+                aeries_data.periods_to_assignment_submissions[period] = assignment_submissions
+
+                aeries_data.periods_to_gradebook_information[period] = AeriesClassroomData(
+                    categories={
+                        name: AeriesCategory(name=name, weight=weight, id=category_id)
+                        for name, weight, category_id in self.connection.execute(
+                            'SELECT name, weight, category_id FROM aeries_categories WHERE period = ?', (period,)
+                        )
+                    },
+                    end_term_dates={
+                        term: arrow.get(end_date)
+                        for term, end_date in self.connection.execute(
+                            'SELECT term, end_date FROM aeries_end_terms WHERE period = ?', (period,)
+                        )
+                    }
+                )
+
+        return mirrored_periods
+
+    def record_assignment_fingerprints(self,
+                                       gradebook_id: str,
+                                       assignment_names_to_fingerprints: dict[str, str],
+                                       full_verify: bool) -> None:
+        """
+        Records the fingerprints of assignments that were fully written to the gradebook.
+
+        :param full_verify: Whether every assignment was compared to Aeries, which restarts the full verify interval.
+        """
+        synced_at = time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO assignment_fingerprints (gradebook_id, assignment_name, fingerprint, '
+                'synced_at) VALUES (?, ?, ?, ?)',
+                [(gradebook_id, assignment_name, fingerprint, synced_at)
+                 for assignment_name, fingerprint in assignment_names_to_fingerprints.items()]
+            )
+            if full_verify:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO full_verifications (gradebook_id, verified_at) VALUES (?, ?)',
+                    (gradebook_id, synced_at)
+                )
+
+    def is_full_verify_due(self, gradebook_id: str) -> bool:
+        """
+        Returns whether the gradebook is due a full verify: it has never had one, or its last one is older than the full
+        verify interval.
+        """
+        with self.lock:
+            return self._is_full_verify_due(gradebook_id=gradebook_id)
+
+    def get_assignment_fingerprints(self, gradebook_id: str) -> Optional[dict[str, str]]:
+        """
+        Returns the fingerprint last fully written to the gradebook for each assignment name, or None if the gradebook
+        is due a full verify.
+        """
+        with self.lock:
+            if self._is_full_verify_due(gradebook_id=gradebook_id):
+                return None
+
+            return dict(self.connection.execute(
+                'SELECT assignment_name, fingerprint FROM assignment_fingerprints WHERE gradebook_id = ?',
+                (gradebook_id,)
+            ).fetchall())
+
+    def _is_full_verify_due(self, gradebook_id: str) -> bool:
+        verified_at = self.connection.execute(
+            'SELECT verified_at FROM full_verifications WHERE gradebook_id = ?', (gradebook_id,)
+        ).fetchone()
+        return verified_at is None or time() - verified_at[0] >= self.full_verify_interval_seconds
+
+    def _create_schema(self) -> None:
+        with self.lock, self.connection:
+            (version,) = self.connection.execute('PRAGMA user_version').fetchone()
+            if version == GRADEBOOK_MIRROR_VERSION:
+                return
+
+            tables = [name for (name,) in self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            )]
+            for table in tables:
+                self.connection.execute(f'DROP TABLE {table}')
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f'PRAGMA user_version = {GRADEBOOK_MIRROR_VERSION}')
+
+    def _delete_periods(self, tables: Iterable[str], periods: list[int]) -> None:
+        placeholders = ', '.join('?' * len(periods))
+        for table in tables:
+            self.connection.execute(f'DELETE FROM {table} WHERE period IN ({placeholders})', periods)
@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from bs4 import BeautifulSoup, ElementFilter
+
+from constants import DEFAULT_HTML_PARSER, HTML_PARSER_BUILTIN, HTML_PARSER_LXML, HTML_PARSER_SELECTOLAX
+
+
+@dataclass(frozen=True)
+class HtmlTarget:
+    """
+    A top-level element that an extractor reads from. A page parsed with targets only contains the matching elements
+    (and everything nested inside them), so the rest of the document is never built into a tree.
+    """
+    tag_name: Optional[str]
+    attribute: Optional[str] = None
+    value: Optional[str] = None
+
+    def matches(self, tag_name: str, attributes: dict[str, str]) -> bool:
+        if self.tag_name is not None and tag_name != self.tag_name:
+            return False
+        if self.attribute is None:
+            return True
+
+        attribute_value = attributes.get(self.attribute)
+        if attribute_value is None:
+            return False
+        if self.attribute == 'class':
+            # Attributes have not been split into lists yet while the page is being parsed
+            return self.value in attribute_value.split()
+        return attribute_value == self.value
+
+    def css_selector(self) -> str:
+        selector = self.tag_name or ''
+        if self.attribute == 'class':
+            selector += f'.{self.value}'
+        elif self.attribute == 'id':
+            selector += f'#{self.value}'
+        elif self.attribute is not None:
+            selector += f'[{self.attribute}="{self.value}"]'
+        return selector
+
+
+class _HtmlTargetFilter(ElementFilter):
+    """
+    Only lets BeautifulSoup create tags matching one of the targets. Tags nested inside a matching tag are always
+    created, since BeautifulSoup only consults the filter for elements that would sit at the top of the document.
+    """
+
+    def __init__(self, targets: Iterable[HtmlTarget]):
+        super().__init__()
+        self.targets = tuple(targets)
+
+    def allow_tag_creation(self, nsprefix: Optional[str], name: str, attrs: Optional[dict[str, str]]) -> bool:
+        return any(target.matches(tag_name=name, attributes=attrs or {}) for target in self.targets)
+
+    def allow_string_creation(self, string: str) -> bool:
+        return False
+
+
+def parse_html(html: str, parser: str, targets: Optional[Iterable[HtmlTarget]] = None) -> BeautifulSoup:
+    """
+    Parses an Aeries page into a BeautifulSoup tree.
+
+    :param html: The page HTML.
+    :param parser: HTML_PARSER_BUILTIN, HTML_PARSER_LXML or HTML_PARSER_SELECTOLAX. With selectolax, the page is
+                   scanned by selectolax and only the target elements are handed to BeautifulSoup.
+    :param targets: The elements the caller reads from. If not supplied, the whole document is parsed.
+    :return: The parsed page.
+    """
+    if parser == HTML_PARSER_SELECTOLAX:
+        if targets is not None:
+            html = _extract_target_html(html=html, targets=targets)
+        parser = DEFAULT_HTML_PARSER
+        targets = None
+
+    if parser not in (HTML_PARSER_BUILTIN, HTML_PARSER_LXML):
+        raise ValueError(f'Unsupported HTML parser: {parser}')
+
+    parse_only = _HtmlTargetFilter(targets=targets) if targets is not None else None
+    return BeautifulSoup(html, parser, parse_only=parse_only)
+
+
+def _extract_target_html(html: str, targets: Iterable[HtmlTarget]) -> str:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    nodes = tree.css(', '.join(target.css_selector() for target in targets))
+
+    # Nodes nested in another matched node are already part of that node's HTML
+    matched_node_ids = {node.mem_id for node in nodes}
+    outermost_nodes = []
+    for node in nodes:
+        parent = node.parent
+        while parent is not None and parent.mem_id not in matched_node_ids:
+            parent = parent.parent
+        if parent is None:
+            outermost_nodes.append(node)
+
+    return ''.join(node.html for node in outermost_nodes)
@@ -1,189 +1,999 @@
 import re
 from collections import defaultdict
-from typing import Optional
+from contextlib import nullcontext
+from collections.abc import Iterable
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from functools import partial
+from threading import Event, Lock
+from typing import Any, Callable, Optional
 
 import click
-
-from aeries_utils import AeriesData, AssignmentPatchData, AeriesAssignmentData
-from google_classroom_utils import GoogleClassroomData, GoogleClassroomAssignment
+from curl_cffi import requests
+
+from aeries_utils import (ASSIGNMENT_CREATE, ASSIGNMENT_PATCH, AeriesData, AssignmentPatchData, AeriesAssignmentData,
+                          AssignmentWrite, GradeUpdateSummary)
+from constants import (AERIES_READ_BACKEND_API, DEFAULT_AERIES_READ_BACKEND, DEFAULT_FULL_VERIFY_INTERVAL_SECONDS,
+                       DEFAULT_HTML_PARSER, DEFAULT_MAX_CLASSROOM_WORKERS, DEFAULT_MAX_STUDENT_WORKERS,
+                       DEFAULT_MAX_WORKERS, DEFAULT_MAX_WRITE_WORKERS, DEFAULT_SPOT_CHECK_SAMPLE_SIZE)
+from google_classroom_utils import GoogleClassroomData, GoogleClassroomAssignment, ThreadLocalClassroomService
+from grade_matrix import PeriodGradeMatrix
+from gradebook_mirror import GradebookMirror
+from patch_plan import PatchPlan, PlannedAssignmentWrite, PlannedGradeWrite, load_patch_plan, save_patch_plan
+from roster_cache import DEFAULT_ROSTER_CACHE_TTL_SECONDS, RosterCache
+from sync_state import SyncState
 from validator import Validator
+from write_journal import WriteJournal
 
 GRADEBOOK_NUMBER_PATTERN = re.compile(r'^([0-9]+)/([F|S])$')
 
 
+class AssignmentNumberAllocator:
+    """
+    Hands out Aeries assignment numbers for new assignments. Each gradebook's new assignments are reserved a contiguous
+    block of numbers up front, so they can be created concurrently. Numbers are keyed by assignment name: asking for
+    the same assignment again, for example when its creation is retried, returns the number it was already given.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.gradebook_ids_to_next_numbers: dict[str, int] = {}
+        self.gradebook_ids_to_assignment_names_to_numbers: dict[str, dict[str, int]] = defaultdict(dict)
+
+    def reserve(self,
+                gradebook_id: str,
+                existing_numbers: Iterable[int],
+                assignment_names: Iterable[str]) -> dict[str, int]:
+        """
+        Reserves assignment numbers for the given assignments, after every number already used in the gradebook.
+
+        :param gradebook_id: The gradebook the assignments will be created in.
+        :param existing_numbers: The assignment numbers already in use in the gradebook.
+        :param assignment_names: The names of the assignments to create.
+        :return: Mapping of assignment name to its reserved assignment number.
+        """
+        assignment_names = list(assignment_names)
+        with self.lock:
+            assignment_names_to_numbers = self.gradebook_ids_to_assignment_names_to_numbers[gradebook_id]
+            next_number = max(self.gradebook_ids_to_next_numbers.get(gradebook_id, 1),
+                              max(existing_numbers, default=0) + 1)
+
+            for assignment_name in assignment_names:
+                if assignment_name not in assignment_names_to_numbers:
+                    assignment_names_to_numbers[assignment_name] = next_number
+                    next_number += 1
+
+            self.gradebook_ids_to_next_numbers[gradebook_id] = next_number
+            return {assignment_name: assignment_names_to_numbers[assignment_name]
+                    for assignment_name in assignment_names}
+
+
 def run_import(classroom_service,
                periods: list[int],
-               s_cookie: str) -> None:
+               s_cookie: str,
+               max_workers: int = DEFAULT_MAX_WORKERS,
+               max_write_workers: int = DEFAULT_MAX_WRITE_WORKERS,
+               html_parser: str = DEFAULT_HTML_PARSER,
+               spot_check_sample_size: int = DEFAULT_SPOT_CHECK_SAMPLE_SIZE,
+               max_student_workers: int = DEFAULT_MAX_STUDENT_WORKERS,
+               pipeline: bool = False,
+               batch_classroom_requests: bool = False,
+               classroom_field_masks: bool = True,
+               returned_grades_only: bool = False,
+               roster_cache_path: Optional[str] = None,
+               roster_cache_ttl_seconds: float = DEFAULT_ROSTER_CACHE_TTL_SECONDS,
+               sync_state_path: Optional[str] = None,
+               create_classroom_service: Optional[Callable[[], Any]] = None,
+               max_classroom_workers: int = DEFAULT_MAX_CLASSROOM_WORKERS,
+               aeries_read_backend: str = DEFAULT_AERIES_READ_BACKEND,
+               gradebook_mirror_path: Optional[str] = None,
+               full_verify_interval_seconds: float = DEFAULT_FULL_VERIFY_INTERVAL_SECONDS,
+               write_journal_path: Optional[str] = None,
+               resume: bool = False) -> None:
     """
     Runs the logic for importing assignment grades from Google Classroom to Aeries.
 
     :param classroom_service: The Google Classroom service object.
     :param periods: The list of period numbers to import grades.
     :param s_cookie: The cookie to use for Aeries authentication.
+    :param max_workers: The maximum number of periods to fetch from Aeries at once.
+    :param max_write_workers: The maximum number of grade updates to have in flight to Aeries at once.
+    :param html_parser: The parser backend to use for Aeries pages.
+    :param spot_check_sample_size: The number of students per period whose locally calculated overall grade is checked
+                                   against Aeries.
+    :param max_student_workers: The maximum number of student overall grade pages to fetch from Aeries at once.
+    :param pipeline: Whether to import each period independently, so that a period's grades are written while other
+                     periods are still being fetched.
+    :param batch_classroom_requests: Whether to send Google Classroom list calls as batch requests.
+    :param classroom_field_masks: Whether to request only the fields the importer reads from Google Classroom.
+    :param returned_grades_only: Whether to only import grades that have been returned to students.
+    :param roster_cache_path: If supplied, the file Google Classroom course ids and rosters are cached in across runs.
+    :param roster_cache_ttl_seconds: How long a cached course list or roster is used before it is fetched again.
+    :param sync_state_path: If supplied, the file the latest Google Classroom update time imported for each course is
+                            kept in. Only assignments updated since the last successful import are written to Aeries.
+    :param create_classroom_service: If supplied, builds a Google Classroom service with its own HTTP transport, so
+                                     that every thread making Google Classroom calls can have its own service.
+    :param max_classroom_workers: The maximum number of periods to fetch from Google Classroom at once. Only used with
+                                  create_classroom_service.
+    :param aeries_read_backend: Whether to read Aeries rosters, assignments and scores from the teacher API ('api') or
+                                from the scoresByClass page ('html'). Gradebooks the API cannot be read for fall back to
+                                the scoresByClass page.
+    :param gradebook_mirror_path: If supplied, the SQLite file both sides of the import are mirrored in across runs.
+                                  Aeries gradebooks are loaded from the mirror, and only periods whose Google
+                                  Classroom grades differ from it are read from Aeries to confirm the changes.
+                                  Assignments unchanged since they were last fully written to Aeries are skipped.
+    :param full_verify_interval_seconds: How often every assignment of a mirrored gradebook is compared to Aeries
+                                         anyway, to catch edits made in Aeries.
+    :param write_journal_path: If supplied, the file every write to Aeries is journaled in before it is sent, and
+                               acknowledged in once Aeries accepts it.
+    :param resume: Whether to resume the interrupted import journaled in write_journal_path instead of running a new
+                   one. Only the writes it never had acknowledged are sent, without reading either system first.
+    """
+    if resume and not write_journal_path:
+        raise ValueError('Resuming an import requires the write journal of the interrupted import')
+    write_journal = WriteJournal(path=write_journal_path) if write_journal_path else None
+    with write_journal if write_journal is not None else nullcontext():
+        create_aeries_data = partial(AeriesData,
+                                     s_cookie=s_cookie,
+                                     max_workers=max_workers,
+                                     max_write_workers=max_write_workers,
+                                     html_parser=html_parser,
+                                     max_student_workers=max_student_workers,
+                                     read_backend=aeries_read_backend,
+                                     write_journal=write_journal)
+
+        if resume:
+            _resume_import(aeries_data=create_aeries_data(periods=periods), write_journal=write_journal)
+            return
+        if write_journal is not None:
+            write_journal.start()
+
+        thread_local_classroom_service = None
+        if create_classroom_service is not None:
+            thread_local_classroom_service = ThreadLocalClassroomService(
+                create_classroom_service=create_classroom_service,
+                classroom_service=classroom_service
+            )
+
+        create_google_classroom_data = partial(GoogleClassroomData,
+                                               classroom_service=classroom_service,
+                                               batch_requests=batch_classroom_requests,
+                                               field_masks=classroom_field_masks,
+                                               returned_only=returned_grades_only,
+                                               roster_cache=RosterCache(path=roster_cache_path,
+                                                                        ttl_seconds=roster_cache_ttl_seconds),
+                                               sync_state=SyncState(path=sync_state_path) if sync_state_path else None,
+                                               thread_local_classroom_service=thread_local_classroom_service,
+                                               max_workers=max_classroom_workers)
+
+        gradebook_mirror = None
+        if gradebook_mirror_path:
+            gradebook_mirror = GradebookMirror(path=gradebook_mirror_path,
+                                               full_verify_interval_seconds=full_verify_interval_seconds)
+
+        if pipeline:
+            _run_pipelined_import(periods=periods,
+                                  create_google_classroom_data=create_google_classroom_data,
+                                  create_aeries_data=create_aeries_data,
+                                  max_workers=max_workers,
+                                  spot_check_sample_size=spot_check_sample_size,
+                                  classroom_service_per_thread=thread_local_classroom_service is not None,
+                                  gradebook_mirror=gradebook_mirror)
+            return
+
+        google_classroom_data = create_google_classroom_data(periods=periods)
+        aeries_data = create_aeries_data(periods=periods)
+        if gradebook_mirror is not None:
+            _fetch_with_gradebook_mirror(google_classroom_data=google_classroom_data,
+                                         aeries_data=aeries_data,
+                                         create_aeries_data=create_aeries_data,
+                                         gradebook_mirror=gradebook_mirror)
+        else:
+            _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                    aeries_data=aeries_data)
+        _write_and_validate_grades(google_classroom_data=google_classroom_data,
+                                   aeries_data=aeries_data,
+                                   periods=periods,
+                                   spot_check_sample_size=spot_check_sample_size,
+                                   gradebook_mirror=gradebook_mirror)
+
+
+def run_plan(classroom_service: Any,
+             periods: list[int],
+             s_cookie: str,
+             plan_path: str,
+             max_workers: int = DEFAULT_MAX_WORKERS,
+             html_parser: str = DEFAULT_HTML_PARSER,
+             batch_classroom_requests: bool = False,
+             classroom_field_masks: bool = True,
+             returned_grades_only: bool = False,
+             roster_cache_path: Optional[str] = None,
+             roster_cache_ttl_seconds: float = DEFAULT_ROSTER_CACHE_TTL_SECONDS,
+             aeries_read_backend: str = DEFAULT_AERIES_READ_BACKEND) -> None:
     """
-    google_classroom_data = GoogleClassroomData(periods=periods, classroom_service=classroom_service)
-    google_classroom_data.get_submissions()
+    Reads Google Classroom and Aeries and writes every change an import would make to a patch plan file, without
+    writing anything to Aeries. The plan can be reviewed and then sent with run_apply.
+
+    :param plan_path: The file to write the patch plan to.
+
+    See run_import for the other parameters.
+    """
+    google_classroom_data = GoogleClassroomData(periods=periods,
+                                                classroom_service=classroom_service,
+                                                batch_requests=batch_classroom_requests,
+                                                field_masks=classroom_field_masks,
+                                                returned_only=returned_grades_only,
+                                                roster_cache=RosterCache(path=roster_cache_path,
+                                                                         ttl_seconds=roster_cache_ttl_seconds))
+    aeries_data = AeriesData(periods=periods,
+                             s_cookie=s_cookie,
+                             max_workers=max_workers,
+                             html_parser=html_parser,
+                             read_backend=aeries_read_backend)
+    _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data, aeries_data=aeries_data)
+
+    patch_plan = _plan_writes(google_classroom_data=google_classroom_data, aeries_data=aeries_data, periods=periods)
+    save_patch_plan(patch_plan=patch_plan, path=plan_path)
+    click.echo(f'Planned {len(patch_plan.assignment_writes)} assignment write(s) and {len(patch_plan.grade_writes)} '
+               f'grade write(s) in {plan_path}.')
+
+
+def run_apply(plan_path: str,
+              s_cookie: str,
+              max_write_workers: int = DEFAULT_MAX_WRITE_WORKERS,
+              html_parser: str = DEFAULT_HTML_PARSER,
+              write_journal_path: Optional[str] = None) -> None:
+    """
+    Sends the writes of a patch plan made by run_plan to Aeries, without reading Google Classroom or Aeries first.
+
+    :param plan_path: The patch plan file to apply.
+    :param write_journal_path: If supplied, the file every write to Aeries is journaled in, so that an interrupted
+                               apply can be finished with run_import(resume=True).
+
+    See run_import for the other parameters.
+    """
+    patch_plan = load_patch_plan(path=plan_path)
+    write_journal = WriteJournal(path=write_journal_path) if write_journal_path else None
+    with write_journal if write_journal is not None else nullcontext():
+        if write_journal is not None:
+            write_journal.start()
+
+        aeries_data = AeriesData(periods=patch_plan.periods,
+                                 s_cookie=s_cookie,
+                                 max_write_workers=max_write_workers,
+                                 html_parser=html_parser,
+                                 write_journal=write_journal)
+        click.echo(f'Applying {len(patch_plan.assignment_writes)} assignment write(s) and '
+                   f'{len(patch_plan.grade_writes)} grade write(s) from {plan_path}...')
+        assignment_writes = [planned_write.assignment_write for planned_write in patch_plan.assignment_writes]
+        _load_gradebooks_for_assignment_writes(aeries_data=aeries_data, assignment_writes=assignment_writes)
+        _check_assignment_writes_are_current(aeries_data=aeries_data, assignment_writes=assignment_writes)
+        if not _send_writes(aeries_data=aeries_data,
+                            assignment_writes=assignment_writes,
+                            assignment_patch_data=patch_plan.get_assignment_patch_data()):
+            click.echo('Some assignments or grades could not be imported to Aeries. Re-run the importer to retry them.')
+        else:
+            click.echo('The patch plan has been applied. Re-run the importer to validate it.')
+
+
+def _plan_writes(google_classroom_data: GoogleClassroomData, aeries_data: AeriesData, periods: list[int]) -> PatchPlan:
+    """
+    Joins Google Classroom and Aeries like an import, but returns the assignment and grade writes as a patch plan,
+    with the Aeries values they replace, instead of sending them.
+    """
+    # The join updates the local assignments to how they would be after the writes
+    periods_to_old_assignments = {period: dict(aeries_data.periods_to_assignment_information[period])
+                                  for period in periods}
+    assignment_writes = []
+    assignment_patch_data = _join_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                                   aeries_data=aeries_data,
+                                                                   assignment_writes=assignment_writes)
+
+    gradebook_ids_to_periods = {gradebook_id: period
+                                for period, gradebook_id in aeries_data.periods_to_gradebook_ids.items()}
+    gradebook_numbers_to_periods = {_get_gradebook_number(gradebook_id=gradebook_id): period
+                                    for gradebook_id, period in gradebook_ids_to_periods.items()}
+
+    planned_assignment_writes = []
+    for assignment_write in assignment_writes:
+        period = gradebook_numbers_to_periods[assignment_write.gradebook_number]
+        old_assignment = periods_to_old_assignments[period].get(assignment_write.assignment_name)
+        planned_assignment_writes.append(PlannedAssignmentWrite(
+            assignment_write=assignment_write,
+            old_point_total=old_assignment.point_total if old_assignment is not None else None,
+            old_category=old_assignment.category if old_assignment is not None else None
+        ))
+
+    planned_grade_writes = []
+    for gradebook_id, patch_datas in assignment_patch_data.items():
+        assignment_submissions = aeries_data.periods_to_assignment_submissions[gradebook_ids_to_periods[gradebook_id]]
+        planned_grade_writes.extend(
+            PlannedGradeWrite(gradebook_id=gradebook_id,
+                              patch_data=patch_data,
+                              old_score=assignment_submissions.get(patch_data.assignment_number, {})
+                              .get(patch_data.student_num))
+            for patch_data in patch_datas
+        )
+
+    return PatchPlan(periods=periods, assignment_writes=planned_assignment_writes, grade_writes=planned_grade_writes)
+
+
+def _resume_import(aeries_data: AeriesData, write_journal: WriteJournal) -> None:
+    """
+    Sends the writes an interrupted import journaled but never had acknowledged, without reading Google Classroom or
+    Aeries first, so the resumed grades are not validated.
+    """
+    unacknowledged_writes = write_journal.resume()
+    grade_update_count = sum(len(patch_datas) for patch_datas in unacknowledged_writes.assignment_patch_data.values())
+    click.echo(f'Resuming {len(unacknowledged_writes.assignment_writes)} assignment write(s) and {grade_update_count} '
+               f'grade update(s) from the write journal...')
+
+    _load_gradebooks_for_assignment_writes(aeries_data=aeries_data,
+                                           assignment_writes=unacknowledged_writes.assignment_writes)
+    if not _send_writes(aeries_data=aeries_data,
+                        assignment_writes=unacknowledged_writes.assignment_writes,
+                        assignment_patch_data=unacknowledged_writes.assignment_patch_data):
+        click.echo('Some assignments or grades could not be imported to Aeries. Re-run the importer with --resume to '
+                   'retry them.')
+    else:
+        click.echo('The interrupted import has been completed. Re-run the importer without --resume to validate it.')
+
+
+def _load_gradebooks_for_assignment_writes(aeries_data: AeriesData, assignment_writes: list[AssignmentWrite]) -> None:
+    """
+    Loads what sending assignment writes without an import's read phase needs, for just the gradebooks they write to:
+    the gradebook information page, which sets the request verification token the assignment forms are sent with, and
+    the gradebook's assignments, so that creates which already reached Aeries are not sent again.
+    """
+    if not assignment_writes:
+        return
 
-    aeries_data = AeriesData(periods=periods, s_cookie=s_cookie)
     aeries_data.extract_gradebook_ids_from_html()
-    aeries_data.extract_student_ids_to_student_nums_from_html()
-    aeries_data.extract_assignment_information_from_html()
-    aeries_data.extract_assignment_submissions_from_html()
+    gradebook_numbers = {assignment_write.gradebook_number for assignment_write in assignment_writes}
+    aeries_data.periods_to_gradebook_ids = {period: gradebook_id
+                                            for period, gradebook_id in aeries_data.periods_to_gradebook_ids.items()
+                                            if _get_gradebook_number(gradebook_id=gradebook_id) in gradebook_numbers}
+    missing_gradebook_numbers = gradebook_numbers - {_get_gradebook_number(gradebook_id=gradebook_id)
+                                                     for gradebook_id in aeries_data.periods_to_gradebook_ids.values()}
+    if missing_gradebook_numbers:
+        raise ValueError(f'Assignment writes for gradebook(s) {", ".join(sorted(missing_gradebook_numbers))} are not '
+                         'in the periods specified')
+
+    if aeries_data.read_backend == AERIES_READ_BACKEND_API:
+        aeries_data.extract_assignment_information_from_api()
+    else:
+        aeries_data.extract_assignment_information_from_html()
     aeries_data.extract_gradebook_information_from_html()
 
+
+def _send_writes(aeries_data: AeriesData,
+                 assignment_writes: list[AssignmentWrite],
+                 assignment_patch_data: dict[str, list[AssignmentPatchData]]) -> bool:
+    """
+    Sends the assignment creates and updates first, since the grade updates may be for the assignments they create,
+    and then the grade updates. A write that fails is reported without stopping the others, but the grade updates for
+    an assignment that could not be created are not sent.
+
+    :return: Whether every write was accepted.
+    """
+    failed_creates = set()
+    for assignment_write in assignment_writes:
+        if _assignment_write_reached_aeries(aeries_data=aeries_data, assignment_write=assignment_write):
+            click.echo(f'\tAssignment {assignment_write.assignment_name} already exists in gradebook '
+                       f'{assignment_write.gradebook_number}, skipping its creation.')
+            if aeries_data.write_journal is not None:
+                aeries_data.write_journal.acknowledge_assignment_write(assignment_write=assignment_write)
+            continue
+
+        try:
+            aeries_data.send_assignment_write(assignment_write=assignment_write)
+        except (ValueError, requests.RequestsError) as e:
+            click.echo(f'\tAssignment {assignment_write.assignment_name} could not be written to gradebook '
+                       f'{assignment_write.gradebook_number}: {e}')
+            if assignment_write.action == ASSIGNMENT_CREATE:
+                failed_creates.add((assignment_write.gradebook_number, assignment_write.assignment_id))
+
+    sendable_patch_data = {
+        gradebook_id: [patch_data for patch_data in patch_datas
+                       if (_get_gradebook_number(gradebook_id=gradebook_id), patch_data.assignment_number)
+                       not in failed_creates]
+        for gradebook_id, patch_datas in assignment_patch_data.items()
+    }
+    grade_update_summary = aeries_data.update_grades_in_aeries(assignment_patch_data=sendable_patch_data)
+
+    return not (failed_creates or grade_update_summary.failed)
+
+
+def _assignment_write_reached_aeries(aeries_data: AeriesData, assignment_write: AssignmentWrite) -> bool:
+    """
+    Returns whether the assignment write is a create for an assignment that already exists in Aeries under the same
+    number, e.g. one that reached Aeries just before an import was interrupted.
+    """
+    if assignment_write.action != ASSIGNMENT_CREATE:
+        return False
+
+    aeries_assignment = _get_aeries_assignment_for_write(aeries_data=aeries_data, assignment_write=assignment_write)
+    return aeries_assignment is not None and aeries_assignment.id == assignment_write.assignment_id
+
+
+def _check_assignment_writes_are_current(aeries_data: AeriesData, assignment_writes: list[AssignmentWrite]) -> None:
+    """
+    Raises a ValueError if an assignment a patch plan writes now exists in Aeries under a different assignment number,
+    e.g. because it was created in Aeries or by another import after the plan was made. Applying the plan would then
+    create a duplicate assignment or patch the wrong one.
+    """
+    stale_assignment_writes = []
+    for assignment_write in assignment_writes:
+        aeries_assignment = _get_aeries_assignment_for_write(aeries_data=aeries_data, assignment_write=assignment_write)
+        if aeries_assignment is not None and aeries_assignment.id != assignment_write.assignment_id:
+            stale_assignment_writes.append(f'{assignment_write.assignment_name} in gradebook '
+                                           f'{assignment_write.gradebook_number} is assignment {aeries_assignment.id} '
+                                           f'in Aeries, but assignment {assignment_write.assignment_id} in the plan')
+
+    if stale_assignment_writes:
+        raise ValueError('The patch plan is out of date, make a new one:\n' + '\n'.join(stale_assignment_writes))
+
+
+def _get_aeries_assignment_for_write(aeries_data: AeriesData,
+                                     assignment_write: AssignmentWrite) -> Optional[AeriesAssignmentData]:
+    """
+    Returns the loaded Aeries assignment with the assignment write's name in its gradebook, or None if there is none.
+    """
+    for period, gradebook_id in aeries_data.periods_to_gradebook_ids.items():
+        if _get_gradebook_number(gradebook_id=gradebook_id) == assignment_write.gradebook_number:
+            return (aeries_data.periods_to_assignment_information.get(period, {})
+                    .get(assignment_write.assignment_name))
+    return None
+
+
+def _get_gradebook_number(gradebook_id: str) -> str:
+    """
+    Returns the gradebook number of a gradebook id, e.g. '4532451' for '4532451/S'.
+    """
+    return _parse_gradebook_id(gradebook_id=gradebook_id)[0]
+
+
+def _parse_gradebook_id(gradebook_id: str) -> tuple[str, str]:
+    """
+    Splits a gradebook id into its gradebook number and term letter, e.g. ('4532451', 'S') for '4532451/S'.
+    """
+    gradebook_number_match = GRADEBOOK_NUMBER_PATTERN.match(gradebook_id)
+    if not gradebook_number_match:
+        raise ValueError('Expected gradebook number to be of pattern <number>/<S or F>, '
+                         f'but was {gradebook_id}')
+    return gradebook_number_match.group(1), gradebook_number_match.group(2)
+
+
+def _run_pipelined_import(periods: list[int],
+                          create_google_classroom_data: Callable[..., GoogleClassroomData],
+                          create_aeries_data: Callable[..., AeriesData],
+                          max_workers: int,
+                          spot_check_sample_size: int,
+                          classroom_service_per_thread: bool = False,
+                          gradebook_mirror: Optional[GradebookMirror] = None) -> None:
+    """
+    Imports every period on its own: each period is fetched, joined, written and validated independently on a shared
+    pool of max_workers threads. A failure in one period is reported without stopping the other periods.
+
+    The Google Classroom service is not thread-safe, so unless each thread has its own service, Google Classroom
+    fetches for different periods take turns.
+    """
+    google_classroom_lock = None if classroom_service_per_thread else Lock()
+    allocator = AssignmentNumberAllocator()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures_to_periods = {
+            executor.submit(_import_period,
+                            period=period,
+                            create_google_classroom_data=create_google_classroom_data,
+                            create_aeries_data=create_aeries_data,
+                            spot_check_sample_size=spot_check_sample_size,
+                            google_classroom_lock=google_classroom_lock,
+                            allocator=allocator,
+                            gradebook_mirror=gradebook_mirror): period
+            for period in periods
+        }
+
+        failed_periods = []
+        for future, period in futures_to_periods.items():
+            try:
+                future.result()
+            except Exception as e:
+                click.echo(f'Period {period} could not be imported: {e}')
+                failed_periods.append(period)
+
+    if failed_periods:
+        click.echo(f'Periods {", ".join(map(str, failed_periods))} were not imported. '
+                   'Re-run the importer for them once the problem is fixed.')
+
+
+def _import_period(period: int,
+                   create_google_classroom_data: Callable[..., GoogleClassroomData],
+                   create_aeries_data: Callable[..., AeriesData],
+                   spot_check_sample_size: int,
+                   google_classroom_lock: Optional[Lock],
+                   allocator: AssignmentNumberAllocator,
+                   gradebook_mirror: Optional[GradebookMirror] = None) -> None:
+    google_classroom_data = create_google_classroom_data(periods=[period])
+    aeries_data = create_aeries_data(periods=[period])
+    if gradebook_mirror is not None:
+        _fetch_with_gradebook_mirror(google_classroom_data=google_classroom_data,
+                                     aeries_data=aeries_data,
+                                     create_aeries_data=create_aeries_data,
+                                     gradebook_mirror=gradebook_mirror,
+                                     google_classroom_lock=google_classroom_lock)
+    else:
+        _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                aeries_data=aeries_data,
+                                                google_classroom_lock=google_classroom_lock)
+    _write_and_validate_grades(google_classroom_data=google_classroom_data,
+                               aeries_data=aeries_data,
+                               periods=[period],
+                               spot_check_sample_size=spot_check_sample_size,
+                               allocator=allocator,
+                               gradebook_mirror=gradebook_mirror,
+                               google_classroom_lock=google_classroom_lock)
+
+
+def _write_and_validate_grades(google_classroom_data: GoogleClassroomData,
+                               aeries_data: AeriesData,
+                               periods: list[int],
+                               spot_check_sample_size: int,
+                               allocator: Optional[AssignmentNumberAllocator] = None,
+                               gradebook_mirror: Optional[GradebookMirror] = None,
+                               google_classroom_lock: Optional[Lock] = None) -> None:
+    """
+    Writes the grade updates to Aeries and validates the overall grades.
+
+    :param google_classroom_lock: If supplied, held while validation lists rosters from Google Classroom.
+    """
+    gradebook_ids_to_fingerprints = None
+    if gradebook_mirror is not None:
+        gradebook_ids_to_fingerprints = {}
+        for period in periods:
+            gradebook_id = aeries_data.periods_to_gradebook_ids[period]
+            assignment_fingerprints = gradebook_mirror.get_assignment_fingerprints(gradebook_id=gradebook_id)
+            if assignment_fingerprints is not None:
+                gradebook_ids_to_fingerprints[gradebook_id] = assignment_fingerprints
+
     assignment_patch_data = _join_google_classroom_and_aeries_data(
         google_classroom_data=google_classroom_data,
-        aeries_data=aeries_data
+        aeries_data=aeries_data,
+        allocator=allocator,
+        gradebook_ids_to_fingerprints=gradebook_ids_to_fingerprints
     )
 
-    aeries_data.update_grades_in_aeries(assignment_patch_data=assignment_patch_data)
+    grade_update_summary = aeries_data.update_grades_in_aeries(assignment_patch_data=assignment_patch_data)
+
+    if grade_update_summary.failed:
+        click.echo('Some grades could not be imported to Aeries. Re-run the importer to retry them.')
+    else:
+        click.echo('Grades have been successfully imported to Aeries.')
+        google_classroom_data.commit_sync_state()
+
+    if gradebook_mirror is not None:
+        _record_assignment_fingerprints(google_classroom_data=google_classroom_data,
+                                        aeries_data=aeries_data,
+                                        periods=periods,
+                                        grade_update_summary=grade_update_summary,
+                                        gradebook_mirror=gradebook_mirror,
+                                        gradebook_ids_to_fingerprints=gradebook_ids_to_fingerprints)
+        # The local copy of the gradebooks already has the created assignments and the accepted grade updates, so the
+        # next import diffs Google Classroom against the values last synced to Aeries
+        gradebook_mirror.save_aeries_data(aeries_data=aeries_data, periods=periods)
 
-    click.echo('Grades have been successfully imported to Aeries.')
     click.echo('Checking grades for any discrepancies...')
     validator = Validator(
         periods=periods,
         google_classroom_data=google_classroom_data,
-        aeries_data=aeries_data
+        aeries_data=aeries_data,
+        spot_check_sample_size=spot_check_sample_size
     )
     validator.generate_discrepancy_report()
-    validator.log_discrepancies()
+    # Logging the discrepancies may list rosters with the shared Google Classroom service
+    with google_classroom_lock if google_classroom_lock is not None else nullcontext():
+        validator.log_discrepancies()
     click.echo('\nGrades have been validated.')
 
 
+def _record_assignment_fingerprints(google_classroom_data: GoogleClassroomData,
+                                    aeries_data: AeriesData,
+                                    periods: list[int],
+                                    grade_update_summary: GradeUpdateSummary,
+                                    gradebook_mirror: GradebookMirror,
+                                    gradebook_ids_to_fingerprints: dict[str, dict[str, str]]) -> None:
+    """
+    Records the fingerprint of every graded assignment whose grades were all written to Aeries. Assignments with a
+    failed grade update, or missing from the Aeries gradebook, keep their old fingerprint, so that the next import
+    compares them to Aeries again.
+
+    :param gradebook_ids_to_fingerprints: The fingerprints the join skipped assignments with. Gradebooks missing from
+                                          it were fully verified.
+    """
+    failed_assignments = {(failure.gradebook_id, failure.patch_data.assignment_number)
+                          for failure in grade_update_summary.failed}
+
+    for period in periods:
+        gradebook_id = aeries_data.periods_to_gradebook_ids[period]
+        aeries_assignments = aeries_data.periods_to_assignment_information[period]
+        assignment_names_to_fingerprints = {}
+        for google_classroom_assignment in _get_graded_assignments(google_classroom_data=google_classroom_data,
+                                                                   period=period):
+            aeries_assignment = aeries_assignments.get(google_classroom_assignment.assignment_name)
+            if aeries_assignment is None or (gradebook_id, aeries_assignment.id) in failed_assignments:
+                continue
+            assignment_names_to_fingerprints[google_classroom_assignment.assignment_name] = \
+                google_classroom_assignment.fingerprint()
+
+        gradebook_mirror.record_assignment_fingerprints(
+            gradebook_id=gradebook_id,
+            assignment_names_to_fingerprints=assignment_names_to_fingerprints,
+            full_verify=gradebook_id not in gradebook_ids_to_fingerprints
+        )
+
+
+def _fetch_google_classroom_and_aeries_data(google_classroom_data: GoogleClassroomData,
+                                            aeries_data: AeriesData,
+                                            google_classroom_lock: Optional[Lock] = None) -> None:
+    """
+    Fetches the Google Classroom submissions and the Aeries gradebooks at the same time, since neither depends on the
+    other until the join. If either side fails, the other side stops at its next step and the failure is raised.
+
+    :param google_classroom_lock: If supplied, held while fetching from Google Classroom.
+    """
+    cancel_event = Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(_fetch_google_classroom_data,
+                                   google_classroom_data=google_classroom_data,
+                                   cancel_event=cancel_event,
+                                   google_classroom_lock=google_classroom_lock),
+                   executor.submit(_fetch_aeries_data, aeries_data=aeries_data, cancel_event=cancel_event)]
+
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        if any(future.exception() is not None for future in done):
+            cancel_event.set()
+
+    for future in futures:
+        future.result()
+
+
+def _fetch_with_gradebook_mirror(google_classroom_data: GoogleClassroomData,
+                                 aeries_data: AeriesData,
+                                 create_aeries_data: Callable[..., AeriesData],
+                                 gradebook_mirror: GradebookMirror,
+                                 google_classroom_lock: Optional[Lock] = None) -> None:
+    """
+    Fetches the Google Classroom submissions, and loads the Aeries gradebooks from the mirror instead of Aeries. Periods
+    missing from the mirror, and periods whose Google Classroom grades or assignments differ from it, are read from
+    Aeries, since the mirror may be out of date for exactly the cells that are about to be written. Periods whose
+    gradebook is due a full verify are read from Aeries too, so that the full verify catches edits made in Aeries.
+    Periods whose gradebook in Aeries is no longer the mirrored one, e.g. after a term rollover, are read as missing.
+    """
+    _fetch_google_classroom_data(google_classroom_data=google_classroom_data,
+                                 cancel_event=Event(),
+                                 google_classroom_lock=google_classroom_lock)
+
+    # The gradebook list is a single page, and is what the mirrored gradebooks are checked against
+    aeries_data.extract_gradebook_ids_from_html()
+    mirrored_periods = gradebook_mirror.load_aeries_data(aeries_data=aeries_data, periods=aeries_data.periods)
+    periods_to_read = [period for period in aeries_data.periods
+                       if period not in mirrored_periods
+                       or gradebook_mirror.is_full_verify_due(gradebook_id=aeries_data.periods_to_gradebook_ids[period])
+                       or _period_differs_from_aeries(google_classroom_data=google_classroom_data,
+                                                      aeries_data=aeries_data,
+                                                      period=period)]
+    unchanged_periods = [period for period in mirrored_periods if period not in periods_to_read]
+    click.echo(f'Loaded {len(unchanged_periods)} unchanged period(s) from the gradebook mirror.')
+    if not periods_to_read:
+        return
+
+    read_aeries_data = create_aeries_data(periods=periods_to_read)
+    _fetch_aeries_data(aeries_data=read_aeries_data, cancel_event=Event())
+    for period in periods_to_read:
+        aeries_data.periods_to_gradebook_ids[period] = read_aeries_data.periods_to_gradebook_ids[period]
+        aeries_data.periods_to_student_ids_to_student_nums[period] = \
+            read_aeries_data.periods_to_student_ids_to_student_nums[period]
+        aeries_data.periods_to_assignment_information[period] = \
+            read_aeries_data.periods_to_assignment_information[period]
+        aeries_data.periods_to_assignment_submissions[period] = \
+            read_aeries_data.periods_to_assignment_submissions[period]
+        aeries_data.periods_to_gradebook_information[period] = \
+            read_aeries_data.periods_to_gradebook_information[period]
+    # The read periods are the ones that can need assignment writes, which send the token loaded with their gradebooks
+    aeries_data.request_verification_token = read_aeries_data.request_verification_token
+    gradebook_mirror.save_aeries_data(aeries_data=aeries_data, periods=periods_to_read)
+
+
+def _period_differs_from_aeries(google_classroom_data: GoogleClassroomData,
+                                aeries_data: AeriesData,
+                                period: int) -> bool:
+    """
+    Returns whether importing the period would change anything in the given copy of its Aeries gradebook: an assignment
+    to create or patch, a student missing from the roster, or a grade to write.
+    """
+    aeries_assignments = aeries_data.periods_to_assignment_information[period]
+    student_ids_to_student_nums = aeries_data.periods_to_student_ids_to_student_nums[period]
+
+    assignment_submissions = []
+    for google_classroom_assignment in _get_graded_assignments(google_classroom_data=google_classroom_data,
+                                                               period=period):
+        aeries_assignment = aeries_assignments.get(google_classroom_assignment.assignment_name)
+        if (aeries_assignment is None
+                or aeries_assignment.point_total != google_classroom_assignment.point_total
+                or aeries_assignment.category != google_classroom_assignment.category
+                or google_classroom_assignment.submissions.keys() - student_ids_to_student_nums.keys()):
+            return True
+        assignment_submissions.append((aeries_assignment.id, google_classroom_assignment.submissions))
+
+    return PeriodGradeMatrix.build(
+        assignment_submissions=assignment_submissions,
+        aeries_assignment_submissions=aeries_data.periods_to_assignment_submissions[period],
+        student_ids_to_student_nums=student_ids_to_student_nums
+    ).changed_cells().any()
+
+
+def _fetch_google_classroom_data(google_classroom_data: GoogleClassroomData,
+                                 cancel_event: Event,
+                                 google_classroom_lock: Optional[Lock]) -> None:
+    with google_classroom_lock if google_classroom_lock is not None else nullcontext():
+        google_classroom_data.get_submissions(cancel_event=cancel_event)
+
+
+def _fetch_aeries_data(aeries_data: AeriesData, cancel_event: Event) -> None:
+    if aeries_data.read_backend == AERIES_READ_BACKEND_API:
+        extract_gradebooks = (aeries_data.extract_student_ids_to_student_nums_from_api,
+                              aeries_data.extract_assignment_information_from_api,
+                              aeries_data.extract_assignment_submissions_from_api)
+    else:
+        extract_gradebooks = (aeries_data.extract_student_ids_to_student_nums_from_html,
+                              aeries_data.extract_assignment_information_from_html,
+                              aeries_data.extract_assignment_submissions_from_html)
+
+    for extract in (aeries_data.extract_gradebook_ids_from_html,
+                    *extract_gradebooks,
+                    aeries_data.extract_gradebook_information_from_html):
+        if cancel_event.is_set():
+            return
+        extract()
+
+
 def _join_google_classroom_and_aeries_data(
         google_classroom_data: GoogleClassroomData,
-        aeries_data: AeriesData) -> dict[str, list[AssignmentPatchData]]:
+        aeries_data: AeriesData,
+        allocator: Optional[AssignmentNumberAllocator] = None,
+        gradebook_ids_to_fingerprints: Optional[dict[str, dict[str, str]]] = None,
+        assignment_writes: Optional[list[AssignmentWrite]] = None
+) -> dict[str, list[AssignmentPatchData]]:
+    """
+    Matches the Google Classroom assignments to Aeries assignments, creating or updating the Aeries assignments as
+    needed, and returns the grade updates to send to Aeries.
+
+    Assignment numbers for new assignments are reserved before anything is written, so the assignment creates and
+    updates for every period run concurrently.
+
+    :param allocator: The allocator to reserve new assignment numbers from. Defaults to a new allocator.
+    :param gradebook_ids_to_fingerprints: If supplied, mapping of gradebook id to the fingerprint last fully written to
+                                          Aeries for each assignment name. Assignments whose fingerprint is unchanged
+                                          are skipped. Gradebooks missing from it have every assignment compared.
+    :param assignment_writes: If supplied, the assignment creates and updates are appended to it instead of being sent
+                              to Aeries, and the grade updates are for the assignments as they would be after them.
+    :return: Mapping of gradebook id to the grade updates for that gradebook.
+    """
     click.echo('Matching Google Classroom grades to Aeries Assignments...')
-    assignment_patch_data = defaultdict(list)
-    for period, google_classroom_assignments in google_classroom_data.periods_to_assignments.items():
+    if allocator is None:
+        allocator = AssignmentNumberAllocator()
+
+    graded_assignments = []
+    for period in google_classroom_data.periods_to_assignments:
         click.echo(f'\tProcessing Period {period}...')
+        aeries_assignments = aeries_data.periods_to_assignment_information[period]
         gradebook_id = aeries_data.periods_to_gradebook_ids[period]
-
-        next_assignment_id = max(map(lambda x: x.id,
-                                     aeries_data.periods_to_assignment_information[period].values())) + 1
-
-        for google_classroom_assignment in google_classroom_assignments:
-            # Do not process this assignment if there are no submissions or if the assignment is not graded
-            if (not google_classroom_assignment.submissions or
-                    not any(map(lambda x: x is not None, google_classroom_assignment.submissions.values()))):
-                continue
-
-            aeries_assignment, next_assignment_id = _get_or_create_aeries_assignment(
-                google_classroom_assignment=google_classroom_assignment,
-                aeries_data=aeries_data,
-                period=period,
-                next_assignment_id=next_assignment_id
+        period_graded_assignments = _get_graded_assignments(google_classroom_data=google_classroom_data, period=period)
+        if gradebook_ids_to_fingerprints is not None:
+            period_graded_assignments = _get_changed_assignments(
+                google_classroom_assignments=period_graded_assignments,
+                aeries_assignments=aeries_assignments,
+                assignment_fingerprints=gradebook_ids_to_fingerprints.get(gradebook_id)
             )
+        allocator.reserve(
+            gradebook_id=gradebook_id,
+            existing_numbers=map(lambda x: x.id, aeries_assignments.values()),
+            assignment_names=[google_classroom_assignment.assignment_name
+                              for google_classroom_assignment in period_graded_assignments
+                              if google_classroom_assignment.assignment_name not in aeries_assignments]
+        )
+        graded_assignments.extend((period, google_classroom_assignment)
+                                  for google_classroom_assignment in period_graded_assignments)
+
+    if assignment_writes is None:
+        with ThreadPoolExecutor(max_workers=aeries_data.max_write_workers) as executor:
+            futures = [executor.submit(_get_or_create_aeries_assignment,
+                                       google_classroom_assignment=google_classroom_assignment,
+                                       aeries_data=aeries_data,
+                                       period=period,
+                                       allocator=allocator)
+                       for period, google_classroom_assignment in graded_assignments]
+            matched_aeries_assignments = [future.result() for future in futures]
+    else:
+        matched_aeries_assignments = [
+            _plan_aeries_assignment(google_classroom_assignment=google_classroom_assignment,
+                                    aeries_data=aeries_data,
+                                    period=period,
+                                    allocator=allocator,
+                                    assignment_writes=assignment_writes)
+            for period, google_classroom_assignment in graded_assignments
+        ]
+
+    periods_to_assignment_submissions = defaultdict(list)
+    for (period, google_classroom_assignment), aeries_assignment in zip(graded_assignments,
+                                                                            matched_aeries_assignments):
+        # Keep the local copy of the gradebook current so that overall grades can be calculated without Aeries
+        aeries_data.periods_to_assignment_information[period][google_classroom_assignment.assignment_name] = \
+            aeries_assignment
+        periods_to_assignment_submissions[period].append((aeries_assignment.id,
+                                                          google_classroom_assignment.submissions))
 
-            assignment_patch_data[gradebook_id].extend(
-                _generate_patch_data_for_assignment(
-                    google_classroom_data=google_classroom_data,
-                    google_classroom_submissions=google_classroom_assignment.submissions,
-                    aeries_data=aeries_data,
-                    aeries_assignment_id=aeries_assignment.id,
-                    period=period
-                )
+    assignment_patch_data = defaultdict(list)
+    for period, assignment_submissions in periods_to_assignment_submissions.items():
+        assignment_patch_data[aeries_data.periods_to_gradebook_ids[period]].extend(
+            _generate_patch_data_for_period(
+                google_classroom_data=google_classroom_data,
+                assignment_submissions=assignment_submissions,
+                aeries_data=aeries_data,
+                period=period
             )
+        )
 
     return assignment_patch_data
 
 
+def _get_graded_assignments(google_classroom_data: GoogleClassroomData, period: int) -> list[GoogleClassroomAssignment]:
+    """
+    Returns the period's Google Classroom assignments that need to be imported.
+    """
+    changed_assignment_names = google_classroom_data.periods_to_changed_assignment_names.get(period)
+    return [
+        google_classroom_assignment
+        for google_classroom_assignment in google_classroom_data.periods_to_assignments[period]
+        # Do not process this assignment if there are no submissions or if the assignment is not graded
+        if google_classroom_assignment.submissions
+        and any(map(lambda x: x is not None, google_classroom_assignment.submissions.values()))
+        # In an incremental import, assignments unchanged since the last import are already in Aeries
+        and (changed_assignment_names is None
+             or google_classroom_assignment.assignment_name in changed_assignment_names)
+    ]
+
+
+def _get_changed_assignments(google_classroom_assignments: list[GoogleClassroomAssignment],
+                             aeries_assignments: dict[str, AeriesAssignmentData],
+                             assignment_fingerprints: Optional[dict[str, str]]) -> list[GoogleClassroomAssignment]:
+    """
+    Returns the assignments whose fingerprint differs from the one last fully written to Aeries. Without fingerprints,
+    the gradebook is due a full verify and every assignment is returned.
+
+    An assignment with an unchanged fingerprint is still returned if it is missing from the Aeries gradebook or its
+    point total or category there no longer match, e.g. because it was deleted or edited in Aeries.
+    """
+    if assignment_fingerprints is None:
+        click.echo('\t\tComparing every assignment to Aeries for a full verify...')
+        return google_classroom_assignments
+
+    changed_assignments = []
+    for google_classroom_assignment in google_classroom_assignments:
+        aeries_assignment = aeries_assignments.get(google_classroom_assignment.assignment_name)
+        if (aeries_assignment is None
+                or aeries_assignment.point_total != google_classroom_assignment.point_total
+                or aeries_assignment.category != google_classroom_assignment.category
+                or assignment_fingerprints.get(google_classroom_assignment.assignment_name)
+                != google_classroom_assignment.fingerprint()):
+            changed_assignments.append(google_classroom_assignment)
+    click.echo(f'\t\tSkipping {len(google_classroom_assignments) - len(changed_assignments)} assignment(s) unchanged '
+               f'since they were last imported.')
+    return changed_assignments
+
+
 def _get_or_create_aeries_assignment(
         google_classroom_assignment: GoogleClassroomAssignment,
         aeries_data: AeriesData,
         period: int,
-        next_assignment_id: int) -> tuple[AeriesAssignmentData, int]:
+        allocator: AssignmentNumberAllocator) -> AeriesAssignmentData:
     """
-    Gets or creates an Aeries assignment based on the Google Classroom assignment data. Also returns the next id
-    to use for creating an assignment.
+    Gets or creates an Aeries assignment based on the Google Classroom assignment data. New assignments are created
+    with the assignment number reserved for them by the allocator.
     """
-    assignment_name = google_classroom_assignment.assignment_name
-    end_term_dates = aeries_data.periods_to_gradebook_information[period].end_term_dates
-    categories = aeries_data.periods_to_gradebook_information[period].categories
-    aeries_assignments = aeries_data.periods_to_assignment_information[period]
-    gradebook_id = aeries_data.periods_to_gradebook_ids[period]
+    assignment_write = _get_aeries_assignment_write(google_classroom_assignment=google_classroom_assignment,
+                                                    aeries_data=aeries_data,
+                                                    period=period,
+                                                    allocator=allocator)
+    if assignment_write is None:
+        return aeries_data.periods_to_assignment_information[period][google_classroom_assignment.assignment_name]
 
-    if assignment_name not in aeries_assignments:
-        gradebook_number_match = GRADEBOOK_NUMBER_PATTERN.match(gradebook_id)
-
-        if not gradebook_number_match:
-            raise ValueError('Expected gradebook number to be of pattern <number>/<S or F>, '
-                             f'but was {gradebook_id}')
-
-        gradebook_number = gradebook_number_match.group(1)
-        term_letter = gradebook_number_match.group(2)
-        aeries_assignment = aeries_data.create_aeries_assignment(
-            gradebook_number=gradebook_number,
-            assignment_id=next_assignment_id,
-            assignment_name=assignment_name,
-            point_total=google_classroom_assignment.point_total,
-            category=categories[google_classroom_assignment.category],
-            end_term_date=end_term_dates[term_letter])
-        next_assignment_id += 1
-    else:
-        aeries_assignment = aeries_assignments[assignment_name]
+    return aeries_data.send_assignment_write(assignment_write=assignment_write)
+
+
+def _plan_aeries_assignment(
+        google_classroom_assignment: GoogleClassroomAssignment,
+        aeries_data: AeriesData,
+        period: int,
+        allocator: AssignmentNumberAllocator,
+        assignment_writes: list[AssignmentWrite]) -> AeriesAssignmentData:
+    """
+    Like _get_or_create_aeries_assignment, but appends the assignment create or update to assignment_writes instead of
+    sending it, and returns the Aeries assignment as it would be after the write.
+    """
+    assignment_write = _get_aeries_assignment_write(google_classroom_assignment=google_classroom_assignment,
+                                                    aeries_data=aeries_data,
+                                                    period=period,
+                                                    allocator=allocator)
+    if assignment_write is None:
+        return aeries_data.periods_to_assignment_information[period][google_classroom_assignment.assignment_name]
 
-        if (aeries_assignment.point_total != google_classroom_assignment.point_total
-                or aeries_assignment.category != google_classroom_assignment.category):
-            gradebook_number_match = GRADEBOOK_NUMBER_PATTERN.match(gradebook_id)
+    assignment_writes.append(assignment_write)
+    return AeriesAssignmentData(id=assignment_write.assignment_id,
+                                point_total=assignment_write.point_total,
+                                category=assignment_write.category.name)
 
-            if not gradebook_number_match:
-                raise ValueError('Expected gradebook number to be of pattern <number>/<S or F>, '
-                                 f'but was {gradebook_id}')
 
-            gradebook_number = gradebook_number_match.group(1)
-            term_letter = gradebook_number_match.group(2)
+def _get_aeries_assignment_write(
+        google_classroom_assignment: GoogleClassroomAssignment,
+        aeries_data: AeriesData,
+        period: int,
+        allocator: AssignmentNumberAllocator) -> Optional[AssignmentWrite]:
+    """
+    Returns the assignment create or update that makes the Aeries assignment match the Google Classroom assignment, or
+    None if the Aeries assignment already matches.
+    """
+    assignment_name = google_classroom_assignment.assignment_name
+    aeries_assignments = aeries_data.periods_to_assignment_information[period]
+    gradebook_id = aeries_data.periods_to_gradebook_ids[period]
 
-            aeries_assignment = aeries_data.patch_aeries_assignment(
-                gradebook_number=gradebook_number,
-                assignment_id=aeries_assignment.id,
-                assignment_name=assignment_name,
-                point_total=google_classroom_assignment.point_total,
-                category=categories[google_classroom_assignment.category],
-                end_term_date=end_term_dates[term_letter])
+    aeries_assignment = aeries_assignments.get(assignment_name)
+    if (aeries_assignment is not None
+            and aeries_assignment.point_total == google_classroom_assignment.point_total
+            and aeries_assignment.category == google_classroom_assignment.category):
+        return None
+
+    gradebook_number, term_letter = _parse_gradebook_id(gradebook_id=gradebook_id)
+    if aeries_assignment is None:
+        action = ASSIGNMENT_CREATE
+        assignment_id = allocator.reserve(gradebook_id=gradebook_id,
+                                          existing_numbers=map(lambda x: x.id, aeries_assignments.values()),
+                                          assignment_names=[assignment_name])[assignment_name]
+    else:
+        action = ASSIGNMENT_PATCH
+        assignment_id = aeries_assignment.id
 
-    return aeries_assignment, next_assignment_id
+    gradebook_information = aeries_data.periods_to_gradebook_information[period]
+    return AssignmentWrite(action=action,
+                           gradebook_number=gradebook_number,
+                           assignment_id=assignment_id,
+                           assignment_name=assignment_name,
+                           point_total=google_classroom_assignment.point_total,
+                           category=gradebook_information.categories[google_classroom_assignment.category],
+                           end_term_date=gradebook_information.end_term_dates[term_letter])
 
 
-def _generate_patch_data_for_assignment(
+def _generate_patch_data_for_period(
         google_classroom_data: GoogleClassroomData,
-        google_classroom_submissions: dict[int, Optional[float]],
+        assignment_submissions: list[tuple[int, dict[int, Optional[float]]]],
         aeries_data: AeriesData,
-        aeries_assignment_id: int,
         period: int) -> list[AssignmentPatchData]:
-    patch_data = []
-    aeries_submissions = (aeries_data.periods_to_assignment_submissions[period]
-                          .get(aeries_assignment_id, {}))
-    student_ids_to_student_nums = aeries_data.periods_to_student_ids_to_student_nums[period]
+    """
+    Compares the period's Google Classroom grades to its Aeries scores as one student by assignment matrix, and
+    returns the grade updates assignment by assignment.
 
-    for student_id, grade in google_classroom_submissions.items():
-        if student_id not in student_ids_to_student_nums:
-            student_name = google_classroom_data.user_ids_to_names[student_id]
+    :param assignment_submissions: Each assignment's Aeries assignment number and its Google Classroom submissions.
+    """
+    student_ids_to_student_nums = aeries_data.periods_to_student_ids_to_student_nums[period]
+    for _, google_classroom_submissions in assignment_submissions:
+        unenrolled_student_ids = google_classroom_submissions.keys() - student_ids_to_student_nums.keys()
+        if unenrolled_student_ids:
+            student_name = google_classroom_data.user_ids_to_names[min(unenrolled_student_ids)]
             raise ValueError(f'Student {student_name} found in Google Classroom who is not enrolled in the Aeries '
                              'roster. Please check Aeries if they need to added to the class, or if they should be '
                              'dropped from the Google Classroom roster.')
 
-        student_num = student_ids_to_student_nums[student_id]
-        if len(aeries_submissions) == 0:
-            patch_data.append(AssignmentPatchData(student_num=student_num,
-                                                  assignment_number=aeries_assignment_id,
-                                                  grade=grade))
-            continue
-
-        aeries_score = aeries_submissions[student_num]
-        if grade is None:
-            if aeries_score != '':
-                patch_data.append(AssignmentPatchData(student_num=student_num,
-                                                      assignment_number=aeries_assignment_id,
-                                                      grade=grade))
-        elif grade == 0:
-            if aeries_score != 'MI':
-                patch_data.append(AssignmentPatchData(student_num=student_num,
-                                                      assignment_number=aeries_assignment_id,
-                                                      grade=grade))
-        elif aeries_score == '' or aeries_score == 'N/A' or aeries_score == 'MI' or grade != float(aeries_score):
-            patch_data.append(AssignmentPatchData(student_num=student_num,
-                                                  assignment_number=aeries_assignment_id,
-                                                  grade=grade))
-
-    return patch_data
+    return PeriodGradeMatrix.build(
+        assignment_submissions=assignment_submissions,
+        aeries_assignment_submissions=aeries_data.periods_to_assignment_submissions[period],
+        student_ids_to_student_nums=student_ids_to_student_nums
+    ).generate_patch_data()
@@ -1,13 +1,21 @@
+import json
 import os.path
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Optional
 
 import click
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 
-from importer import run_import
+from constants import (AERIES_READ_BACKEND_API, AERIES_READ_BACKEND_HTML, DEFAULT_AERIES_READ_BACKEND,
+                       DEFAULT_FULL_VERIFY_INTERVAL_SECONDS, DEFAULT_HTML_PARSER, DEFAULT_MAX_CLASSROOM_WORKERS,
+                       DEFAULT_MAX_STUDENT_WORKERS, DEFAULT_MAX_WORKERS, DEFAULT_MAX_WRITE_WORKERS,
+                       DEFAULT_SPOT_CHECK_SAMPLE_SIZE, HTML_PARSER_BUILTIN, HTML_PARSER_LXML, HTML_PARSER_SELECTOLAX)
+from roster_cache import DEFAULT_ROSTER_CACHE_TTL_SECONDS
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+# The Google client libraries, the importer and the modules it uses are slow to import, so they are imported by the
+# functions that need them rather than here. This keeps the CLI's startup, and its prompts, fast.
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/classroom.coursework.students',
@@ -16,11 +24,16 @@ SCOPES = ['https://www.googleapis.com/auth/classroom.coursework.students',
           'https://www.googleapis.com/auth/classroom.profile.emails']
 
 
-def authenticate() -> Credentials:
+def authenticate() -> 'Credentials':
     """
     Authenticates and refreshes credentials for accessing Google services.
     :return: The credentials for interacting with Google apps.
     """
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -45,6 +58,34 @@ def authenticate() -> Credentials:
     return creds
 
 
+@lru_cache(maxsize=None)
+def _get_classroom_discovery_document() -> Optional[dict]:
+    """
+    Returns the Google Classroom discovery document bundled with the Google API client, parsed once per run instead of
+    once per service, or None if the client does not bundle it.
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    discovery_document = get_static_doc(serviceName='classroom', version='v1')
+    return json.loads(discovery_document) if discovery_document is not None else None
+
+
+def _build_classroom_service(credentials: 'Credentials'):
+    """
+    Builds a Google Classroom service with its own HTTP transport, so that it can be used on a different thread from
+    every other service built from the same credentials.
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.discovery import build, build_from_document
+
+    http = AuthorizedHttp(credentials, http=httplib2.Http())
+    discovery_document = _get_classroom_discovery_document()
+    if discovery_document is None:
+        return build(serviceName='classroom', version='v1', http=http, static_discovery=False)
+    return build_from_document(discovery_document, http=http)
+
+
 def _split_periods(periods: str) -> list[int]:
     period_nums = []
 
@@ -59,15 +100,103 @@ def _split_periods(periods: str) -> list[int]:
     return period_nums
 
 
+# Options shared by the import, plan and apply commands
+PERIODS_OPTION = click.option('--periods', metavar='<comma-separated-period-nums>', prompt=True)
+S_COOKIE_OPTION = click.option('--s-cookie', prompt=True)
+MAX_WORKERS_OPTION = click.option(
+    '--max-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_WORKERS, show_default=True,
+    help='Maximum number of periods to fetch from Aeries at once.'
+)
+MAX_WRITE_WORKERS_OPTION = click.option(
+    '--max-write-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_WRITE_WORKERS, show_default=True,
+    help='Maximum number of grade updates to have in flight to Aeries at once.'
+)
+HTML_PARSER_OPTION = click.option(
+    '--html-parser', type=click.Choice([HTML_PARSER_BUILTIN, HTML_PARSER_LXML, HTML_PARSER_SELECTOLAX]),
+    default=DEFAULT_HTML_PARSER, show_default=True,
+    help='Parser backend for Aeries pages.'
+)
+BATCH_CLASSROOM_REQUESTS_OPTION = click.option(
+    '--batch-classroom-requests/--no-batch-classroom-requests', default=False, show_default=True,
+    help='Send Google Classroom list calls for all periods as batch requests.'
+)
+CLASSROOM_FIELD_MASKS_OPTION = click.option(
+    '--classroom-field-masks/--no-classroom-field-masks', default=True, show_default=True,
+    help='Request only the fields the importer reads from Google Classroom.'
+)
+RETURNED_GRADES_ONLY_OPTION = click.option(
+    '--returned-grades-only/--all-grades', default=False, show_default=True,
+    help='Only import grades that have been returned to students in Google Classroom.'
+)
+ROSTER_CACHE_OPTION = click.option(
+    '--roster-cache', type=click.Path(dir_okay=False), default=None,
+    help='File to cache Google Classroom course ids and rosters in across runs.'
+)
+ROSTER_CACHE_TTL_OPTION = click.option(
+    '--roster-cache-ttl', type=click.IntRange(min=0), default=DEFAULT_ROSTER_CACHE_TTL_SECONDS, show_default=True,
+    help='Number of seconds a cached course list or roster is used before it is fetched again.'
+)
+AERIES_READ_BACKEND_OPTION = click.option(
+    '--aeries-read-backend', type=click.Choice([AERIES_READ_BACKEND_HTML, AERIES_READ_BACKEND_API]),
+    default=DEFAULT_AERIES_READ_BACKEND, show_default=True,
+    help='Read Aeries rosters, assignments and scores from the scoresByClass page or the teacher API. Gradebooks the '
+         'API cannot be read for fall back to the scoresByClass page.'
+)
+
+
 @click.command()
-@click.option('--periods', metavar='<comma-separated-period-nums>', prompt=True)
-@click.option('--s-cookie', prompt=True)
-def run_aeries_importer(periods: str, s_cookie: str):
+@PERIODS_OPTION
+@S_COOKIE_OPTION
+@MAX_WORKERS_OPTION
+@MAX_WRITE_WORKERS_OPTION
+@HTML_PARSER_OPTION
+@click.option('--spot-check-sample-size', type=click.IntRange(min=0), default=DEFAULT_SPOT_CHECK_SAMPLE_SIZE,
+              show_default=True,
+              help='Number of students per period whose locally calculated overall grade is checked against Aeries.')
+@click.option('--max-student-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_STUDENT_WORKERS,
+              show_default=True,
+              help='Maximum number of student overall grade pages to fetch from Aeries at once.')
+@click.option('--pipeline/--no-pipeline', default=False, show_default=True,
+              help='Import each period independently, writing grades for a period as soon as it has been fetched.')
+@BATCH_CLASSROOM_REQUESTS_OPTION
+@CLASSROOM_FIELD_MASKS_OPTION
+@RETURNED_GRADES_ONLY_OPTION
+@ROSTER_CACHE_OPTION
+@ROSTER_CACHE_TTL_OPTION
+@click.option('--sync-state', type=click.Path(dir_okay=False), default=None,
+              help='File to keep the latest imported Google Classroom update times in. When supplied, only '
+                   'assignments updated in Google Classroom since the last successful import are written to Aeries.')
+@click.option('--max-classroom-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_CLASSROOM_WORKERS,
+              show_default=True,
+              help='Maximum number of periods to fetch from Google Classroom at once.')
+@AERIES_READ_BACKEND_OPTION
+@click.option('--gradebook-mirror', type=click.Path(dir_okay=False), default=None,
+              help='SQLite file to mirror Google Classroom and Aeries gradebooks in across runs. When supplied, only '
+                   'periods whose Google Classroom grades differ from the mirror are read from Aeries, and only '
+                   'assignments changed since they were last imported are compared to Aeries.')
+@click.option('--full-verify-interval', type=click.IntRange(min=0), default=DEFAULT_FULL_VERIFY_INTERVAL_SECONDS,
+              show_default=True,
+              help='Number of seconds after which every assignment of a mirrored gradebook is compared to Aeries '
+                   'again, to catch edits made in Aeries. Only used with --gradebook-mirror.')
+@click.option('--write-journal', type=click.Path(dir_okay=False), default=None,
+              help='File to journal every write to Aeries in before it is sent. If the importer is interrupted, the '
+                   'import can be finished with --resume.')
+@click.option('--resume', is_flag=True, default=False,
+              help='Finish the interrupted import journaled in --write-journal, sending only the writes Aeries never '
+                   'acknowledged without reading Google Classroom or Aeries first.')
+def run_aeries_importer(periods: str, s_cookie: str, max_workers: int, max_write_workers: int, html_parser: str,
+                        spot_check_sample_size: int, max_student_workers: int, pipeline: bool,
+                        batch_classroom_requests: bool, classroom_field_masks: bool, returned_grades_only: bool,
+                        roster_cache: Optional[str], roster_cache_ttl: int, sync_state: Optional[str],
+                        max_classroom_workers: int, aeries_read_backend: str, gradebook_mirror: Optional[str],
+                        full_verify_interval: int, write_journal: Optional[str], resume: bool):
     """
     Runs the CLI for importing grades from Google Classroom to Aeries.
     """
+    from importer import run_import
+
     creds = authenticate()
-    classroom_service = build(serviceName='classroom', version='v1', credentials=creds)
+    classroom_service = _build_classroom_service(credentials=creds)
 
     periods_list = _split_periods(periods=periods)
     # This is buggy
@@ -76,4 +205,83 @@ def run_aeries_importer(periods: str, s_cookie: str):
 
     run_import(classroom_service=classroom_service,
                periods=periods_list,
-               s_cookie=s_cookie)
+               s_cookie=s_cookie,
+               max_workers=max_workers,
+               max_write_workers=max_write_workers,
+               html_parser=html_parser,
+               spot_check_sample_size=spot_check_sample_size,
+               max_student_workers=max_student_workers,
+               pipeline=pipeline,
+               batch_classroom_requests=batch_classroom_requests,
+               classroom_field_masks=classroom_field_masks,
+               returned_grades_only=returned_grades_only,
+               roster_cache_path=roster_cache,
+               roster_cache_ttl_seconds=roster_cache_ttl,
+               sync_state_path=sync_state,
+               create_classroom_service=partial(_build_classroom_service, credentials=creds),
+               max_classroom_workers=max_classroom_workers,
+               aeries_read_backend=aeries_read_backend,
+               gradebook_mirror_path=gradebook_mirror,
+               full_verify_interval_seconds=full_verify_interval,
+               write_journal_path=write_journal,
+               resume=resume)
+
+
+@click.command()
+@PERIODS_OPTION
+@S_COOKIE_OPTION
+@click.option('--plan', type=click.Path(dir_okay=False), required=True,
+              help='File to write the patch plan to.')
+@MAX_WORKERS_OPTION
+@HTML_PARSER_OPTION
+@BATCH_CLASSROOM_REQUESTS_OPTION
+@CLASSROOM_FIELD_MASKS_OPTION
+@RETURNED_GRADES_ONLY_OPTION
+@ROSTER_CACHE_OPTION
+@ROSTER_CACHE_TTL_OPTION
+@AERIES_READ_BACKEND_OPTION
+def plan_aeries_import(periods: str, s_cookie: str, plan: str, max_workers: int, html_parser: str,
+                       batch_classroom_requests: bool, classroom_field_masks: bool, returned_grades_only: bool,
+                       roster_cache: Optional[str], roster_cache_ttl: int, aeries_read_backend: str):
+    """
+    Writes every change an import would make to Aeries to a patch plan file, without changing Aeries.
+    """
+    from importer import run_plan
+
+    classroom_service = _build_classroom_service(credentials=authenticate())
+
+    run_plan(classroom_service=classroom_service,
+             periods=_split_periods(periods=periods),
+             s_cookie=s_cookie,
+             plan_path=plan,
+             max_workers=max_workers,
+             html_parser=html_parser,
+             batch_classroom_requests=batch_classroom_requests,
+             classroom_field_masks=classroom_field_masks,
+             returned_grades_only=returned_grades_only,
+             roster_cache_path=roster_cache,
+             roster_cache_ttl_seconds=roster_cache_ttl,
+             aeries_read_backend=aeries_read_backend)
+
+
+@click.command()
+@click.option('--plan', type=click.Path(exists=True, dir_okay=False), required=True,
+              help='Patch plan file written by aeries-importer-plan.')
+@S_COOKIE_OPTION
+@MAX_WRITE_WORKERS_OPTION
+@HTML_PARSER_OPTION
+@click.option('--write-journal', type=click.Path(dir_okay=False), default=None,
+              help='File to journal every write to Aeries in before it is sent. If the apply is interrupted, it can be '
+                   'finished with aeries-importer --write-journal <file> --resume.')
+def apply_aeries_import(plan: str, s_cookie: str, max_write_workers: int, html_parser: str,
+                        write_journal: Optional[str]):
+    """
+    Sends the changes in a patch plan file to Aeries, without reading Google Classroom or Aeries first.
+    """
+    from importer import run_apply
+
+    run_apply(plan_path=plan,
+              s_cookie=s_cookie,
+              max_write_workers=max_write_workers,
+              html_parser=html_parser,
+              write_journal_path=write_journal)
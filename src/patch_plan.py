@@ -0,0 +1,101 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from aeries_utils import AssignmentPatchData, AssignmentWrite
+from write_journal import assignment_write_from_json, assignment_write_to_json
+
+PATCH_PLAN_VERSION = 1
+
+
+@dataclass(frozen=True)
+class PlannedAssignmentWrite:
+    assignment_write: AssignmentWrite
+    # The Aeries assignment's point total and category before an update, None for a create
+    old_point_total: Optional[int]
+    old_category: Optional[str]
+
+
+@dataclass(frozen=True)
+class PlannedGradeWrite:
+    gradebook_id: str
+    patch_data: AssignmentPatchData
+    # The Aeries score before the write, None if the student had no score
+    old_score: Optional[str]
+
+
+@dataclass(frozen=True)
+class PatchPlan:
+    """
+    Every write an import would send to Aeries, computed without sending any of them: the assignment creates and
+    updates, then the grade writes, each with the Aeries value it replaces.
+
+    :param periods: The periods the plan was computed for.
+    :param assignment_writes: The assignment creates and updates, which must be sent before the grade writes.
+    :param grade_writes: The grade writes, gradebook by gradebook.
+    """
+    periods: list[int]
+    assignment_writes: list[PlannedAssignmentWrite]
+    grade_writes: list[PlannedGradeWrite]
+
+    def get_assignment_patch_data(self) -> dict[str, list[AssignmentPatchData]]:
+        """
+        Returns the grade writes in the form update_grades_in_aeries takes them.
+        """
+        assignment_patch_data = {}
+        for grade_write in self.grade_writes:
+            assignment_patch_data.setdefault(grade_write.gradebook_id, []).append(grade_write.patch_data)
+        return assignment_patch_data
+
+
+def save_patch_plan(patch_plan: PatchPlan, path: str) -> None:
+    """
+    Writes the plan as JSON. Grade writes are stored as rows grouped by gradebook, which keeps plans with thousands
+    of grade writes small enough to review.
+    """
+    gradebook_ids_to_rows = {}
+    for grade_write in patch_plan.grade_writes:
+        gradebook_ids_to_rows.setdefault(grade_write.gradebook_id, []).append(
+            [grade_write.patch_data.assignment_number, grade_write.patch_data.student_num, grade_write.old_score,
+             grade_write.patch_data.grade]
+        )
+
+    contents = {
+        'version': PATCH_PLAN_VERSION,
+        'periods': patch_plan.periods,
+        'assignment_writes': [{**assignment_write_to_json(assignment_write=planned_write.assignment_write),
+                               'old_point_total': planned_write.old_point_total,
+                               'old_category': planned_write.old_category}
+                              for planned_write in patch_plan.assignment_writes],
+        # Each row is [assignment number, student number, old score, new grade]
+        'grade_writes': gradebook_ids_to_rows
+    }
+
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as plan_file:
+        json.dump(contents, plan_file, separators=(',', ':'))
+    os.replace(temporary_path, path)
+
+
+def load_patch_plan(path: str) -> PatchPlan:
+    with open(path) as plan_file:
+        contents = json.load(plan_file)
+
+    if contents.get('version') != PATCH_PLAN_VERSION:
+        raise ValueError(f'Patch plan {path} is not a version {PATCH_PLAN_VERSION} patch plan')
+
+    return PatchPlan(
+        periods=contents['periods'],
+        assignment_writes=[PlannedAssignmentWrite(assignment_write=assignment_write_from_json(entry=entry),
+                                                  old_point_total=entry['old_point_total'],
+                                                  old_category=entry['old_category'])
+                           for entry in contents['assignment_writes']],
+        grade_writes=[PlannedGradeWrite(gradebook_id=gradebook_id,
+                                        patch_data=AssignmentPatchData(student_num=student_num,
+                                                                       assignment_number=assignment_number,
+                                                                       grade=grade),
+                                        old_score=old_score)
+                      for gradebook_id, rows in contents['grade_writes'].items()
+                      for assignment_number, student_num, old_score, grade in rows]
+    )
@@ -0,0 +1,150 @@
+import json
+import os
+from dataclasses import dataclass
+from threading import Lock
+from time import time
+from typing import Iterable, Optional
+
+import click
+
+DEFAULT_ROSTER_CACHE_TTL_SECONDS = 24 * 60 * 60
+ROSTER_CACHE_VERSION = 2
+
+
+@dataclass(frozen=True)
+class CachedCourse:
+    course_id: int
+    fetched_at: float
+
+
+@dataclass(frozen=True)
+class CourseRoster:
+    user_ids_to_student_ids: dict[int, int]
+    student_ids_to_names: dict[int, str]
+    fetched_at: float
+
+
+class RosterCache:
+    """
+    Holds the Google Classroom course ids and course rosters fetched during a run, so they are only listed once.
+    If a path is supplied, the cache is also loaded from and saved to that file, and entries fetched by an earlier run
+    are reused until they are older than ttl_seconds.
+
+    The cache may be shared by several GoogleClassroomData objects that are used from different threads.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = DEFAULT_ROSTER_CACHE_TTL_SECONDS) -> None:
+        """
+        :param path: The JSON file to keep the cache in across runs. If not supplied, the cache only lasts for the run.
+        :param ttl_seconds: How long a cached course list or roster is used before it is fetched again.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.lock = Lock()
+        self.periods_to_courses: dict[int, CachedCourse] = {}
+        self.course_ids_to_rosters: dict[int, CourseRoster] = {}
+
+        if path is not None:
+            self._load()
+
+    def get_periods_to_course_ids(self, periods: Iterable[int]) -> Optional[dict[int, int]]:
+        """
+        Returns the cached period number to course id mapping for the periods, or None if any period is missing or
+        stale.
+        """
+        with self.lock:
+            periods_to_courses = {period: self.periods_to_courses.get(period) for period in periods}
+            if any(course is None or not self._is_fresh(course.fetched_at) for course in periods_to_courses.values()):
+                return None
+            return {period: course.course_id for period, course in periods_to_courses.items()}
+
+    def set_periods_to_course_ids(self, periods_to_course_ids: dict[int, int]) -> None:
+        """
+        Caches the course ids of the periods, keeping the cached course ids of any other periods.
+        """
+        fetched_at = time()
+        with self.lock:
+            self.periods_to_courses.update({period: CachedCourse(course_id=course_id, fetched_at=fetched_at)
+                                            for period, course_id in periods_to_course_ids.items()})
+
+    def get_roster(self, course_id: int) -> Optional[CourseRoster]:
+        """
+        Returns the cached roster for the course, or None if it is missing or stale.
+        """
+        with self.lock:
+            roster = self.course_ids_to_rosters.get(course_id)
+            if roster is None or not self._is_fresh(roster.fetched_at):
+                return None
+            return roster
+
+    def set_roster(self,
+                   course_id: int,
+                   user_ids_to_student_ids: dict[int, int],
+                   student_ids_to_names: dict[int, str]) -> CourseRoster:
+        roster = CourseRoster(user_ids_to_student_ids=dict(user_ids_to_student_ids),
+                              student_ids_to_names=dict(student_ids_to_names),
+                              fetched_at=time())
+        with self.lock:
+            self.course_ids_to_rosters[course_id] = roster
+        return roster
+
+    def save(self) -> None:
+        """
+        Writes the cache to its file, if it has one.
+        """
+        if self.path is None:
+            return
+
+        with self.lock:
+            contents = {
+                'version': ROSTER_CACHE_VERSION,
+                # Stored as lists of objects rather than objects keyed by id, so that ids keep their type through JSON
+                'courses': [
+                    {'period': period, 'course_id': course.course_id, 'fetched_at': course.fetched_at}
+                    for period, course in self.periods_to_courses.items()
+                ],
+                'rosters': [
+                    {'course_id': course_id,
+                     'fetched_at': roster.fetched_at,
+                     'students': [[user_id, student_id, roster.student_ids_to_names.get(student_id)]
+                                  for user_id, student_id in roster.user_ids_to_student_ids.items()]}
+                    for course_id, roster in self.course_ids_to_rosters.items()
+                ]
+            }
+
+            temporary_path = f'{self.path}.tmp'
+            with open(temporary_path, 'w') as cache_file:
+                json.dump(contents, cache_file)
+            os.replace(temporary_path, self.path)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as cache_file:
+                contents = json.load(cache_file)
+            if contents.get('version') != ROSTER_CACHE_VERSION:
+                return
+
+            periods_to_courses = {
+                course['period']: CachedCourse(course_id=course['course_id'], fetched_at=course['fetched_at'])
+                for course in contents['courses']
+            }
+            course_ids_to_rosters = {
+                roster['course_id']: CourseRoster(
+                    user_ids_to_student_ids={user_id: student_id for user_id, student_id, _ in roster['students']},
+                    student_ids_to_names={student_id: name for _, student_id, name in roster['students']},
+                    fetched_at=roster['fetched_at']
+                )
+                for roster in contents['rosters']
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            click.echo(f'Ignoring unreadable roster cache {self.path}: {e}')
+            return
+
+        self.periods_to_courses = periods_to_courses
+        self.course_ids_to_rosters = course_ids_to_rosters
+
+    def _is_fresh(self, fetched_at: Optional[float]) -> bool:
+        return fetched_at is not None and time() - fetched_at < self.ttl_seconds
@@ -0,0 +1,71 @@
+import json
+import os
+from threading import Lock
+from typing import Optional
+
+import arrow
+import click
+from arrow import Arrow
+
+SYNC_STATE_VERSION = 1
+
+
+class SyncState:
+    """
+    Holds a watermark for each Google Classroom course: the latest coursework or submission updateTime that a
+    successful import has seen. Coursework that has not been updated since its course's watermark, and none of whose
+    submissions have, does not need to be imported again.
+
+    The state may be shared by several GoogleClassroomData objects that are used from different threads.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The JSON file to keep the watermarks in across runs.
+        """
+        self.path = path
+        self.lock = Lock()
+        self.course_ids_to_watermarks: dict[int, Arrow] = {}
+        self._load()
+
+    def get_watermark(self, course_id: int) -> Optional[Arrow]:
+        """
+        Returns the course's watermark, or None if the course has not been imported before.
+        """
+        with self.lock:
+            return self.course_ids_to_watermarks.get(course_id)
+
+    def set_watermark(self, course_id: int, watermark: Arrow) -> None:
+        with self.lock:
+            self.course_ids_to_watermarks[course_id] = watermark
+
+    def save(self) -> None:
+        with self.lock:
+            contents = {
+                'version': SYNC_STATE_VERSION,
+                # Stored as pairs rather than an object, so that course ids keep their type through JSON
+                'watermarks': [[course_id, watermark.isoformat()]
+                               for course_id, watermark in self.course_ids_to_watermarks.items()]
+            }
+
+            temporary_path = f'{self.path}.tmp'
+            with open(temporary_path, 'w') as state_file:
+                json.dump(contents, state_file)
+            os.replace(temporary_path, self.path)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as state_file:
+                contents = json.load(state_file)
+            if contents.get('version') != SYNC_STATE_VERSION:
+                return
+            course_ids_to_watermarks = {course_id: arrow.get(watermark)
+                                        for course_id, watermark in contents['watermarks']}
+        except (ValueError, KeyError, TypeError) as e:
+            click.echo(f'Ignoring unreadable sync state {self.path}, every assignment will be imported: {e}')
+            return
+
+        self.course_ids_to_watermarks = course_ids_to_watermarks
@@ -1,4 +1,5 @@
 import math
+import random
 from collections import defaultdict
 
 import click
@@ -6,6 +7,7 @@ from collections.abc import Iterable
 from dataclasses import dataclass
 
 from aeries_utils import AeriesData
+from constants import DEFAULT_SPOT_CHECK_SAMPLE_SIZE
 from google_classroom_utils import GoogleClassroomData
 
 
@@ -20,10 +22,12 @@ class Validator:
     def __init__(self,
                  periods: Iterable[int],
                  google_classroom_data: GoogleClassroomData,
-                 aeries_data: AeriesData) -> None:
+                 aeries_data: AeriesData,
+                 spot_check_sample_size: int = DEFAULT_SPOT_CHECK_SAMPLE_SIZE) -> None:
         self.periods = periods
         self.google_classroom_data = google_classroom_data
         self.aeries_data = aeries_data
+        self.spot_check_sample_size = spot_check_sample_size
 
         # period -> student_id -> discrepancy
         self.periods_to_student_overall_grade_discrepancies = defaultdict(dict)
@@ -31,9 +35,15 @@ class Validator:
     def generate_discrepancy_report(self) -> None:
         """
         Populate periods_to_overall_grade_discrepancies with discrepancies between Google Classroom and Aeries.
+
+        The Aeries overall grades are calculated locally from the scores already fetched from Aeries. Only students
+        whose local grade disagrees with Google Classroom, plus a random spot-check sample per period, have their
+        overall grade loaded from Aeries itself. When Aeries disagrees with the local calculation, the Aeries value wins.
         """
-        self.aeries_data.fetch_aeries_overall_grades()
+        periods_to_local_overall_grades = self.aeries_data.compute_aeries_overall_grades()
 
+        periods_to_google_classroom_overall_grades = {}
+        periods_to_student_ids_to_check = {}
         for period in self.periods:
             categories_to_weights = {
                 category_name: aeries_category.weight
@@ -43,15 +53,54 @@ class Validator:
                 period=period,
                 categories_to_weights=categories_to_weights
             )
+            periods_to_google_classroom_overall_grades[period] = google_classroom_overall_grades
+
+            local_overall_grades = periods_to_local_overall_grades.get(period, {})
+            mismatched_student_ids = [
+                student_id for student_id, google_classroom_overall_grade in google_classroom_overall_grades.items()
+                if student_id not in local_overall_grades
+                or not math.isclose(google_classroom_overall_grade, local_overall_grades[student_id], abs_tol=0.01)
+            ]
+            matched_student_ids = sorted(set(google_classroom_overall_grades) - set(mismatched_student_ids))
+            spot_check_student_ids = random.sample(matched_student_ids,
+                                                   k=min(self.spot_check_sample_size, len(matched_student_ids)))
+
+            student_ids_to_check = [
+                student_id for student_id in mismatched_student_ids + spot_check_student_ids
+                if student_id in self.aeries_data.periods_to_student_ids_to_student_nums[period]
+            ]
+            if student_ids_to_check:
+                periods_to_student_ids_to_check[period] = student_ids_to_check
+
+        periods_to_fetched_overall_grades = self.aeries_data.fetch_aeries_overall_grades(
+            periods_to_student_ids=periods_to_student_ids_to_check
+        ) if periods_to_student_ids_to_check else {}
+        self._log_local_overall_grade_mismatches(periods_to_local_overall_grades=periods_to_local_overall_grades,
+                                                 periods_to_fetched_overall_grades=periods_to_fetched_overall_grades)
 
-            for student_id, google_classroom_overall_grade in google_classroom_overall_grades.items():
-                aeries_overall_grade = self.aeries_data.periods_to_student_ids_to_overall_grades[period][student_id]
+        for period in self.periods:
+            for student_id, google_classroom_overall_grade in periods_to_google_classroom_overall_grades[period].items():
+                aeries_overall_grade = self.aeries_data.periods_to_student_ids_to_overall_grades[period].get(student_id)
+                if aeries_overall_grade is None:
+                    continue
 
                 if not math.isclose(google_classroom_overall_grade, aeries_overall_grade, abs_tol=0.01):
                     discrepancy = OverallGradeDiscrepancy(google_classroom_overall_grade=google_classroom_overall_grade,
                                                           aeries_overall_grade=aeries_overall_grade)
                     self.periods_to_student_overall_grade_discrepancies[period][student_id] = discrepancy
 
+    def _log_local_overall_grade_mismatches(self,
+                                            periods_to_local_overall_grades: dict[int, dict[int, float]],
+                                            periods_to_fetched_overall_grades: dict[int, dict[int, float]]) -> None:
+        for period in self.periods:
+            for student_id, fetched_overall_grade in sorted(periods_to_fetched_overall_grades.get(period, {}).items()):
+                local_overall_grade = periods_to_local_overall_grades.get(period, {}).get(student_id)
+                if local_overall_grade is None or math.isclose(local_overall_grade, fetched_overall_grade, abs_tol=0.01):
+                    continue
+                click.echo(f'Warning: Period {period} student {student_id} has an overall grade of '
+                           f'{fetched_overall_grade} in Aeries, but {local_overall_grade} was calculated locally. '
+                           'Using the Aeries grade.')
+
     def log_discrepancies(self) -> None:
         if not self.periods_to_student_overall_grade_discrepancies:
             return
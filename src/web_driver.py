@@ -1,14 +1,15 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-
 import sys
 
-from aeries_utils import AeriesData
-
 
 def get_aeries_cookie() -> str:
+    # Selenium and the Aeries client are slow to import, so they are only imported once a cookie is needed
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    from aeries_utils import AeriesData
+
     # Set up Chrome options to connect to the existing Chrome session
     chrome_options = Options()
     chrome_options.add_experimental_option("debuggerAddress", "127.0.0.1:9222")
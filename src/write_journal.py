@@ -0,0 +1,191 @@
+import json
+import os
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Optional, TextIO
+
+import arrow
+import click
+
+from aeries_utils import AeriesCategory, AssignmentPatchData, AssignmentWrite
+
+WRITE_JOURNAL_VERSION = 1
+
+PLANNED = 'planned'
+ACKNOWLEDGED = 'acknowledged'
+GRADE_UPDATE = 'grade_update'
+ASSIGNMENT_WRITE = 'assignment_write'
+
+
+@dataclass(frozen=True)
+class UnacknowledgedWrites:
+    assignment_writes: list[AssignmentWrite]
+    assignment_patch_data: dict[str, list[AssignmentPatchData]]
+
+
+def assignment_write_to_json(assignment_write: AssignmentWrite) -> dict[str, Any]:
+    return {'action': assignment_write.action,
+            'gradebook_number': assignment_write.gradebook_number,
+            'assignment_id': assignment_write.assignment_id,
+            'assignment_name': assignment_write.assignment_name,
+            'point_total': assignment_write.point_total,
+            'category': {'name': assignment_write.category.name,
+                         'weight': assignment_write.category.weight,
+                         'id': assignment_write.category.id},
+            'end_term_date': assignment_write.end_term_date.isoformat()}
+
+
+def assignment_write_from_json(entry: dict[str, Any]) -> AssignmentWrite:
+    return AssignmentWrite(action=entry['action'],
+                           gradebook_number=entry['gradebook_number'],
+                           assignment_id=entry['assignment_id'],
+                           assignment_name=entry['assignment_name'],
+                           point_total=entry['point_total'],
+                           category=AeriesCategory(**entry['category']),
+                           end_term_date=arrow.get(entry['end_term_date']))
+
+
+class WriteJournal:
+    """
+    An append-only file of the writes an import sends to Aeries, one JSON entry per line. Every assignment create or
+    update and every grade update is journaled as planned before it is sent, and as acknowledged once Aeries accepts
+    it. Each append is flushed to disk, so after a crash the journal holds exactly the writes that may not have
+    reached Aeries.
+
+    The journal may be shared by imports running on different threads. It can be used as a context manager, which
+    closes it on exit.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The JSON lines file to keep the journal in.
+        """
+        self.path = path
+        self.lock = Lock()
+        self.journal_file: Optional[TextIO] = None
+
+    def start(self) -> None:
+        """
+        Starts a new journal for a fresh import, discarding the previous one. A fresh import reads both systems again,
+        so any writes the previous import left unacknowledged are planned again if they are still needed.
+        """
+        with self.lock:
+            self._close()
+            self.journal_file = open(self.path, 'w')
+            self._append(entries=[{'version': WRITE_JOURNAL_VERSION}])
+
+    def resume(self) -> UnacknowledgedWrites:
+        """
+        Reopens the journal of an interrupted import for appending, and returns the writes it planned but never had
+        acknowledged, in the order they were planned.
+        """
+        with self.lock:
+            self._close()
+            unacknowledged_writes = self._read_unacknowledged_writes()
+            self.journal_file = open(self.path, 'a')
+            return unacknowledged_writes
+
+    def close(self) -> None:
+        with self.lock:
+            self._close()
+
+    def __enter__(self) -> 'WriteJournal':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def plan_assignment_write(self, assignment_write: AssignmentWrite) -> None:
+        self._append_locked(entries=[{'entry': PLANNED, 'write': ASSIGNMENT_WRITE,
+                                      **assignment_write_to_json(assignment_write=assignment_write)}])
+
+    def acknowledge_assignment_write(self, assignment_write: AssignmentWrite) -> None:
+        self._append_locked(entries=[{'entry': ACKNOWLEDGED, 'write': ASSIGNMENT_WRITE,
+                                      **assignment_write_to_json(assignment_write=assignment_write)}])
+
+    def plan_grade_updates(self, assignment_patch_data: dict[str, list[AssignmentPatchData]]) -> None:
+        self._append_locked(entries=[{'entry': PLANNED, 'write': GRADE_UPDATE,
+                                      **WriteJournal._grade_update_to_json(gradebook_id=gradebook_id,
+                                                                           patch_data=patch_data)}
+                                     for gradebook_id, patch_datas in assignment_patch_data.items()
+                                     for patch_data in patch_datas])
+
+    def acknowledge_grade_updates(self, gradebook_id: str, patch_datas: list[AssignmentPatchData]) -> None:
+        """
+        Acknowledges the gradebook's accepted grade updates in a single append, so that a gradebook's acknowledgements
+        cost one flush to disk rather than one per grade.
+        """
+        self._append_locked(entries=[{'entry': ACKNOWLEDGED, 'write': GRADE_UPDATE,
+                                      **WriteJournal._grade_update_to_json(gradebook_id=gradebook_id,
+                                                                           patch_data=patch_data)}
+                                     for patch_data in patch_datas])
+
+    def _append_locked(self, entries: list[dict[str, Any]]) -> None:
+        with self.lock:
+            self._append(entries=entries)
+
+    def _append(self, entries: list[dict[str, Any]]) -> None:
+        if self.journal_file is None:
+            raise ValueError(f'Write journal {self.path} has not been started or resumed')
+
+        self.journal_file.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def _close(self) -> None:
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+    def _read_unacknowledged_writes(self) -> UnacknowledgedWrites:
+        with open(self.path) as journal_file:
+            lines = journal_file.read().splitlines()
+
+        entries = []
+        for line_number, line in enumerate(lines, start=1):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # The import may have died partway through its last append
+                if line_number == len(lines):
+                    click.echo(f'Ignoring the incomplete last entry of write journal {self.path}.')
+                    break
+                raise ValueError(f'Write journal {self.path} has an unreadable entry on line {line_number}')
+
+        if not entries or entries[0].get('version') != WRITE_JOURNAL_VERSION:
+            raise ValueError(f'Write journal {self.path} is not a version {WRITE_JOURNAL_VERSION} write journal')
+
+        # Keyed by what each write targets, in the order the writes were first planned
+        assignment_writes = {}
+        grade_updates = {}
+        for entry in entries[1:]:
+            if entry['write'] == ASSIGNMENT_WRITE:
+                writes = assignment_writes
+                key = (entry['action'], entry['gradebook_number'], entry['assignment_id'])
+                write = assignment_write_from_json(entry=entry)
+            else:
+                writes = grade_updates
+                key = (entry['gradebook_id'], entry['assignment_number'], entry['student_num'])
+                write = (entry['gradebook_id'], AssignmentPatchData(student_num=entry['student_num'],
+                                                                    assignment_number=entry['assignment_number'],
+                                                                    grade=entry['grade']))
+
+            if entry['entry'] == PLANNED:
+                writes[key] = write
+            elif writes.get(key) == write:
+                # A write that was planned again with other values after this acknowledgement is still unsent
+                del writes[key]
+
+        assignment_patch_data = {}
+        for gradebook_id, patch_data in grade_updates.values():
+            assignment_patch_data.setdefault(gradebook_id, []).append(patch_data)
+
+        return UnacknowledgedWrites(assignment_writes=list(assignment_writes.values()),
+                                    assignment_patch_data=assignment_patch_data)
+
+    @staticmethod
+    def _grade_update_to_json(gradebook_id: str, patch_data: AssignmentPatchData) -> dict[str, Any]:
+        return {'gradebook_id': gradebook_id,
+                'assignment_number': patch_data.assignment_number,
+                'student_num': patch_data.student_num,
+                'grade': patch_data.grade}
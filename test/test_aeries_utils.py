@@ -1,13 +1,24 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Barrier
+from time import sleep
 from unittest.mock import Mock, patch, call
 
 from arrow import Arrow
 from bs4 import Tag, NavigableString
-from pytest import raises
+from curl_cffi.requests import RequestsError
+from pytest import mark, raises
 
-from aeries_utils import (BROWSER_NAME, GRADEBOOK_AND_TERM_TAG_NAME, GRADEBOOK_URL, STUDENT_NUMBER_TAG_NAME, STUDENT_ID_TAG_NAME,
+from aeries_utils import (ASSIGNMENT_FORM_TARGETS, GRADEBOOK_INFORMATION_TARGETS, GRADEBOOK_PAGE_TARGETS,
+                          SCORES_BY_CLASS_TARGETS, SCORES_BY_STUDENT_TARGETS, BROWSER_NAME, GRADEBOOK_AND_TERM_TAG_NAME, GRADEBOOK_URL, STUDENT_NUMBER_TAG_NAME, STUDENT_ID_TAG_NAME,
                           AeriesAssignmentData, CREATE_ASSIGNMENT_URL, AssignmentPatchData, AeriesCategory,
-                          AeriesClassroomData, AeriesData)
+                          AeriesClassroomData, AeriesData, GradeUpdateFailure, GradeUpdateSummary,
+                          OverallGradeFailure, ASSIGNMENT_CREATE, ASSIGNMENT_PATCH, AssignmentWrite)
 from constants import MILPITAS_SCHOOL_CODE
+from html_parsing import DEFAULT_HTML_PARSER
+
+RECORDED_AERIES_API_RESPONSES_DIR = Path(__file__).resolve().parent / 'recorded_responses' / 'aeries_api'
 
 
 def test_extract_gradebook_ids_from_html():
@@ -19,7 +30,7 @@ def test_extract_gradebook_ids_from_html():
     with patch('aeries_utils.requests.Session'):
         aeries_data = AeriesData(periods=periods, s_cookie='aeries-cookie')
         with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_get):
-            with patch('aeries_utils.BeautifulSoup', return_value=mock_beautiful_soup) as mock_beautiful_soup_create:
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup) as mock_parse_html:
                 with patch('aeries_utils.AeriesData._get_periods_to_gradebook_and_term',
                            return_value={1: 'foo', 2: 'bar'}) as mock_get_periods_to_gradebook_and_term:
                     aeries_data.extract_gradebook_ids_from_html()
@@ -37,7 +48,7 @@ def test_extract_gradebook_ids_from_html():
                         'Priority': 'u=0,i',
                         'Cookie': 's=aeries-cookie'
                     }, impersonate=BROWSER_NAME)
-                    mock_beautiful_soup_create.assert_called_once_with('my html', 'html.parser')
+                    mock_parse_html.assert_called_once_with('my html', parser=DEFAULT_HTML_PARSER, targets=GRADEBOOK_PAGE_TARGETS)
                     mock_get_periods_to_gradebook_and_term.assert_called_once_with(beautiful_soup=mock_beautiful_soup)
 
 
@@ -123,11 +134,11 @@ def test_extract_student_ids_to_student_nums_from_html():
     }
 
     with patch('aeries_utils.requests.Session'):
-        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=1)
         aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
         with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get):
-            with patch('aeries_utils.BeautifulSoup',
-                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_beautiful_soup_create:
+            with patch('aeries_utils.parse_html',
+                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_parse_html:
                 with patch('aeries_utils.AeriesData._get_student_ids_to_student_nums',
                            side_effect=[{1: 10, 2: 20},
                                         {3: 30, 4: 40}]) as mock_get_student_ids_to_student_nums:
@@ -140,9 +151,9 @@ def test_extract_student_ids_to_student_nums_from_html():
                         call('https://milpitasusd.aeries.net/teacher/gradebook/123/S/scoresByClass', headers=expected_headers, impersonate=BROWSER_NAME),
                         call('https://milpitasusd.aeries.net/teacher/gradebook/234/S/scoresByClass', headers=expected_headers, impersonate=BROWSER_NAME)
                     ])
-                    mock_beautiful_soup_create.assert_has_calls([
-                        call('my html', 'html.parser'),
-                        call('my html', 'html.parser')
+                    mock_parse_html.assert_has_calls([
+                        call('my html', parser=DEFAULT_HTML_PARSER, targets=SCORES_BY_CLASS_TARGETS),
+                        call('my html', parser=DEFAULT_HTML_PARSER, targets=SCORES_BY_CLASS_TARGETS)
                     ])
                     mock_get_student_ids_to_student_nums.assert_has_calls([
                         call(beautiful_soup=mock_beautiful_soup),
@@ -183,11 +194,11 @@ def test_extract_assignment_information_from_html():
     }
 
     with patch('aeries_utils.requests.Session'):
-        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=1)
         aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
         with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get):
-            with patch('aeries_utils.BeautifulSoup',
-                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_beautiful_soup_create:
+            with patch('aeries_utils.parse_html',
+                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_parse_html:
                 with patch('aeries_utils.AeriesData._get_assignment_information',
                            side_effect=[
                                {'a': AeriesAssignmentData(id=1, point_total=10, category='A'),
@@ -206,9 +217,9 @@ def test_extract_assignment_information_from_html():
                         call('https://milpitasusd.aeries.net/teacher/gradebook/123/S/scoresByClass', headers=expected_headers, impersonate=BROWSER_NAME),
                         call('https://milpitasusd.aeries.net/teacher/gradebook/234/S/scoresByClass', headers=expected_headers, impersonate=BROWSER_NAME)
                     ])
-                    mock_beautiful_soup_create.assert_has_calls([
-                        call('my html', 'html.parser'),
-                        call('my html', 'html.parser')
+                    mock_parse_html.assert_has_calls([
+                        call('my html', parser=DEFAULT_HTML_PARSER, targets=SCORES_BY_CLASS_TARGETS),
+                        call('my html', parser=DEFAULT_HTML_PARSER, targets=SCORES_BY_CLASS_TARGETS)
                     ])
                     mock_get_assignment_information.assert_has_calls([
                         call(beautiful_soup=mock_beautiful_soup),
@@ -339,11 +350,11 @@ def test_extract_assignment_submissions_from_html():
     }
 
     with patch('aeries_utils.requests.Session'):
-        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=1)
         aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
         with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get):
-            with patch('aeries_utils.BeautifulSoup',
-                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_beautiful_soup_create:
+            with patch('aeries_utils.parse_html',
+                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_parse_html:
                 with patch('aeries_utils.AeriesData._get_assignment_submissions_information',
                            side_effect=[
                                {90: {200: '', 201: 'N/A', 202: '30.5', 203: 'MI'},
@@ -362,9 +373,9 @@ def test_extract_assignment_submissions_from_html():
                         call('https://milpitasusd.aeries.net/teacher/gradebook/123/S/scoresByClass', headers=expected_headers, impersonate=BROWSER_NAME),
                         call('https://milpitasusd.aeries.net/teacher/gradebook/234/S/scoresByClass', headers=expected_headers, impersonate=BROWSER_NAME)
                     ])
-                    mock_beautiful_soup_create.assert_has_calls([
-                        call('my html', 'html.parser'),
-                        call('my html', 'html.parser')
+                    mock_parse_html.assert_has_calls([
+                        call('my html', parser=DEFAULT_HTML_PARSER, targets=SCORES_BY_CLASS_TARGETS),
+                        call('my html', parser=DEFAULT_HTML_PARSER, targets=SCORES_BY_CLASS_TARGETS)
                     ])
                     mock_get_assignment_submissions_information.assert_has_calls([
                         call(beautiful_soup=mock_beautiful_soup),
@@ -401,6 +412,151 @@ def test_get_assignment_submissions_information():
     }
 
 
+def test_scores_by_class_page_fetched_once_per_gradebook():
+    mock_response = Mock()
+    mock_response.text = 'my html'
+    mock_beautiful_soup = Mock()
+    mock_beautiful_soup_2 = Mock()
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=1)
+        aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
+        with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get):
+            with patch('aeries_utils.parse_html',
+                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_parse_html:
+                with patch('aeries_utils.AeriesData._get_student_ids_to_student_nums',
+                           return_value={}) as mock_get_student_ids_to_student_nums:
+                    with patch('aeries_utils.AeriesData._get_assignment_information',
+                               return_value={}) as mock_get_assignment_information:
+                        with patch('aeries_utils.AeriesData._get_assignment_submissions_information',
+                                   return_value={}) as mock_get_assignment_submissions_information:
+                            aeries_data.extract_student_ids_to_student_nums_from_html()
+                            aeries_data.extract_assignment_information_from_html()
+                            aeries_data.extract_assignment_submissions_from_html()
+
+                            assert mock_requests_get.call_count == 2
+                            assert mock_parse_html.call_count == 2
+                            assert aeries_data.gradebook_ids_to_scores_by_class_pages == {
+                                '123/S': mock_beautiful_soup,
+                                '234/S': mock_beautiful_soup_2
+                            }
+                            for mock_parser in (mock_get_student_ids_to_student_nums,
+                                                mock_get_assignment_information,
+                                                mock_get_assignment_submissions_information):
+                                mock_parser.assert_has_calls([
+                                    call(beautiful_soup=mock_beautiful_soup),
+                                    call(beautiful_soup=mock_beautiful_soup_2)
+                                ])
+
+
+def _recorded_aeries_api_response(url: str, **_) -> Mock:
+    """
+    Returns the recorded teacher API response for the URL's endpoint.
+    """
+    endpoint = url.rsplit('/', 1)[1]
+    recorded_response = json.loads((RECORDED_AERIES_API_RESPONSES_DIR / f'{endpoint}.json').read_text())
+    return Mock(status_code=200, json=Mock(return_value=recorded_response))
+
+
+def test_extract_from_api_with_recorded_responses():
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie', max_workers=1, read_backend='api')
+        aeries_data.periods_to_gradebook_ids = {1: '4532451/S'}
+        with patch.object(aeries_data.session, 'get', side_effect=_recorded_aeries_api_response) as mock_requests_get:
+            aeries_data.extract_student_ids_to_student_nums_from_api()
+            aeries_data.extract_assignment_information_from_api()
+            aeries_data.extract_assignment_submissions_from_api()
+
+            assert aeries_data.periods_to_student_ids_to_student_nums == {
+                1: {123456: 1001, 234567: 1002, 345678: 1003}
+            }
+            assert aeries_data.periods_to_assignment_information == {
+                1: {'Unit 1 Test': AeriesAssignmentData(id=1, point_total=50, category='Performance'),
+                    'hw1': AeriesAssignmentData(id=2, point_total=10, category='Practice')}
+            }
+            # Scores are formatted like the scoresByClass page shows them, and other schools' scores are left out
+            assert aeries_data.periods_to_assignment_submissions == {
+                1: {1: {1001: '45', 1002: '38.5', 1003: 'MI'},
+                    2: {1001: '10', 1002: '', 1003: 'N/A'}}
+            }
+
+            headers = {'accept': 'application/json', 'cookie': 's=aeries-cookie'}
+            mock_requests_get.assert_has_calls([
+                call('https://milpitasusd.aeries.net/teacher/api/schools/341/gradebooks/4532451/S/students',
+                     headers=headers, impersonate=BROWSER_NAME),
+                call('https://milpitasusd.aeries.net/teacher/api/schools/341/gradebooks/4532451/S/assignments',
+                     headers=headers, impersonate=BROWSER_NAME),
+                call('https://milpitasusd.aeries.net/teacher/api/schools/341/gradebooks/4532451/S/scores',
+                     headers=headers, impersonate=BROWSER_NAME)
+            ])
+            assert aeries_data.api_fallback_gradebook_ids == set()
+
+
+def test_extract_from_api_falls_back_to_html():
+    mock_beautiful_soup = Mock()
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=1, read_backend='api')
+        aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
+
+        def get(url: str, **kwargs) -> Mock:
+            if '/123/S/' in url:
+                return Mock(status_code=500)
+            if url.endswith('/students'):
+                return Mock(status_code=200, json=Mock(return_value=[{'PermanentID': 30, 'StudentNumber': 3}]))
+            return Mock(status_code=200, json=Mock(return_value=[]))
+
+        with patch.object(aeries_data.session, 'get', side_effect=get) as mock_requests_get:
+            with patch.object(aeries_data, '_get_scores_by_class_page',
+                              return_value=mock_beautiful_soup) as mock_get_scores_by_class_page:
+                with patch('aeries_utils.AeriesData._get_student_ids_to_student_nums',
+                           return_value={10: 1}) as mock_get_student_ids_to_student_nums:
+                    with patch('aeries_utils.AeriesData._get_assignment_information',
+                               return_value={}) as mock_get_assignment_information:
+                        aeries_data.extract_student_ids_to_student_nums_from_api()
+                        aeries_data.extract_assignment_information_from_api()
+
+                        assert aeries_data.periods_to_student_ids_to_student_nums == {1: {10: 1}, 2: {30: 3}}
+                        assert aeries_data.periods_to_assignment_information == {1: {}, 2: {}}
+                        assert aeries_data.api_fallback_gradebook_ids == {'123/S'}
+                        mock_get_scores_by_class_page.assert_has_calls([call(gradebook_id='123/S'),
+                                                                        call(gradebook_id='123/S')])
+                        mock_get_student_ids_to_student_nums.assert_called_once_with(mock_beautiful_soup)
+                        # Once a gradebook has fallen back, later reads go straight to its scoresByClass page
+                        mock_get_assignment_information.assert_called_once_with(mock_beautiful_soup)
+                        assert [c.args[0].rsplit('/', 1)[1] for c in mock_requests_get.call_args_list] == [
+                            'students', 'students', 'assignments'
+                        ]
+
+
+def test_get_gradebook_api_json_unexpected_response():
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie')
+        with patch.object(aeries_data.session, 'get',
+                          return_value=Mock(status_code=200, json=Mock(return_value={'error': 'Not logged in'}))):
+            with raises(ValueError, match='Expected a list from the Aeries API, but got dict'):
+                aeries_data._get_gradebook_api_json(gradebook_id='123/S',
+                                                    url='https://milpitasusd.aeries.net/{school_code}/{gradebook_id}')
+
+
+def test_run_for_each_gradebook_runs_periods_concurrently_in_period_order():
+    # Both workers must be in flight at once to get past the barrier, and period 1 finishes last.
+    barrier = Barrier(2, timeout=5)
+
+    def fetch(gradebook_id):
+        barrier.wait()
+        if gradebook_id == '123/S':
+            sleep(0.05)
+        return f'result for {gradebook_id}'
+
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=2)
+    aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
+
+    results = aeries_data._run_for_each_gradebook(fetch)
+
+    assert list(results.items()) == [(1, 'result for 123/S'), (2, 'result for 234/S')]
+
+
 def test_extract_gradebook_information_from_html():
     mock_response = Mock()
     mock_response.text = 'my html'
@@ -423,11 +579,11 @@ def test_extract_gradebook_information_from_html():
     }
 
     with patch('aeries_utils.requests.Session'):
-        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_workers=1)
         aeries_data.periods_to_gradebook_ids = {1: '123/F', 2: '234/S'}
         with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get):
-            with patch('aeries_utils.BeautifulSoup',
-                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_beautiful_soup_create:
+            with patch('aeries_utils.parse_html',
+                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_parse_html:
                 with patch('aeries_utils.AeriesData._get_aeries_category_information',
                            side_effect=[
                                {'Practice': AeriesCategory(id=1,
@@ -469,9 +625,9 @@ def test_extract_gradebook_information_from_html():
                             call('https://milpitasusd.aeries.net/teacher/gradebook/123/F/manage', headers=expected_headers, impersonate=BROWSER_NAME),
                             call('https://milpitasusd.aeries.net/teacher/gradebook/234/S/manage', headers=expected_headers, impersonate=BROWSER_NAME)
                         ])
-                        mock_beautiful_soup_create.assert_has_calls([
-                            call('my html', 'html.parser'),
-                            call('my html', 'html.parser')
+                        mock_parse_html.assert_has_calls([
+                            call('my html', parser=DEFAULT_HTML_PARSER, targets=GRADEBOOK_INFORMATION_TARGETS),
+                            call('my html', parser=DEFAULT_HTML_PARSER, targets=GRADEBOOK_INFORMATION_TARGETS)
                         ])
                         mock_get_category_information.assert_has_calls([
                             call(beautiful_soup=mock_beautiful_soup),
@@ -575,7 +731,7 @@ def test_create_aeries_assignment():
                         end_term_date=Arrow(year=2023, month=2, day=24)
                     ) == AeriesAssignmentData(id=24, point_total=50, category='Practice')
 
-                    mock_token.assert_called_once_with(gradebook_number='12345')
+                    mock_token.assert_called_once_with(gradebook_number='12345', refresh=False)
                     mock_arrow_now.assert_called_once()
                     mock_post_request.assert_called_once_with(
                         CREATE_ASSIGNMENT_URL,
@@ -640,7 +796,7 @@ def test_create_aeries_assignment_with_due_date_past_term_end_date():
                         end_term_date=Arrow(year=2023, month=1, day=25),
                     ) == AeriesAssignmentData(id=24, point_total=50, category='Practice')
 
-                    mock_token.assert_called_once_with(gradebook_number='12345')
+                    mock_token.assert_called_once_with(gradebook_number='12345', refresh=False)
                     mock_arrow_now.assert_called_once()
                     mock_post_request.assert_called_once_with(
                         CREATE_ASSIGNMENT_URL,
@@ -707,7 +863,7 @@ def test_create_aeries_assignment_invalid_status_code():
                             end_term_date=Arrow(year=2023, month=2, day=24)
                         )
 
-                    mock_token.assert_called_once_with(gradebook_number='12345')
+                    mock_token.assert_called_once_with(gradebook_number='12345', refresh=False)
                     mock_arrow_now.assert_called_once()
                     mock_post_request.assert_called_once_with(
                         CREATE_ASSIGNMENT_URL,
@@ -770,7 +926,7 @@ def test_patch_aeries_assignment():
                         end_term_date=Arrow(year=2023, month=2, day=24)
                     ) == AeriesAssignmentData(id=24, point_total=50, category='Practice')
 
-                    mock_token.assert_called_once_with(gradebook_number='12345')
+                    mock_token.assert_called_once_with(gradebook_number='12345', refresh=False)
                     mock_arrow_now.assert_called_once()
                     mock_put_request.assert_called_once_with(
                         CREATE_ASSIGNMENT_URL,
@@ -835,7 +991,7 @@ def test_patch_aeries_assignment_invalid_status_code():
                             end_term_date=Arrow(year=2023, month=1, day=25)
                         )
 
-                    mock_token.assert_called_once_with(gradebook_number='12345')
+                    mock_token.assert_called_once_with(gradebook_number='12345', refresh=False)
                     mock_arrow_now.assert_called_once()
                     mock_put_request.assert_called_once_with(
                         CREATE_ASSIGNMENT_URL,
@@ -898,7 +1054,7 @@ def test_patch_aeries_assignment_with_due_date_past_term_end_date():
                         end_term_date=Arrow(year=2023, month=1, day=25)
                     ) == AeriesAssignmentData(id=24, point_total=50, category='Practice')
 
-                    mock_token.assert_called_once_with(gradebook_number='12345')
+                    mock_token.assert_called_once_with(gradebook_number='12345', refresh=False)
                     mock_arrow_now.assert_called_once()
                     mock_put_request.assert_called_once_with(
                         CREATE_ASSIGNMENT_URL,
@@ -930,7 +1086,7 @@ def test_get_form_request_verification_token():
         aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
         aeries_data.request_verification_token = 'request_verification_token'
         with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_request):
-            with patch('aeries_utils.BeautifulSoup', return_value=mock_beautiful_soup) as mock_beautiful_soup_create:
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup) as mock_parse_html:
                 assert aeries_data._get_form_request_verification_token(
                     gradebook_number='12345') == 'form_request_verification_token'
 
@@ -938,12 +1094,111 @@ def test_get_form_request_verification_token():
                                                      params=expected_params,
                                                      headers=expected_headers,
                                                      impersonate=BROWSER_NAME)
-                mock_beautiful_soup_create.assert_called_once_with(
-                    'my html',
-                    'html.parser'
+                mock_parse_html.assert_called_once_with(
+                    'my html', parser=DEFAULT_HTML_PARSER, targets=ASSIGNMENT_FORM_TARGETS
                 )
 
 
+def test_get_form_request_verification_token_cached_per_gradebook():
+    mock_beautiful_soup = Mock()
+    mock_beautiful_soup.find.return_value.find.return_value.get.side_effect = ['token1', 'token2', 'token3']
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+        with patch.object(aeries_data.session, 'get') as mock_request:
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup):
+                with patch('aeries_utils.monotonic', side_effect=[0, 10, 20, 700, 700]):
+                    assert aeries_data._get_form_request_verification_token(gradebook_number='12345') == 'token1'
+                    assert aeries_data._get_form_request_verification_token(gradebook_number='12345') == 'token1'
+                    assert aeries_data._get_form_request_verification_token(gradebook_number='23456') == 'token2'
+                    # The token for 12345 has expired
+                    assert aeries_data._get_form_request_verification_token(gradebook_number='12345') == 'token3'
+
+                assert [c.kwargs['params']['gn'] for c in mock_request.call_args_list] == ['12345', '23456', '12345']
+
+
+def test_get_form_request_verification_token_fetches_gradebooks_concurrently():
+    # Both gradebooks are mid-fetch at the same time
+    barrier = Barrier(2, timeout=5)
+    mock_beautiful_soup = Mock()
+    mock_beautiful_soup.find.return_value.find.return_value.get.return_value = 'token'
+
+    def get(*args, **kwargs):
+        barrier.wait()
+        return Mock()
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+        with patch.object(aeries_data.session, 'get', side_effect=get):
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup):
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [executor.submit(aeries_data._get_form_request_verification_token,
+                                               gradebook_number=gradebook_number)
+                               for gradebook_number in ('12345', '23456')]
+                    assert [future.result() for future in futures] == ['token', 'token']
+
+
+def test_get_form_request_verification_token_refresh():
+    mock_beautiful_soup = Mock()
+    mock_beautiful_soup.find.return_value.find.return_value.get.side_effect = ['token1', 'token2']
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+        with patch.object(aeries_data.session, 'get') as mock_request:
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup):
+                assert aeries_data._get_form_request_verification_token(gradebook_number='12345') == 'token1'
+                assert aeries_data._get_form_request_verification_token(gradebook_number='12345',
+                                                                        refresh=True) == 'token2'
+                assert aeries_data._get_form_request_verification_token(gradebook_number='12345') == 'token2'
+
+                assert mock_request.call_count == 2
+
+
+def test_send_assignment_form_refreshes_rejected_token():
+    mock_send = Mock()
+    mock_send.side_effect = [Mock(status_code=403), Mock(status_code=200)]
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+        with patch.object(aeries_data, '_get_form_request_verification_token',
+                          side_effect=['stale_token', 'fresh_token']) as mock_token:
+            assert aeries_data._send_assignment_form(send=mock_send,
+                                                     gradebook_number='12345',
+                                                     assignment_id=24,
+                                                     data={'Assignment.Description': 'nothing'},
+                                                     headers={'Accept': '*/*'}).status_code == 200
+
+            mock_token.assert_has_calls([call(gradebook_number='12345', refresh=False),
+                                         call(gradebook_number='12345', refresh=True)])
+            mock_send.assert_has_calls([
+                call(CREATE_ASSIGNMENT_URL,
+                     params={'gn': '12345', 'an': 24},
+                     data={'__RequestVerificationToken': 'stale_token', 'Assignment.Description': 'nothing'},
+                     headers={'Accept': '*/*'},
+                     impersonate=BROWSER_NAME),
+                call(CREATE_ASSIGNMENT_URL,
+                     params={'gn': '12345', 'an': 24},
+                     data={'__RequestVerificationToken': 'fresh_token', 'Assignment.Description': 'nothing'},
+                     headers={'Accept': '*/*'},
+                     impersonate=BROWSER_NAME)
+            ])
+
+
+def test_send_assignment_form_retries_rejected_token_once():
+    mock_send = Mock(return_value=Mock(status_code=400))
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+        with patch.object(aeries_data, '_get_form_request_verification_token', return_value='token'):
+            assert aeries_data._send_assignment_form(send=mock_send,
+                                                     gradebook_number='12345',
+                                                     assignment_id=24,
+                                                     data={},
+                                                     headers={}).status_code == 400
+
+            assert mock_send.call_count == 2
+
+
 def test_update_grades_in_aeries():
     assignment_patch_data = {
         'gradebook_id1': [AssignmentPatchData(student_num=99,
@@ -964,7 +1219,11 @@ def test_update_grades_in_aeries():
     aeries_data.request_verification_token = 'request_verification_token'
 
     with patch.object(aeries_data, '_send_patch_request') as mock_send_patch_request:
-        aeries_data.update_grades_in_aeries(assignment_patch_data=assignment_patch_data)
+        mock_send_patch_request.return_value.status_code = 200
+        assert aeries_data.update_grades_in_aeries(assignment_patch_data=assignment_patch_data) == GradeUpdateSummary(
+            succeeded=assignment_patch_data,
+            failed=[]
+        )
 
         mock_send_patch_request.assert_has_calls([call(gradebook_id='gradebook_id1',
                                                        assignment_number=123,
@@ -981,7 +1240,148 @@ def test_update_grades_in_aeries():
                                                   call(gradebook_id='gradebook_id2',
                                                        assignment_number=124,
                                                        student_number=99,
-                                                       grade=None)])
+                                                       grade=None)],
+                                                 any_order=True)
+
+
+def test_update_grades_in_aeries_reports_failures():
+    assignment_patch_data = {
+        'gradebook_id1': [AssignmentPatchData(student_num=99,
+                                              assignment_number=123,
+                                              grade=68),
+                          AssignmentPatchData(student_num=88,
+                                              assignment_number=123,
+                                              grade=None)]
+    }
+
+    def send_patch_request(gradebook_id, assignment_number, student_number, grade):
+        response = Mock()
+        response.status_code = 200 if student_number == 99 else 403
+        return response
+
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+
+    with patch.object(aeries_data, '_send_patch_request', side_effect=send_patch_request) as mock_send_patch_request:
+        with patch('aeries_utils.sleep') as mock_sleep:
+            assert aeries_data.update_grades_in_aeries(assignment_patch_data=assignment_patch_data) == GradeUpdateSummary(
+                succeeded={'gradebook_id1': [AssignmentPatchData(student_num=99,
+                                                                 assignment_number=123,
+                                                                 grade=68)]},
+                failed=[GradeUpdateFailure(gradebook_id='gradebook_id1',
+                                           patch_data=AssignmentPatchData(student_num=88,
+                                                                          assignment_number=123,
+                                                                          grade=None),
+                                           reason='Grade update has unexpected status code: 403')]
+            )
+
+            # 403 is not transient, so it is not retried
+            assert mock_send_patch_request.call_count == 2
+            mock_sleep.assert_not_called()
+
+
+def test_update_grades_in_aeries_journals_writes():
+    assignment_patch_data = {
+        'gradebook_id1': [AssignmentPatchData(student_num=99, assignment_number=123, grade=68),
+                          AssignmentPatchData(student_num=88, assignment_number=123, grade=None),
+                          AssignmentPatchData(student_num=77, assignment_number=123, grade=5)],
+        'gradebook_id2': [AssignmentPatchData(student_num=66, assignment_number=4, grade=1)],
+        # Nothing to acknowledge
+        'gradebook_id3': [AssignmentPatchData(student_num=55, assignment_number=7, grade=2)]
+    }
+
+    def send_patch_request(gradebook_id, assignment_number, student_number, grade):
+        response = Mock()
+        response.status_code = 403 if student_number in (88, 55) else 200
+        return response
+
+    write_journal = Mock()
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie', write_journal=write_journal)
+
+    with patch.object(aeries_data, '_send_patch_request', side_effect=send_patch_request):
+        aeries_data.update_grades_in_aeries(assignment_patch_data=assignment_patch_data)
+
+    write_journal.plan_grade_updates.assert_called_once_with(assignment_patch_data=assignment_patch_data)
+    # The failed grade update stays unacknowledged, and each gradebook is acknowledged in one append
+    assert write_journal.acknowledge_grade_updates.call_args_list == [
+        call(gradebook_id='gradebook_id1',
+             patch_datas=[AssignmentPatchData(student_num=99, assignment_number=123, grade=68),
+                          AssignmentPatchData(student_num=77, assignment_number=123, grade=5)]),
+        call(gradebook_id='gradebook_id2',
+             patch_datas=[AssignmentPatchData(student_num=66, assignment_number=4, grade=1)])
+    ]
+
+
+@mark.parametrize('status_code,acknowledged', ((200, True), (500, False)))
+def test_create_aeries_assignment_journals_write(status_code, acknowledged):
+    write_journal = Mock()
+    category = AeriesCategory(name='Practice', id=1, weight=0.4)
+    expected_assignment_write = AssignmentWrite(action=ASSIGNMENT_CREATE, gradebook_number='12345', assignment_id=24,
+                                                assignment_name='nothing', point_total=50, category=category,
+                                                end_term_date=Arrow(year=2023, month=2, day=24))
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie', write_journal=write_journal)
+        with patch.object(aeries_data, '_get_form_request_verification_token', return_value='mock_token'):
+            with patch.object(aeries_data.session, 'post') as mock_post_request:
+                mock_post_request.return_value.status_code = status_code
+                try:
+                    aeries_data.create_aeries_assignment(gradebook_number='12345',
+                                                         assignment_id=24,
+                                                         assignment_name='nothing',
+                                                         point_total=50,
+                                                         category=category,
+                                                         end_term_date=Arrow(year=2023, month=2, day=24))
+                except ValueError:
+                    pass
+
+    write_journal.plan_assignment_write.assert_called_once_with(assignment_write=expected_assignment_write)
+    assert write_journal.acknowledge_assignment_write.called == acknowledged
+
+
+@mark.parametrize('action,method', ((ASSIGNMENT_CREATE, 'create_aeries_assignment'),
+                                    (ASSIGNMENT_PATCH, 'patch_aeries_assignment')))
+def test_send_assignment_write(action, method):
+    category = AeriesCategory(name='Practice', id=1, weight=0.4)
+    aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
+
+    with patch.object(aeries_data, method) as mock_send_assignment_write:
+        aeries_data.send_assignment_write(assignment_write=AssignmentWrite(
+            action=action, gradebook_number='12345', assignment_id=24, assignment_name='nothing', point_total=50,
+            category=category, end_term_date=Arrow(year=2023, month=2, day=24)
+        ))
+
+    mock_send_assignment_write.assert_called_once_with(gradebook_number='12345', assignment_id=24,
+                                                       assignment_name='nothing', point_total=50, category=category,
+                                                       end_term_date=Arrow(year=2023, month=2, day=24))
+
+
+def test_send_patch_request_with_retries_transient_failure():
+    patch_data = AssignmentPatchData(student_num=99, assignment_number=123, grade=68)
+    unavailable_response = Mock(status_code=503)
+    ok_response = Mock(status_code=200)
+
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+
+    with patch.object(aeries_data, '_send_patch_request',
+                      side_effect=[RequestsError('connection reset'), unavailable_response, ok_response]) as mock_send:
+        with patch('aeries_utils.sleep') as mock_sleep:
+            aeries_data._send_patch_request_with_retries(gradebook_id='12345/S', patch_data=patch_data)
+
+            assert mock_send.call_count == 3
+            mock_sleep.assert_has_calls([call(0.5), call(1.0)])
+
+
+def test_send_patch_request_with_retries_exhausted():
+    patch_data = AssignmentPatchData(student_num=99, assignment_number=123, grade=68)
+
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+
+    with patch.object(aeries_data, '_send_patch_request', return_value=Mock(status_code=502)) as mock_send:
+        with patch('aeries_utils.sleep'):
+            with raises(ValueError, match=r'Grade update has unexpected status code: 502'):
+                aeries_data._send_patch_request_with_retries(gradebook_id='12345/S', patch_data=patch_data)
+
+            assert mock_send.call_count == 3
 
 
 def test_send_patch_request():
@@ -1077,13 +1477,11 @@ def test_send_patch_request_missing_grade():
             )
 
 
-def test_extract_overall_grades_from_html():
+def test_extract_overall_grade_from_html_without_streaming():
     mock_response = Mock()
     mock_response.text = 'my html'
     mock_beautiful_soup = Mock()
-    mock_beautiful_soup.find.return_value = NavigableString(value='100%')
-    mock_beautiful_soup_2 = Mock()
-    mock_beautiful_soup_2.find.return_value = NavigableString(value='96.65%')
+    mock_beautiful_soup.find.return_value = NavigableString(value='96.65%')
 
     expected_headers = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
@@ -1091,24 +1489,275 @@ def test_extract_overall_grades_from_html():
     }
 
     with patch('aeries_utils.requests.Session'):
-        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+        aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', student_page_timeout=5,
+                                 stream_student_pages=False)
         aeries_data.periods_to_gradebook_ids = {1: '123/S', 2: '234/S'}
         aeries_data.periods_to_student_ids_to_student_nums = {
             1: {1: 99, 2: 88}
         }
-        with (patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get):
-            with patch('aeries_utils.BeautifulSoup',
-                       side_effect=[mock_beautiful_soup, mock_beautiful_soup_2]) as mock_beautiful_soup_create:
-                assert aeries_data._extract_overall_grades_from_html(period=1) == {
-                    1: 100,
-                    2: 96.65
-                }
-
-                mock_requests_get.assert_has_calls([
-                    call('https://milpitasusd.aeries.net/teacher/gradebook/123/S/ScoresByStudent/99/341', headers=expected_headers, impersonate=BROWSER_NAME),
-                    call('https://milpitasusd.aeries.net/teacher/gradebook/123/S/ScoresByStudent/88/341', headers=expected_headers, impersonate=BROWSER_NAME)
-                ])
-                mock_beautiful_soup_create.assert_has_calls([
-                    call('my html', 'html.parser'),
-                    call('my html', 'html.parser')
-                ])
+        with patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get:
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup) as mock_parse_html:
+                assert aeries_data._extract_overall_grade_from_html(period=1, student_id=2) == 96.65
+
+                mock_requests_get.assert_called_once_with(
+                    'https://milpitasusd.aeries.net/teacher/gradebook/123/S/ScoresByStudent/88/341',
+                    headers=expected_headers,
+                    timeout=5,
+                    impersonate=BROWSER_NAME
+                )
+                mock_parse_html.assert_called_once_with('my html', parser=DEFAULT_HTML_PARSER,
+                                                        targets=SCORES_BY_STUDENT_TARGETS)
+
+
+def test_extract_overall_grade_from_html_streaming():
+    mock_response = Mock()
+    mock_response.iter_content.return_value = iter([b'<html><body><div class="summary"><div id="overall',
+                                                    b'PercentDisplay" class="percent">96.65%</div>'])
+
+    expected_headers = {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+        'Cookie': 's=aeries-cookie'
+    }
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie', student_page_timeout=5)
+        aeries_data.periods_to_gradebook_ids = {1: '123/S'}
+        aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 99}}
+        with patch.object(aeries_data.session, 'get', return_value=mock_response) as mock_requests_get:
+            with patch('aeries_utils.parse_html') as mock_parse_html:
+                assert aeries_data._extract_overall_grade_from_html(period=1, student_id=1) == 96.65
+
+                mock_requests_get.assert_called_once_with(
+                    'https://milpitasusd.aeries.net/teacher/gradebook/123/S/ScoresByStudent/99/341',
+                    headers=expected_headers,
+                    timeout=5,
+                    impersonate=BROWSER_NAME,
+                    stream=True
+                )
+                mock_response.iter_content.assert_called_once_with(chunk_size=8192)
+                mock_response.close.assert_called_once()
+                mock_parse_html.assert_not_called()
+
+
+def test_extract_overall_grade_from_html_streaming_falls_back_to_full_parse():
+    mock_response = Mock()
+    mock_response.iter_content.return_value = iter([b'<html><body><div id="overallPercentDisplay">',
+                                                    b'<span>96.65%</span></div></body></html>'])
+    mock_beautiful_soup = Mock()
+    mock_beautiful_soup.find.return_value = NavigableString(value='96.65%')
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie')
+        aeries_data.periods_to_gradebook_ids = {1: '123/S'}
+        aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 99}}
+        with patch.object(aeries_data.session, 'get', return_value=mock_response):
+            with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup) as mock_parse_html:
+                assert aeries_data._extract_overall_grade_from_html(period=1, student_id=1) == 96.65
+
+                mock_parse_html.assert_called_once_with(
+                    '<html><body><div id="overallPercentDisplay"><span>96.65%</span></div></body></html>',
+                    parser=DEFAULT_HTML_PARSER,
+                    targets=SCORES_BY_STUDENT_TARGETS
+                )
+                mock_response.close.assert_called_once()
+
+
+def test_scan_for_overall_grade_stops_reading_once_found():
+    chunks_read = []
+
+    def chunks():
+        for chunk in (b'<html><head><title>Scores</title></head>',
+                      b'<body><div class="summary"><div class="percent" id="overallPercentDisplay">\n  88',
+                      b'.5%\n</div></div>',
+                      b'<table>rest of the page</table></body></html>'):
+            chunks_read.append(chunk)
+            yield chunk
+
+    overall_grade, html = AeriesData._scan_for_overall_grade(chunks=chunks())
+
+    assert overall_grade == 88.5
+    assert len(chunks_read) == 3
+    assert html.endswith('.5%\n</div></div>')
+
+
+def test_scan_for_overall_grade_multibyte_character_split_across_chunks():
+    encoded = '<p>Se\u00f1or</p><div id="overallPercentDisplay">100%</div>'.encode('utf-8')
+    split = encoded.index(b'\xb1')
+
+    assert AeriesData._scan_for_overall_grade(chunks=[encoded[:split], encoded[split:]]) == (
+        100.0, '<p>Se\u00f1or</p><div id="overallPercentDisplay">100%</div>'
+    )
+
+
+def test_scan_for_overall_grade_element_split_across_many_chunks():
+    page = ('<tr><td>score</td></tr>' * 1000 + '<div id="overallPercentDisplay">91.25%</div>').encode('utf-8')
+
+    assert AeriesData._scan_for_overall_grade(chunks=[page[index:index + 7] for index in range(0, len(page), 7)]) == (
+        91.25, page.decode('utf-8')
+    )
+
+
+def test_scan_for_overall_grade_not_found():
+    assert AeriesData._scan_for_overall_grade(chunks=[b'<html>', b'<body></body></html>']) == (
+        None, '<html><body></body></html>'
+    )
+
+
+def test_extract_overall_grade_from_html_missing_overall_grade():
+    mock_beautiful_soup = Mock()
+    mock_beautiful_soup.find.return_value = None
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie')
+        aeries_data.periods_to_gradebook_ids = {1: '123/S'}
+        aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 99}}
+        with patch('aeries_utils.parse_html', return_value=mock_beautiful_soup):
+            with raises(ValueError, match='Could not find the overall grade on the Aeries page for student number 99'):
+                aeries_data._extract_overall_grade_from_html(period=1, student_id=1)
+
+
+def test_fetch_aeries_overall_grades():
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 99, 2: 88}, 2: {3: 77}}
+    student_ids_to_overall_grades = {1: 100, 2: 96.65, 3: 80}
+
+    with patch.object(aeries_data, '_extract_overall_grade_from_html',
+                      side_effect=lambda period, student_id: student_ids_to_overall_grades[student_id]
+                      ) as mock_extract_overall_grade_from_html:
+        assert aeries_data.fetch_aeries_overall_grades() == {1: {1: 100, 2: 96.65}, 2: {3: 80}}
+
+        mock_extract_overall_grade_from_html.assert_has_calls([call(period=1, student_id=1),
+                                                               call(period=1, student_id=2),
+                                                               call(period=2, student_id=3)],
+                                                              any_order=True)
+        assert aeries_data.periods_to_student_ids_to_overall_grades == {1: {1: 100, 2: 96.65}, 2: {3: 80}}
+        assert aeries_data.overall_grade_failures == []
+
+
+def test_fetch_aeries_overall_grades_merges_fetched_grades():
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+    aeries_data.periods_to_student_ids_to_overall_grades = {1: {1: 90.0, 2: 80.0}}
+
+    with patch.object(aeries_data, '_extract_overall_grade_from_html',
+                      return_value=81.5) as mock_extract_overall_grade_from_html:
+        assert aeries_data.fetch_aeries_overall_grades(periods_to_student_ids={1: [2]}) == {1: {2: 81.5}}
+
+        mock_extract_overall_grade_from_html.assert_called_once_with(period=1, student_id=2)
+        assert aeries_data.periods_to_student_ids_to_overall_grades == {1: {1: 90.0, 2: 81.5}}
+
+
+def test_fetch_aeries_overall_grades_reports_failures():
+    aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie')
+
+    def extract_overall_grade_from_html(period, student_id):
+        if student_id == 2:
+            raise RequestsError('Operation timed out')
+        if student_id == 3:
+            raise ValueError('Could not find the overall grade')
+        return 90.0
+
+    with patch.object(aeries_data, '_extract_overall_grade_from_html', side_effect=extract_overall_grade_from_html):
+        with patch('click.echo') as mock_echo:
+            assert aeries_data.fetch_aeries_overall_grades(periods_to_student_ids={1: [1, 2, 3]}) == {1: {1: 90.0}}
+
+            assert aeries_data.overall_grade_failures == [
+                OverallGradeFailure(period=1, student_id=2, reason='Operation timed out'),
+                OverallGradeFailure(period=1, student_id=3, reason='Could not find the overall grade')
+            ]
+            mock_echo.assert_has_calls([
+                call('Could not load the Aeries overall grade for 2 student(s):'),
+                call('\tPeriod 1, Student 2: Operation timed out'),
+                call('\tPeriod 1, Student 3: Could not find the overall grade')
+            ])
+
+
+def test_fetch_aeries_overall_grades_shares_workers_across_periods():
+    # All three students are in flight at once even though two of them are in the same period
+    barrier = Barrier(3, timeout=5)
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie', max_student_workers=3)
+
+    def extract_overall_grade_from_html(period, student_id):
+        barrier.wait()
+        return float(student_id)
+
+    with patch.object(aeries_data, '_extract_overall_grade_from_html', side_effect=extract_overall_grade_from_html):
+        assert aeries_data.fetch_aeries_overall_grades(periods_to_student_ids={1: [1, 2], 2: [3]}) == {
+            1: {1: 1.0, 2: 2.0},
+            2: {3: 3.0}
+        }
+
+
+def test_calculate_overall_grades():
+    categories = {'Practice': AeriesCategory(name='Practice', weight=0.3, id=1),
+                  'Performance': AeriesCategory(name='Performance', weight=0.7, id=2)}
+    assignments = [AeriesAssignmentData(id=1, point_total=10, category='Practice'),
+                   AeriesAssignmentData(id=2, point_total=20, category='Practice'),
+                   AeriesAssignmentData(id=3, point_total=50, category='Performance')]
+    assignment_submissions = {
+        1: {7: '10', 8: 'MI', 9: 'N/A', 10: ''},
+        2: {7: '15', 8: '20', 9: '', 10: 'N/A'},
+        3: {7: '45.5', 8: 'N/A', 9: '40'}
+    }
+
+    assert AeriesData._calculate_overall_grades(
+        student_ids_to_student_nums={1: 7, 2: 8, 3: 9, 4: 10},
+        assignments=assignments,
+        assignment_submissions=assignment_submissions,
+        categories=categories
+    ) == {
+        # 25/30 * 0.3 + 45.5/50 * 0.7
+        1: 88.7,
+        # Only Practice is graded, so its weight is renormalized to 100%
+        2: 66.67,
+        # Only Performance is graded
+        3: 80.0
+    }
+
+
+def test_calculate_overall_grades_without_category_weights():
+    categories = {'Practice': AeriesCategory(name='Practice', weight=0, id=1),
+                  'Performance': AeriesCategory(name='Performance', weight=0, id=2)}
+    assignments = [AeriesAssignmentData(id=1, point_total=10, category='Practice'),
+                   AeriesAssignmentData(id=2, point_total=30, category='Performance')]
+
+    assert AeriesData._calculate_overall_grades(
+        student_ids_to_student_nums={1: 7},
+        assignments=assignments,
+        assignment_submissions={1: {7: '5'}, 2: {7: '25'}},
+        categories=categories
+    ) == {1: 75.0}
+
+
+def test_compute_aeries_overall_grades():
+    aeries_data = AeriesData(periods=[1], s_cookie='aeries-cookie')
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 7}}
+    aeries_data.periods_to_assignment_information = {
+        1: {'hw1': AeriesAssignmentData(id=1, point_total=10, category='Practice')}
+    }
+    aeries_data.periods_to_assignment_submissions = {1: {1: {7: '9'}}}
+    aeries_data.periods_to_gradebook_information = {
+        1: AeriesClassroomData(categories={'Practice': AeriesCategory(name='Practice', weight=1.0, id=1)},
+                               end_term_dates={})
+    }
+
+    assert aeries_data.compute_aeries_overall_grades() == {1: {1: 90.0}}
+    assert aeries_data.periods_to_student_ids_to_overall_grades == {1: {1: 90.0}}
+
+
+def test_update_grades_in_aeries_records_successful_updates():
+    aeries_data = AeriesData(periods=[1], s_cookie='s_cookie', max_write_workers=1)
+    aeries_data.periods_to_gradebook_ids = {1: 'gradebook_id1'}
+    aeries_data.periods_to_assignment_submissions = {1: {123: {99: '10', 88: '7'}}}
+
+    with patch.object(aeries_data, '_send_patch_request_with_retries') as mock_send_patch_request_with_retries:
+        mock_send_patch_request_with_retries.side_effect = [None, None, None, ValueError('Bad status')]
+        aeries_data.update_grades_in_aeries(assignment_patch_data={
+            'gradebook_id1': [AssignmentPatchData(student_num=99, assignment_number=123, grade=8.5),
+                              AssignmentPatchData(student_num=88, assignment_number=123, grade=0),
+                              AssignmentPatchData(student_num=77, assignment_number=124, grade=None),
+                              AssignmentPatchData(student_num=77, assignment_number=123, grade=4)]
+        })
+
+    assert aeries_data.periods_to_assignment_submissions == {
+        1: {123: {99: '8.5', 88: 'MI'}, 124: {77: ''}}
+    }
@@ -0,0 +1,157 @@
+from unittest.mock import Mock, call, patch
+
+from googleapiclient.errors import HttpError
+from pytest import raises
+
+from classroom_batch import PagedListRequest, execute_paged_list_requests
+
+
+def _http_error(status: int) -> HttpError:
+    return HttpError(resp=Mock(status=status, reason='error'), content=b'{}')
+
+
+class FakeBatch:
+    """
+    Stands in for googleapiclient's BatchHttpRequest: each added request is the list method's kwargs, and responses
+    are looked up by the list method name and its kwargs.
+    """
+
+    def __init__(self, responses, callback, executed_batches):
+        self.responses = responses
+        self.callback = callback
+        self.executed_batches = executed_batches
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.executed_batches.append([request for _, request in self.requests])
+        for request_id, request in self.requests:
+            response = self.responses[request].pop(0)
+            if isinstance(response, Exception):
+                self.callback(request_id, None, response)
+            else:
+                self.callback(request_id, response, None)
+
+
+def _fake_classroom_service(responses):
+    executed_batches = []
+    classroom_service = Mock()
+    classroom_service.new_batch_http_request.side_effect = \
+        lambda callback: FakeBatch(responses=responses, callback=callback, executed_batches=executed_batches)
+    return classroom_service, executed_batches
+
+
+def _list_method(name):
+    return lambda **kwargs: (name, tuple(sorted(kwargs.items())))
+
+
+def test_execute_paged_list_requests_follows_pages():
+    students = _list_method('students')
+    coursework = _list_method('courseWork')
+    classroom_service, executed_batches = _fake_classroom_service({
+        ('students', (('courseId', 1),)): [{'students': [{'userId': 1}], 'nextPageToken': 'page2'}],
+        ('students', (('courseId', 1), ('pageToken', 'page2'))): [{'students': [{'userId': 2}]}],
+        ('courseWork', (('courseId', 1),)): [{}]
+    })
+
+    assert execute_paged_list_requests(
+        classroom_service=classroom_service,
+        paged_list_requests=[PagedListRequest(key='students', list_method=students, items_key='students',
+                                              list_kwargs={'courseId': 1}),
+                             PagedListRequest(key='courseWork', list_method=coursework, items_key='courseWork',
+                                              list_kwargs={'courseId': 1})]
+    ) == {'students': [{'userId': 1}, {'userId': 2}], 'courseWork': []}
+
+    # Both first pages share a batch, and the second page is continued in the next one
+    assert executed_batches == [
+        [('students', (('courseId', 1),)), ('courseWork', (('courseId', 1),))],
+        [('students', (('courseId', 1), ('pageToken', 'page2')))]
+    ]
+
+
+@patch('classroom_batch.sleep')
+def test_execute_paged_list_requests_reports_responses(mock_sleep):
+    students = _list_method('students')
+    classroom_service, _ = _fake_classroom_service({
+        ('students', (('courseId', 1),)): [_http_error(503), {'students': [{'userId': 1}], 'nextPageToken': 'page2'}],
+        ('students', (('courseId', 1), ('pageToken', 'page2'))): [{'students': [{'userId': 2}]}]
+    })
+    responses = []
+
+    execute_paged_list_requests(
+        classroom_service=classroom_service,
+        paged_list_requests=[PagedListRequest(key='students', list_method=students, items_key='students',
+                                              list_kwargs={'courseId': 1})],
+        on_response=responses.append
+    )
+
+    # Failed calls are not reported
+    assert responses == [{'students': [{'userId': 1}], 'nextPageToken': 'page2'}, {'students': [{'userId': 2}]}]
+
+
+def test_execute_paged_list_requests_respects_batch_limit():
+    students = _list_method('students')
+    classroom_service, executed_batches = _fake_classroom_service({
+        ('students', (('courseId', course_id),)): [{'students': [{'userId': course_id}]}]
+        for course_id in range(5)
+    })
+
+    assert execute_paged_list_requests(
+        classroom_service=classroom_service,
+        paged_list_requests=[PagedListRequest(key=course_id, list_method=students, items_key='students',
+                                              list_kwargs={'courseId': course_id})
+                             for course_id in range(5)],
+        batch_limit=2
+    ) == {course_id: [{'userId': course_id}] for course_id in range(5)}
+    assert [len(batch) for batch in executed_batches] == [2, 2, 1]
+
+
+@patch('classroom_batch.sleep')
+def test_execute_paged_list_requests_retries_transient_item_errors(mock_sleep):
+    students = _list_method('students')
+    classroom_service, executed_batches = _fake_classroom_service({
+        ('students', (('courseId', 1),)): [_http_error(503), _http_error(429), {'students': [{'userId': 1}]}],
+        ('students', (('courseId', 2),)): [{'students': [{'userId': 2}]}]
+    })
+
+    assert execute_paged_list_requests(
+        classroom_service=classroom_service,
+        paged_list_requests=[PagedListRequest(key=course_id, list_method=students, items_key='students',
+                                              list_kwargs={'courseId': course_id})
+                             for course_id in (1, 2)]
+    ) == {1: [{'userId': 1}], 2: [{'userId': 2}]}
+    assert executed_batches[1] == [('students', (('courseId', 1),))]
+    # Each retry waits twice as long as the one before it
+    assert mock_sleep.call_args_list == [call(0.5), call(1.0)]
+
+
+def test_execute_paged_list_requests_raises_item_errors():
+    students = _list_method('students')
+    classroom_service, _ = _fake_classroom_service({
+        ('students', (('courseId', 1),)): [_http_error(403)],
+    })
+
+    with raises(HttpError):
+        execute_paged_list_requests(
+            classroom_service=classroom_service,
+            paged_list_requests=[PagedListRequest(key=1, list_method=students, items_key='students',
+                                                  list_kwargs={'courseId': 1})]
+        )
+
+
+@patch('classroom_batch.sleep')
+def test_execute_paged_list_requests_gives_up_on_repeated_transient_errors(mock_sleep):
+    students = _list_method('students')
+    classroom_service, executed_batches = _fake_classroom_service({
+        ('students', (('courseId', 1),)): [_http_error(429), _http_error(429), _http_error(429)],
+    })
+
+    with raises(HttpError):
+        execute_paged_list_requests(
+            classroom_service=classroom_service,
+            paged_list_requests=[PagedListRequest(key=1, list_method=students, items_key='students',
+                                                  list_kwargs={'courseId': 1})]
+        )
+    assert len(executed_batches) == 3
@@ -0,0 +1,72 @@
+import numpy as np
+from pytest import mark
+
+from aeries_utils import AssignmentPatchData
+from grade_matrix import (BLANK_CODE, MISSING_CODE, NOT_APPLICABLE_CODE, UNRECOGNIZED_AERIES_MARK_CODE,
+                          PeriodGradeMatrix, encode_aeries_score, encode_google_classroom_grade)
+
+
+@mark.parametrize('grade,expected_code', (
+        (None, BLANK_CODE),
+        (0, MISSING_CODE),
+        (7, 7.0),
+        (9.5, 9.5)
+))
+def test_encode_google_classroom_grade(grade, expected_code):
+    assert encode_google_classroom_grade(grade=grade) == expected_code
+
+
+@mark.parametrize('score,expected_code', (
+        ('', BLANK_CODE),
+        ('MI', MISSING_CODE),
+        ('N/A', NOT_APPLICABLE_CODE),
+        ('10', 10.0),
+        ('9.5', 9.5),
+        (50, 50.0),
+        ('EX', UNRECOGNIZED_AERIES_MARK_CODE),
+        ('-1', UNRECOGNIZED_AERIES_MARK_CODE)
+))
+def test_encode_aeries_score(score, expected_code):
+    assert encode_aeries_score(score=score) == expected_code
+
+
+def test_period_grade_matrix_build():
+    grade_matrix = PeriodGradeMatrix.build(
+        assignment_submissions=[(80, {1: 10, 2: None}), (81, {3: 0, 1: 4})],
+        aeries_assignment_submissions={80: {1000: '10', 2000: 'MI', 3000: '', 4000: '7'}},
+        student_ids_to_student_nums={1: 1000, 2: 2000, 3: 3000, 4: 4000}
+    )
+
+    assert grade_matrix.student_ids == [1, 2, 3]
+    assert grade_matrix.student_nums.tolist() == [1000, 2000, 3000]
+    assert grade_matrix.assignment_numbers.tolist() == [80, 81]
+    np.testing.assert_array_equal(grade_matrix.google_classroom_grades,
+                                  [[10, 4], [BLANK_CODE, np.nan], [np.nan, MISSING_CODE]])
+    # Aeries scores for students without a Google Classroom submission are left out
+    np.testing.assert_array_equal(grade_matrix.aeries_scores,
+                                  [[10, np.nan], [MISSING_CODE, np.nan], [BLANK_CODE, np.nan]])
+    assert grade_matrix.new_assignments.tolist() == [False, True]
+
+
+def test_period_grade_matrix_generate_patch_data():
+    grade_matrix = PeriodGradeMatrix.build(
+        assignment_submissions=[(80, {1: 10, 2: None, 3: 0, 4: 5}), (81, {2: 3, 1: 0})],
+        aeries_assignment_submissions={80: {1000: '10', 2000: 'N/A', 3000: 'MI'}},
+        student_ids_to_student_nums={1: 1000, 2: 2000, 3: 3000, 4: 4000}
+    )
+
+    assert grade_matrix.generate_patch_data() == [
+        AssignmentPatchData(student_num=2000, assignment_number=80, grade=None),
+        # Aeries has scores for the assignment, but none for this student
+        AssignmentPatchData(student_num=4000, assignment_number=80, grade=5),
+        AssignmentPatchData(student_num=1000, assignment_number=81, grade=0),
+        AssignmentPatchData(student_num=2000, assignment_number=81, grade=3)
+    ]
+
+
+def test_period_grade_matrix_without_submissions():
+    grade_matrix = PeriodGradeMatrix.build(assignment_submissions=[],
+                                           aeries_assignment_submissions={},
+                                           student_ids_to_student_nums={})
+
+    assert grade_matrix.generate_patch_data() == []
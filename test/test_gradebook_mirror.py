@@ -0,0 +1,122 @@
+import sqlite3
+from unittest.mock import Mock, patch
+
+from arrow import Arrow
+
+from aeries_utils import AeriesAssignmentData, AeriesCategory, AeriesClassroomData, AeriesData
+from gradebook_mirror import GRADEBOOK_MIRROR_VERSION, GradebookMirror
+
+
+def _aeries_data(periods: list[int]) -> AeriesData:
+    aeries_data = AeriesData(periods=periods, s_cookie='s_cookie')
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F', 2: '67890/F'}
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 1000, 2: 2000}, 2: {3: 3000}}
+    aeries_data.periods_to_assignment_information = {
+        1: {'hw1': AeriesAssignmentData(id=1, point_total=5, category='Practice'),
+            'hw2': AeriesAssignmentData(id=2, point_total=10, category='Performance')},
+        2: {'quiz': AeriesAssignmentData(id=4, point_total=20, category='Performance')}
+    }
+    aeries_data.periods_to_assignment_submissions = {1: {1: {1000: '5', 2000: 'MI'}, 2: {1000: ''}},
+                                                     2: {4: {3000: '18'}}}
+    aeries_data.periods_to_gradebook_information = {
+        period: AeriesClassroomData(categories={'Practice': AeriesCategory(name='Practice', weight=40.0, id=1),
+                                                'Performance': AeriesCategory(name='Performance', weight=60.0, id=2)},
+                                    end_term_dates={'F': Arrow(2022, 1, 22)})
+        for period in (1, 2)
+    }
+    return aeries_data
+
+
+def test_gradebook_mirror_aeries_round_trip(tmp_path):
+    path = str(tmp_path / 'gradebook_mirror.sqlite')
+    saved_aeries_data = _aeries_data(periods=[1, 2])
+    GradebookMirror(path=path).save_aeries_data(aeries_data=saved_aeries_data, periods=[1])
+
+    loaded_aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+    loaded_aeries_data.periods_to_gradebook_ids = {1: '12345/F', 2: '67890/F'}
+    assert GradebookMirror(path=path).load_aeries_data(aeries_data=loaded_aeries_data, periods=[1, 2]) == [1]
+
+    assert loaded_aeries_data.periods_to_student_ids_to_student_nums == {1: {1: 1000, 2: 2000}}
+    assert loaded_aeries_data.periods_to_assignment_information == {
+        1: saved_aeries_data.periods_to_assignment_information[1]
+    }
+    assert loaded_aeries_data.periods_to_assignment_submissions == {1: {1: {1000: '5', 2000: 'MI'}, 2: {1000: ''}}}
+    assert loaded_aeries_data.periods_to_gradebook_information == {
+        1: saved_aeries_data.periods_to_gradebook_information[1]
+    }
+
+
+def test_gradebook_mirror_save_replaces_period(tmp_path):
+    gradebook_mirror = GradebookMirror(path=str(tmp_path / 'gradebook_mirror.sqlite'))
+    aeries_data = _aeries_data(periods=[1, 2])
+    gradebook_mirror.save_aeries_data(aeries_data=aeries_data, periods=[1, 2])
+
+    aeries_data.periods_to_assignment_submissions[1] = {1: {1000: '4'}}
+    gradebook_mirror.save_aeries_data(aeries_data=aeries_data, periods=[1])
+
+    loaded_aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+    loaded_aeries_data.periods_to_gradebook_ids = {1: '12345/F', 2: '67890/F'}
+    gradebook_mirror.load_aeries_data(aeries_data=loaded_aeries_data, periods=[1, 2])
+    assert loaded_aeries_data.periods_to_assignment_submissions == {1: {1: {1000: '4'}}, 2: {4: {3000: '18'}}}
+
+
+def test_gradebook_mirror_skips_periods_whose_gradebook_changed(tmp_path):
+    gradebook_mirror = GradebookMirror(path=str(tmp_path / 'gradebook_mirror.sqlite'))
+    gradebook_mirror.save_aeries_data(aeries_data=_aeries_data(periods=[1, 2]), periods=[1, 2])
+
+    # Period 2 is a different gradebook after the term rolled over
+    loaded_aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+    loaded_aeries_data.periods_to_gradebook_ids = {1: '12345/F', 2: '67890/S'}
+    assert gradebook_mirror.load_aeries_data(aeries_data=loaded_aeries_data, periods=[1, 2]) == [1]
+
+    assert loaded_aeries_data.periods_to_gradebook_ids == {1: '12345/F', 2: '67890/S'}
+    assert loaded_aeries_data.periods_to_assignment_submissions == {1: {1: {1000: '5', 2000: 'MI'}, 2: {1000: ''}}}
+
+
+def test_gradebook_mirror_assignment_fingerprints(tmp_path):
+    gradebook_mirror = GradebookMirror(path=str(tmp_path / 'gradebook_mirror.sqlite'))
+    # Never fully verified
+    assert gradebook_mirror.get_assignment_fingerprints(gradebook_id='12345/F') is None
+
+    gradebook_mirror.record_assignment_fingerprints(gradebook_id='12345/F',
+                                                    assignment_names_to_fingerprints={'hw1': 'a', 'hw2': 'b'},
+                                                    full_verify=True)
+    gradebook_mirror.record_assignment_fingerprints(gradebook_id='12345/F',
+                                                    assignment_names_to_fingerprints={'hw2': 'c'},
+                                                    full_verify=False)
+
+    assert gradebook_mirror.get_assignment_fingerprints(gradebook_id='12345/F') == {'hw1': 'a', 'hw2': 'c'}
+    assert gradebook_mirror.get_assignment_fingerprints(gradebook_id='67890/F') is None
+
+
+def test_gradebook_mirror_full_verify_due(tmp_path):
+    gradebook_mirror = GradebookMirror(path=str(tmp_path / 'gradebook_mirror.sqlite'),
+                                       full_verify_interval_seconds=60)
+
+    with patch('gradebook_mirror.time', return_value=1000):
+        gradebook_mirror.record_assignment_fingerprints(gradebook_id='12345/F',
+                                                        assignment_names_to_fingerprints={'hw1': 'a'},
+                                                        full_verify=True)
+    with patch('gradebook_mirror.time', return_value=1059):
+        assert not gradebook_mirror.is_full_verify_due(gradebook_id='12345/F')
+        assert gradebook_mirror.get_assignment_fingerprints(gradebook_id='12345/F') == {'hw1': 'a'}
+    with patch('gradebook_mirror.time', return_value=1060):
+        assert gradebook_mirror.is_full_verify_due(gradebook_id='12345/F')
+        assert gradebook_mirror.get_assignment_fingerprints(gradebook_id='12345/F') is None
+    assert gradebook_mirror.is_full_verify_due(gradebook_id='67890/F')
+
+
+def test_gradebook_mirror_rebuilt_on_version_mismatch(tmp_path):
+    path = str(tmp_path / 'gradebook_mirror.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE aeries_gradebooks (period INTEGER)')
+    connection.execute('INSERT INTO aeries_gradebooks (period) VALUES (1)')
+    connection.execute(f'PRAGMA user_version = {GRADEBOOK_MIRROR_VERSION + 1}')
+    connection.commit()
+    connection.close()
+
+    gradebook_mirror = GradebookMirror(path=path)
+
+    assert gradebook_mirror.load_aeries_data(aeries_data=AeriesData(periods=[1], s_cookie='s_cookie'),
+                                             periods=[1]) == []
+    assert gradebook_mirror.connection.execute('PRAGMA user_version').fetchone() == (GRADEBOOK_MIRROR_VERSION,)
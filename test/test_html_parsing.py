@@ -0,0 +1,238 @@
+from arrow import Arrow
+from pytest import fixture, importorskip, mark, raises
+
+from aeries_utils import (ASSIGNMENT_FORM_TARGETS, GRADEBOOK_INFORMATION_TARGETS, GRADEBOOK_PAGE_TARGETS,
+                          SCORES_BY_CLASS_TARGETS, SCORES_BY_STUDENT_TARGETS, AeriesAssignmentData, AeriesCategory,
+                          AeriesData)
+from html_parsing import HTML_PARSER_BUILTIN, HTML_PARSER_LXML, HTML_PARSER_SELECTOLAX, HtmlTarget, parse_html
+
+GRADEBOOK_PAGE_HTML = '''
+<html><head><script>var html = '<ul id="ValidGradebookList"></ul>';</script></head>
+<body>
+  <nav><ul><li><a href="/teacher/Default.aspx">Home</a></li></ul></nav>
+  <ul id="ValidGradebookList" class="dropdown">
+    <li data-validgradebookandterm="4532451/S">English 9</li>
+    <li data-validgradebookandterm="4532452/S">English 10</li>
+    <li data-validgradebookandterm="4532453/S">Study Hall</li>
+  </ul>
+  <div id="GbkDash-list-view" class="list">
+    <div class="row"><a href="/teacher/gradebook/4532451/S/ScoresByClass">1 - English 9</a></div>
+    <div class="row"><a href="/teacher/gradebook/4532452/S/ScoresByClass">2 - English 10</a></div>
+    <div class="row"><a href="/teacher/gradebook/4532453/S/ScoresByClass">5 - Study Hall</a></div>
+  </div>
+</body></html>
+'''
+
+SCORES_BY_CLASS_HTML = '''
+<html><head><title>Scores By Class</title></head>
+<body>
+  <div class="toolbar"><table class="layout"><tr><td>Toolbar</td></tr></table></div>
+  <table class="students fixed">
+    <tr class="row" data-sn="7" data-stuid="5120784"><td>Alice Bob</td></tr>
+    <tr class="row" data-sn="8" data-stuid="34523"><td>Carol Dee</td></tr>
+    <tr class="header"><td>Not a student</td></tr>
+  </table>
+  <table class="assignment-header">
+    <tr>
+      <th class="scores-by-class-override" data-an="1">
+        <table>
+          <tr class="description row cursor-hand" data-assignment-desc="1 - Essay: Part 1">
+            <td>Category:</td><td>Performance</td>
+          </tr>
+          <tr class="scores row"><td><div class="ellipsis"><span title="# Correct Possible"> : 100</span></div></td></tr>
+        </table>
+      </th>
+      <th class="scores-by-class-override" data-an="2">
+        <table>
+          <tr class="description row cursor-hand" data-assignment-desc="2 - Busywork &amp; More">
+            <td>Category:</td><td>Practice</td>
+          </tr>
+          <tr class="scores row"><td><div class="ellipsis"><span title="# Correct Possible"> : 10</span></div></td></tr>
+        </table>
+      </th>
+    </tr>
+  </table>
+  <table class="assignments">
+    <tr>
+      <td class="cell" data-stusc="341" data-an="1" data-sn="7" data-original-value="95.5"></td>
+      <td class="cell" data-stusc="341" data-an="2" data-sn="7" data-original-value="MI"></td>
+    </tr>
+    <tr>
+      <td class="cell" data-stusc="341" data-an="1" data-sn="8" data-original-value=""></td>
+      <td class="cell" data-stusc="341" data-an="2" data-sn="8" data-original-value="N/A"></td>
+      <td class="cell" data-stusc="999" data-an="2" data-sn="9" data-original-value="3"></td>
+    </tr>
+  </table>
+</body></html>
+'''
+
+GRADEBOOK_INFORMATION_HTML = '''
+<html><body>
+  <form><input name="Search" type="text" value="ignored"></form>
+  <table id="manageManageCategoriesTable">
+    <tr>
+      <td><input type="text" data-cat-value="1" value="Practice"></td>
+      <td><input type="number" value="30"></td>
+      <td><input type="checkbox" value="on"></td>
+    </tr>
+    <tr>
+      <td><input type="text" data-cat-value="2" value="Performance"></td>
+      <td><input type="number" value="70"></td>
+    </tr>
+  </table>
+  <table class="manageTerms">
+    <tr>
+      <td><input class="gradebook-term-desc" value="Fall"></td>
+      <td class="term-end-date"><input value="12/19/2025 12:00 AM"></td>
+    </tr>
+    <tr>
+      <td><input class="gradebook-term-desc" value="Spring"></td>
+      <td class="term-end-date"><input value="06/05/2026 12:00 AM"></td>
+    </tr>
+  </table>
+</body></html>
+'''
+
+ASSIGNMENT_FORM_HTML = '''
+<html><body>
+  <div class="header"><input name="__RequestVerificationToken" type="hidden" value="not-in-a-form"></div>
+  <form action="/teacher/gradebook/manage/assignment" method="post">
+    <input name="__RequestVerificationToken" type="hidden" value="form-token">
+    <input name="Assignment.Description" type="text" value="">
+  </form>
+  <form action="/other"><input name="__RequestVerificationToken" type="hidden" value="second-form"></form>
+</body></html>
+'''
+
+SCORES_BY_STUDENT_HTML = '''
+<html><body>
+  <div class="summary"><div id="overallPercentDisplay" class="percent">96.65%</div></div>
+</body></html>
+'''
+
+
+def _available_parsers() -> list[str]:
+    parsers = [HTML_PARSER_BUILTIN]
+    try:
+        import lxml  # noqa: F401
+        parsers.append(HTML_PARSER_LXML)
+    except ImportError:
+        pass
+    try:
+        import selectolax  # noqa: F401
+        parsers.append(HTML_PARSER_SELECTOLAX)
+    except ImportError:
+        pass
+    return parsers
+
+
+@fixture(params=_available_parsers())
+def parser(request) -> str:
+    return request.param
+
+
+@mark.parametrize('targets', (None, GRADEBOOK_PAGE_TARGETS))
+def test_periods_to_gradebook_and_term_identical_across_parsers(parser, targets):
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='aeries-cookie')
+
+    assert aeries_data._get_periods_to_gradebook_and_term(
+        beautiful_soup=parse_html(GRADEBOOK_PAGE_HTML, parser=parser, targets=targets)
+    ) == aeries_data._get_periods_to_gradebook_and_term(
+        beautiful_soup=parse_html(GRADEBOOK_PAGE_HTML, parser=HTML_PARSER_BUILTIN)
+    ) == {1: '4532451/S', 2: '4532452/S'}
+
+
+@mark.parametrize('targets', (None, SCORES_BY_CLASS_TARGETS))
+def test_scores_by_class_parsers_identical_across_parsers(parser, targets):
+    beautiful_soup = parse_html(SCORES_BY_CLASS_HTML, parser=parser, targets=targets)
+    reference_soup = parse_html(SCORES_BY_CLASS_HTML, parser=HTML_PARSER_BUILTIN)
+
+    assert (AeriesData._get_student_ids_to_student_nums(beautiful_soup=beautiful_soup)
+            == AeriesData._get_student_ids_to_student_nums(beautiful_soup=reference_soup)
+            == {5120784: 7, 34523: 8})
+    assert (AeriesData._get_assignment_information(beautiful_soup=beautiful_soup)
+            == AeriesData._get_assignment_information(beautiful_soup=reference_soup)
+            == {'Essay: Part 1': AeriesAssignmentData(id=1, point_total=100, category='Performance'),
+                'Busywork & More': AeriesAssignmentData(id=2, point_total=10, category='Practice')})
+    assert (AeriesData._get_assignment_submissions_information(beautiful_soup=beautiful_soup)
+            == AeriesData._get_assignment_submissions_information(beautiful_soup=reference_soup)
+            == {1: {7: '95.5', 8: ''}, 2: {7: 'MI', 8: 'N/A'}})
+
+
+@mark.parametrize('targets', (None, GRADEBOOK_INFORMATION_TARGETS))
+def test_gradebook_information_parsers_identical_across_parsers(parser, targets):
+    beautiful_soup = parse_html(GRADEBOOK_INFORMATION_HTML, parser=parser, targets=targets)
+    reference_soup = parse_html(GRADEBOOK_INFORMATION_HTML, parser=HTML_PARSER_BUILTIN)
+
+    assert (AeriesData._get_aeries_category_information(beautiful_soup=beautiful_soup)
+            == AeriesData._get_aeries_category_information(beautiful_soup=reference_soup)
+            == {'Practice': AeriesCategory(name='Practice', weight=0.3, id=1),
+                'Performance': AeriesCategory(name='Performance', weight=0.7, id=2)})
+    assert (AeriesData._get_aeries_end_term_information(beautiful_soup=beautiful_soup)
+            == AeriesData._get_aeries_end_term_information(beautiful_soup=reference_soup)
+            == {'F': Arrow(2025, 12, 19, tzinfo='US/Pacific'),
+                'S': Arrow(2026, 6, 5, tzinfo='US/Pacific')})
+
+
+@mark.parametrize('targets', (None, ASSIGNMENT_FORM_TARGETS))
+def test_assignment_form_identical_across_parsers(parser, targets):
+    beautiful_soup = parse_html(ASSIGNMENT_FORM_HTML, parser=parser, targets=targets)
+
+    assert beautiful_soup.find('form').find('input', attrs={'name': '__RequestVerificationToken'}).get('value') == \
+           'form-token'
+
+
+@mark.parametrize('targets', (None, SCORES_BY_STUDENT_TARGETS))
+def test_scores_by_student_identical_across_parsers(parser, targets):
+    beautiful_soup = parse_html(SCORES_BY_STUDENT_HTML, parser=parser, targets=targets)
+
+    assert beautiful_soup.find('div', id='overallPercentDisplay').string == '96.65%'
+
+
+def test_parse_html_targets_drop_everything_else(parser):
+    beautiful_soup = parse_html(SCORES_BY_CLASS_HTML, parser=parser, targets=SCORES_BY_CLASS_TARGETS)
+
+    assert beautiful_soup.find('title') is None
+    assert beautiful_soup.find('table', class_='layout') is None
+    assert [table.get('class') for table in beautiful_soup.find_all('table', class_=True)] == [
+        ['students', 'fixed'], ['assignment-header'], ['assignments']
+    ]
+
+
+def test_parse_html_unsupported_parser():
+    with raises(ValueError, match=r'Unsupported HTML parser: html5lib'):
+        parse_html(SCORES_BY_STUDENT_HTML, parser='html5lib')
+
+
+def test_selectolax_only_hands_outermost_targets_to_beautiful_soup():
+    importorskip('selectolax')
+    html = '<div><table class="outer"><tr><td><table class="inner"><tr><td>x</td></tr></table></td></tr></table></div>'
+
+    beautiful_soup = parse_html(html, parser=HTML_PARSER_SELECTOLAX, targets=(
+        HtmlTarget(tag_name='table', attribute='class', value='inner'),
+        HtmlTarget(tag_name='table', attribute='class', value='outer')
+    ))
+
+    assert len(beautiful_soup.find_all('table', class_='inner')) == 1
+
+
+@mark.parametrize('target,tag_name,attributes,matches', (
+        (HtmlTarget(tag_name='table', attribute='class', value='students'), 'table', {'class': 'students fixed'}, True),
+        (HtmlTarget(tag_name='table', attribute='class', value='students'), 'table', {'class': 'student'}, False),
+        (HtmlTarget(tag_name='table', attribute='class', value='students'), 'div', {'class': 'students'}, False),
+        (HtmlTarget(tag_name=None, attribute='id', value='list'), 'ul', {'id': 'list'}, True),
+        (HtmlTarget(tag_name=None, attribute='id', value='list'), 'ul', {}, False),
+        (HtmlTarget(tag_name='form'), 'form', {}, True),
+))
+def test_html_target_matches(target, tag_name, attributes, matches):
+    assert target.matches(tag_name=tag_name, attributes=attributes) == matches
+
+
+@mark.parametrize('target,css_selector', (
+        (HtmlTarget(tag_name='table', attribute='class', value='students'), 'table.students'),
+        (HtmlTarget(tag_name=None, attribute='id', value='list'), '#list'),
+        (HtmlTarget(tag_name='td', attribute='data-stusc', value='341'), 'td[data-stusc="341"]'),
+        (HtmlTarget(tag_name='form'), 'form'),
+))
+def test_html_target_css_selector(target, css_selector):
+    assert target.css_selector() == css_selector
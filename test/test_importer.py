@@ -1,12 +1,20 @@
-from unittest.mock import Mock, patch, call
+from threading import Barrier, Event, Lock
+from unittest.mock import ANY, Mock, patch, call
 
 from arrow import Arrow
 from pytest import mark, raises
 
-from aeries_utils import AeriesAssignmentData, AeriesCategory, AeriesClassroomData, AeriesData
+from aeries_utils import (ASSIGNMENT_CREATE, ASSIGNMENT_PATCH, AeriesAssignmentData, AssignmentWrite, AeriesCategory, AeriesClassroomData, AeriesData, GradeUpdateFailure,
+                          GradeUpdateSummary)
 from google_classroom_utils import GoogleClassroomAssignment, GoogleClassroomData
+from patch_plan import PatchPlan, PlannedAssignmentWrite, PlannedGradeWrite
+from write_journal import UnacknowledgedWrites
+from html_parsing import DEFAULT_HTML_PARSER
 from importer import run_import, _join_google_classroom_and_aeries_data, AssignmentPatchData, \
-    _generate_patch_data_for_assignment, _get_or_create_aeries_assignment
+    _fetch_google_classroom_and_aeries_data, _import_period, _write_and_validate_grades, \
+    _generate_patch_data_for_period, _get_or_create_aeries_assignment, AssignmentNumberAllocator, \
+    _fetch_with_gradebook_mirror, _period_differs_from_aeries, _record_assignment_fingerprints, _resume_import, \
+    _plan_writes, run_apply, _get_gradebook_number
 
 
 def test_run_import():
@@ -157,9 +165,24 @@ def test_run_import():
                                s_cookie='s_cookie')
                     mock_google_classroom_data.assert_called_once_with(
                         periods=periods,
-                        classroom_service=mock_classroom_service
+                        classroom_service=mock_classroom_service,
+                        batch_requests=False,
+                        field_masks=True,
+                        returned_only=False,
+                        roster_cache=ANY,
+                        sync_state=None,
+                        thread_local_classroom_service=None,
+                        max_workers=4
                     )
                     mock_google_classroom_data.return_value.get_submissions.assert_called_once()
+                    mock_aeries_data.assert_called_once_with(periods=periods,
+                                                             s_cookie='s_cookie',
+                                                             max_workers=6,
+                                                             max_write_workers=8,
+                                                             html_parser=DEFAULT_HTML_PARSER,
+                                                             max_student_workers=12,
+                                                             read_backend='html',
+                                                             write_journal=None)
                     mock_aeries_data.return_value.extract_gradebook_ids_from_html.assert_called_once()
                     mock_aeries_data.return_value.extract_student_ids_to_student_nums_from_html.assert_called_once()
                     mock_aeries_data.return_value.extract_assignment_information_from_html.assert_called_once()
@@ -168,11 +191,521 @@ def test_run_import():
 
                     mock_patch_data.assert_called_once_with(
                         google_classroom_data=mock_google_classroom_data.return_value,
-                        aeries_data=mock_aeries_data.return_value
+                        aeries_data=mock_aeries_data.return_value,
+                        allocator=None,
+                        gradebook_ids_to_fingerprints=None
                     )
                     mock_update_grades_in_aeries.assert_called_once_with(assignment_patch_data=assignment_patch_data)
 
 
+def test_run_import_pipeline():
+    mock_classroom_service = Mock()
+
+    with patch('importer._import_period') as mock_import_period:
+        run_import(classroom_service=mock_classroom_service,
+                   periods=[1, 2],
+                   s_cookie='s_cookie',
+                   max_workers=2,
+                   pipeline=True)
+
+        mock_import_period.assert_has_calls([
+            call(period=1, create_google_classroom_data=ANY, create_aeries_data=ANY,
+                 spot_check_sample_size=3, google_classroom_lock=ANY, allocator=ANY, gradebook_mirror=None),
+            call(period=2, create_google_classroom_data=ANY, create_aeries_data=ANY,
+                 spot_check_sample_size=3, google_classroom_lock=ANY, allocator=ANY, gradebook_mirror=None)
+        ], any_order=True)
+        first_call, second_call = mock_import_period.call_args_list
+        # Periods share the Google Classroom lock and the assignment number allocator
+        assert first_call.kwargs['google_classroom_lock'] is second_call.kwargs['google_classroom_lock']
+        assert first_call.kwargs['allocator'] is second_call.kwargs['allocator']
+        assert first_call.kwargs['create_aeries_data'](periods=[1]).max_workers == 2
+        assert first_call.kwargs['create_google_classroom_data'](periods=[1]).classroom_service is \
+            mock_classroom_service
+
+
+def test_run_import_pipeline_with_classroom_service_per_thread():
+    mock_classroom_service = Mock()
+    mock_create_classroom_service = Mock()
+
+    with patch('importer._import_period') as mock_import_period:
+        run_import(classroom_service=mock_classroom_service,
+                   periods=[1, 2],
+                   s_cookie='s_cookie',
+                   pipeline=True,
+                   create_classroom_service=mock_create_classroom_service)
+
+        first_call, second_call = mock_import_period.call_args_list
+        # Each thread has its own Google Classroom service, so periods do not take turns fetching
+        assert first_call.kwargs['google_classroom_lock'] is None
+        google_classroom_data = first_call.kwargs['create_google_classroom_data'](periods=[1])
+        assert google_classroom_data._get_classroom_service() is mock_classroom_service
+        mock_create_classroom_service.assert_not_called()
+
+
+def test_run_import_pipeline_writes_period_while_another_is_fetching():
+    period_1_written = Event()
+
+    def import_period(period, create_google_classroom_data, create_aeries_data, spot_check_sample_size,
+                      google_classroom_lock, allocator, gradebook_mirror):
+        if period == 1:
+            period_1_written.set()
+        else:
+            # Period 2 is still fetching when period 1's grades are written
+            assert period_1_written.wait(timeout=5)
+
+    with patch('importer._import_period', side_effect=import_period):
+        with patch('click.echo') as mock_echo:
+            run_import(classroom_service=Mock(), periods=[1, 2], s_cookie='s_cookie', pipeline=True)
+
+            mock_echo.assert_not_called()
+
+
+def test_run_import_pipeline_period_failure_does_not_block_others():
+    def import_period(period, create_google_classroom_data, create_aeries_data, spot_check_sample_size,
+                      google_classroom_lock, allocator, gradebook_mirror):
+        if period == 2:
+            raise ValueError('Period 2 is not a valid period number.')
+
+    with patch('importer._import_period', side_effect=import_period) as mock_import_period:
+        with patch('click.echo') as mock_echo:
+            run_import(classroom_service=Mock(), periods=[1, 2, 3], s_cookie='s_cookie', pipeline=True)
+
+            assert mock_import_period.call_count == 3
+            mock_echo.assert_has_calls([
+                call('Period 2 could not be imported: Period 2 is not a valid period number.'),
+                call('Periods 2 were not imported. Re-run the importer for them once the problem is fixed.')
+            ])
+
+
+def test_import_period():
+    mock_create_google_classroom_data = Mock()
+    mock_create_aeries_data = Mock()
+    google_classroom_lock = Lock()
+    allocator = AssignmentNumberAllocator()
+
+    with patch('importer._fetch_google_classroom_and_aeries_data') as mock_fetch:
+        with patch('importer._write_and_validate_grades') as mock_write_and_validate_grades:
+            _import_period(period=3,
+                           create_google_classroom_data=mock_create_google_classroom_data,
+                           create_aeries_data=mock_create_aeries_data,
+                           spot_check_sample_size=2,
+                           google_classroom_lock=google_classroom_lock,
+                           allocator=allocator)
+
+            mock_create_google_classroom_data.assert_called_once_with(periods=[3])
+            mock_create_aeries_data.assert_called_once_with(periods=[3])
+            mock_fetch.assert_called_once_with(google_classroom_data=mock_create_google_classroom_data.return_value,
+                                               aeries_data=mock_create_aeries_data.return_value,
+                                               google_classroom_lock=google_classroom_lock)
+            mock_write_and_validate_grades.assert_called_once_with(
+                google_classroom_data=mock_create_google_classroom_data.return_value,
+                aeries_data=mock_create_aeries_data.return_value,
+                periods=[3],
+                spot_check_sample_size=2,
+                allocator=allocator,
+                gradebook_mirror=None,
+                google_classroom_lock=google_classroom_lock
+            )
+
+
+def test_write_and_validate_grades_logs_discrepancies_under_google_classroom_lock():
+    google_classroom_lock = Lock()
+    aeries_data = Mock()
+    aeries_data.update_grades_in_aeries.return_value = GradeUpdateSummary(succeeded={}, failed=[])
+
+    def log_discrepancies():
+        assert google_classroom_lock.locked()
+
+    with patch('importer._join_google_classroom_and_aeries_data', return_value={}):
+        with patch('importer.Validator') as mock_validator:
+            mock_validator.return_value.log_discrepancies.side_effect = log_discrepancies
+            _write_and_validate_grades(google_classroom_data=Mock(),
+                                       aeries_data=aeries_data,
+                                       periods=[1],
+                                       spot_check_sample_size=3,
+                                       google_classroom_lock=google_classroom_lock)
+
+    mock_validator.return_value.log_discrepancies.assert_called_once()
+    assert not google_classroom_lock.locked()
+
+
+def test_run_import_resume():
+    with patch('importer.WriteJournal') as mock_write_journal:
+        with patch('importer.AeriesData') as mock_aeries_data:
+            with patch('importer._resume_import') as mock_resume_import:
+                with patch('importer._fetch_google_classroom_and_aeries_data') as mock_fetch:
+                    run_import(classroom_service=Mock(), periods=[1, 2], s_cookie='s_cookie',
+                               write_journal_path='write_journal.jsonl', resume=True)
+
+    mock_write_journal.assert_called_once_with(path='write_journal.jsonl')
+    assert mock_aeries_data.call_args.kwargs['write_journal'] == mock_write_journal.return_value
+    mock_resume_import.assert_called_once_with(aeries_data=mock_aeries_data.return_value,
+                                               write_journal=mock_write_journal.return_value)
+    mock_write_journal.return_value.start.assert_not_called()
+    mock_fetch.assert_not_called()
+
+
+def test_run_import_starts_write_journal():
+    with patch('importer.WriteJournal') as mock_write_journal:
+        with patch('importer.AeriesData'), patch('importer.GoogleClassroomData'):
+            with patch('importer._fetch_google_classroom_and_aeries_data'):
+                with patch('importer._write_and_validate_grades'):
+                    run_import(classroom_service=Mock(), periods=[1], s_cookie='s_cookie',
+                               write_journal_path='write_journal.jsonl')
+
+    mock_write_journal.return_value.start.assert_called_once()
+    mock_write_journal.return_value.resume.assert_not_called()
+
+
+def test_run_import_closes_write_journal_on_failure():
+    with patch('importer.WriteJournal') as mock_write_journal:
+        with patch('importer.AeriesData'), patch('importer.GoogleClassroomData'):
+            with patch('importer._fetch_google_classroom_and_aeries_data', side_effect=ValueError('fetch failed')):
+                with raises(ValueError, match='fetch failed'):
+                    run_import(classroom_service=Mock(), periods=[1], s_cookie='s_cookie',
+                               write_journal_path='write_journal.jsonl')
+
+    mock_write_journal.return_value.__exit__.assert_called_once()
+
+
+def test_run_import_resume_requires_write_journal():
+    with raises(ValueError, match='requires the write journal'):
+        run_import(classroom_service=Mock(), periods=[1], s_cookie='s_cookie', resume=True)
+
+
+def _resume_test_assignment_write(action: str, assignment_id: int, assignment_name: str) -> AssignmentWrite:
+    return AssignmentWrite(action=action, gradebook_number='12345', assignment_id=assignment_id,
+                           assignment_name=assignment_name, point_total=5,
+                           category=AeriesCategory(id=1, name='Practice', weight=1.0), end_term_date=Arrow(2022, 1, 22))
+
+
+def test_resume_import():
+    assignment_write = _resume_test_assignment_write(action=ASSIGNMENT_PATCH, assignment_id=24, assignment_name='hw1')
+    assignment_patch_data = {'12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5)]}
+    write_journal = Mock()
+    write_journal.resume.return_value = UnacknowledgedWrites(assignment_writes=[assignment_write],
+                                                            assignment_patch_data=assignment_patch_data)
+    aeries_data = Mock()
+    aeries_data.read_backend = 'html'
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F', 2: '67890/F'}
+    aeries_data.update_grades_in_aeries.return_value = GradeUpdateSummary(succeeded={}, failed=[])
+
+    _resume_import(aeries_data=aeries_data, write_journal=write_journal)
+
+    # The gradebook written to is loaded first, for its request verification token and its assignments
+    assert aeries_data.mock_calls == [
+        call.extract_gradebook_ids_from_html(),
+        call.extract_assignment_information_from_html(),
+        call.extract_gradebook_information_from_html(),
+        call.send_assignment_write(assignment_write=assignment_write),
+        call.update_grades_in_aeries(assignment_patch_data=assignment_patch_data)
+    ]
+    assert aeries_data.periods_to_gradebook_ids == {1: '12345/F'}
+
+
+def test_resume_import_sends_request_verification_token():
+    assignment_write = _resume_test_assignment_write(action=ASSIGNMENT_CREATE, assignment_id=24,
+                                                     assignment_name='hw1')
+    write_journal = Mock()
+    write_journal.resume.return_value = UnacknowledgedWrites(assignment_writes=[assignment_write],
+                                                            assignment_patch_data={})
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
+
+    def extract_gradebook_information_from_html():
+        aeries_data.request_verification_token = 'request_verification_token'
+
+    with patch.object(aeries_data, 'extract_gradebook_ids_from_html',
+                      side_effect=lambda: aeries_data.periods_to_gradebook_ids.update({1: '12345/F'})):
+        with patch.object(aeries_data, 'extract_assignment_information_from_html',
+                          side_effect=lambda: aeries_data.periods_to_assignment_information.update({1: {}})):
+            with patch.object(aeries_data, 'extract_gradebook_information_from_html',
+                              side_effect=extract_gradebook_information_from_html):
+                with patch.object(aeries_data, '_get_form_request_verification_token', return_value='form_token'):
+                    aeries_data.session.post.return_value.status_code = 200
+                    _resume_import(aeries_data=aeries_data, write_journal=write_journal)
+
+    assert aeries_data.session.post.call_args.kwargs['headers']['Cookie'] == \
+        '__RequestVerificationToken_L3RlYWNoZXI1=request_verification_token; s=s_cookie'
+
+
+def test_resume_import_skips_created_assignments_and_continues_after_failures():
+    created = _resume_test_assignment_write(action=ASSIGNMENT_CREATE, assignment_id=24, assignment_name='hw1')
+    failed = _resume_test_assignment_write(action=ASSIGNMENT_CREATE, assignment_id=25, assignment_name='hw2')
+    patched = _resume_test_assignment_write(action=ASSIGNMENT_PATCH, assignment_id=26, assignment_name='hw3')
+    write_journal = Mock()
+    write_journal.resume.return_value = UnacknowledgedWrites(
+        assignment_writes=[created, failed, patched],
+        assignment_patch_data={'12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5),
+                                           AssignmentPatchData(student_num=1000, assignment_number=25, grade=4),
+                                           AssignmentPatchData(student_num=1000, assignment_number=26, grade=3)]}
+    )
+    aeries_data = Mock()
+    aeries_data.read_backend = 'html'
+    aeries_data.write_journal = write_journal
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F'}
+    # hw1 reached Aeries just before the import was interrupted
+    aeries_data.periods_to_assignment_information = {
+        1: {'hw1': AeriesAssignmentData(id=24, point_total=5, category='Practice')}
+    }
+
+    def send_assignment_write(assignment_write):
+        if assignment_write == failed:
+            raise ValueError('Assignment creation has unexpected status code: 500')
+
+    aeries_data.send_assignment_write.side_effect = send_assignment_write
+    aeries_data.update_grades_in_aeries.return_value = GradeUpdateSummary(succeeded={}, failed=[])
+
+    with patch('importer.click.echo') as mock_echo:
+        _resume_import(aeries_data=aeries_data, write_journal=write_journal)
+
+    write_journal.acknowledge_assignment_write.assert_called_once_with(assignment_write=created)
+    assert aeries_data.send_assignment_write.call_args_list == [call(assignment_write=failed),
+                                                                call(assignment_write=patched)]
+    # The grade update for the assignment that could not be created is left in the journal
+    aeries_data.update_grades_in_aeries.assert_called_once_with(assignment_patch_data={
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5),
+                    AssignmentPatchData(student_num=1000, assignment_number=26, grade=3)]
+    })
+    mock_echo.assert_any_call('Some assignments or grades could not be imported to Aeries. Re-run the importer with '
+                              '--resume to retry them.')
+
+
+def test_resume_import_requires_periods_of_journaled_gradebooks():
+    write_journal = Mock()
+    write_journal.resume.return_value = UnacknowledgedWrites(
+        assignment_writes=[_resume_test_assignment_write(action=ASSIGNMENT_CREATE, assignment_id=24,
+                                                         assignment_name='hw1')],
+        assignment_patch_data={}
+    )
+    aeries_data = Mock()
+    aeries_data.periods_to_gradebook_ids = {2: '67890/F'}
+
+    with raises(ValueError, match='Assignment writes for gradebook\\(s\\) 12345 are not in the periods specified'):
+        _resume_import(aeries_data=aeries_data, write_journal=write_journal)
+    aeries_data.send_assignment_write.assert_not_called()
+
+
+def test_plan_writes():
+    google_classroom_data, aeries_data = _mirror_test_data()
+    google_classroom_data.periods_to_assignments[1].extend([
+        GoogleClassroomAssignment(submissions={1: 4}, assignment_name='hw2', point_total=10, category='Practice'),
+        GoogleClassroomAssignment(submissions={2: 3}, assignment_name='hw3', point_total=5, category='Practice')
+    ])
+    aeries_data.periods_to_assignment_information[1]['hw2'] = AeriesAssignmentData(id=2, point_total=5,
+                                                                                   category='Practice')
+    aeries_data.periods_to_assignment_submissions[1][2] = {1000: '3'}
+    practice = aeries_data.periods_to_gradebook_information[1].categories['Practice']
+
+    with patch.object(aeries_data, 'create_aeries_assignment') as mock_create_aeries_assignment:
+        with patch.object(aeries_data, 'patch_aeries_assignment') as mock_patch_aeries_assignment:
+            patch_plan = _plan_writes(google_classroom_data=google_classroom_data, aeries_data=aeries_data, periods=[1])
+
+    # Nothing is written while planning
+    mock_create_aeries_assignment.assert_not_called()
+    mock_patch_aeries_assignment.assert_not_called()
+    assert patch_plan == PatchPlan(
+        periods=[1],
+        assignment_writes=[
+            PlannedAssignmentWrite(
+                assignment_write=AssignmentWrite(action=ASSIGNMENT_PATCH, gradebook_number='12345', assignment_id=2,
+                                                 assignment_name='hw2', point_total=10, category=practice,
+                                                 end_term_date=Arrow(2022, 1, 22)),
+                old_point_total=5,
+                old_category='Practice'
+            ),
+            PlannedAssignmentWrite(
+                assignment_write=AssignmentWrite(action=ASSIGNMENT_CREATE, gradebook_number='12345', assignment_id=3,
+                                                 assignment_name='hw3', point_total=5, category=practice,
+                                                 end_term_date=Arrow(2022, 1, 22)),
+                old_point_total=None,
+                old_category=None
+            )
+        ],
+        grade_writes=[
+            PlannedGradeWrite(gradebook_id='12345/F',
+                              patch_data=AssignmentPatchData(student_num=1000, assignment_number=2, grade=4),
+                              old_score='3'),
+            PlannedGradeWrite(gradebook_id='12345/F',
+                              patch_data=AssignmentPatchData(student_num=2000, assignment_number=3, grade=3),
+                              old_score=None)
+        ]
+    )
+
+
+def test_run_apply():
+    assignment_write = _resume_test_assignment_write(action=ASSIGNMENT_PATCH, assignment_id=2, assignment_name='hw2')
+    patch_plan = PatchPlan(
+        periods=[1],
+        assignment_writes=[PlannedAssignmentWrite(assignment_write=assignment_write, old_point_total=10,
+                                                  old_category='Practice')],
+        grade_writes=[PlannedGradeWrite(gradebook_id='12345/F',
+                                        patch_data=AssignmentPatchData(student_num=1000, assignment_number=2, grade=4),
+                                        old_score='3')]
+    )
+
+    with patch('importer.load_patch_plan', return_value=patch_plan) as mock_load_patch_plan:
+        with patch('importer.AeriesData') as mock_aeries_data:
+            mock_aeries_data.return_value.read_backend = 'html'
+            mock_aeries_data.return_value.periods_to_gradebook_ids = {1: '12345/F'}
+            mock_aeries_data.return_value.periods_to_assignment_information = {
+                1: {'hw2': AeriesAssignmentData(id=2, point_total=10, category='Practice')}
+            }
+            mock_aeries_data.return_value.update_grades_in_aeries.return_value = GradeUpdateSummary(succeeded={},
+                                                                                                    failed=[])
+            run_apply(plan_path='plan.json', s_cookie='s_cookie')
+
+    mock_load_patch_plan.assert_called_once_with(path='plan.json')
+    mock_aeries_data.assert_called_once_with(periods=[1], s_cookie='s_cookie', max_write_workers=8,
+                                             html_parser=DEFAULT_HTML_PARSER, write_journal=None)
+    assert mock_aeries_data.return_value.mock_calls == [
+        call.extract_gradebook_ids_from_html(),
+        call.extract_assignment_information_from_html(),
+        call.extract_gradebook_information_from_html(),
+        call.send_assignment_write(assignment_write=assignment_write),
+        call.update_grades_in_aeries(assignment_patch_data={
+            '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=2, grade=4)]
+        })
+    ]
+
+
+@mark.parametrize('action', (ASSIGNMENT_CREATE, ASSIGNMENT_PATCH))
+def test_run_apply_refuses_stale_plan(action):
+    assignment_write = _resume_test_assignment_write(action=action, assignment_id=3, assignment_name='hw3')
+    patch_plan = PatchPlan(
+        periods=[1],
+        assignment_writes=[PlannedAssignmentWrite(assignment_write=assignment_write, old_point_total=None,
+                                                  old_category=None)],
+        grade_writes=[]
+    )
+
+    with patch('importer.load_patch_plan', return_value=patch_plan):
+        with patch('importer.AeriesData') as mock_aeries_data:
+            mock_aeries_data.return_value.read_backend = 'html'
+            mock_aeries_data.return_value.periods_to_gradebook_ids = {1: '12345/F'}
+            # hw3 was created in Aeries under another number after the plan was made
+            mock_aeries_data.return_value.periods_to_assignment_information = {
+                1: {'hw3': AeriesAssignmentData(id=5, point_total=10, category='Practice')}
+            }
+            with raises(ValueError, match='hw3 in gradebook 12345 is assignment 5 in Aeries, but assignment 3'):
+                run_apply(plan_path='plan.json', s_cookie='s_cookie')
+
+    mock_aeries_data.return_value.send_assignment_write.assert_not_called()
+    mock_aeries_data.return_value.update_grades_in_aeries.assert_not_called()
+
+
+@mark.parametrize('gradebook_id', ('12345', '12345/X', 'abc/F'))
+def test_get_gradebook_number_invalid(gradebook_id):
+    with raises(ValueError, match=f'Expected gradebook number to be of pattern <number>/<S or F>, but was '
+                                  f'{gradebook_id}'):
+        _get_gradebook_number(gradebook_id=gradebook_id)
+
+
+def test_run_apply_assignment_create_sends_request_verification_token():
+    assignment_write = _resume_test_assignment_write(action=ASSIGNMENT_CREATE, assignment_id=3, assignment_name='hw3')
+    patch_plan = PatchPlan(
+        periods=[1],
+        assignment_writes=[PlannedAssignmentWrite(assignment_write=assignment_write, old_point_total=None,
+                                                  old_category=None)],
+        grade_writes=[]
+    )
+
+    def extract_gradebook_ids_from_html(aeries_data):
+        aeries_data.periods_to_gradebook_ids = {1: '12345/F'}
+
+    def extract_assignment_information_from_html(aeries_data):
+        aeries_data.periods_to_assignment_information = {1: {}}
+
+    def extract_gradebook_information_from_html(aeries_data):
+        aeries_data.request_verification_token = 'request_verification_token'
+
+    with patch('importer.load_patch_plan', return_value=patch_plan), \
+            patch('aeries_utils.requests.Session') as mock_session, \
+            patch.object(AeriesData, 'extract_gradebook_ids_from_html', autospec=True,
+                         side_effect=extract_gradebook_ids_from_html), \
+            patch.object(AeriesData, 'extract_assignment_information_from_html', autospec=True,
+                         side_effect=extract_assignment_information_from_html), \
+            patch.object(AeriesData, 'extract_gradebook_information_from_html', autospec=True,
+                         side_effect=extract_gradebook_information_from_html), \
+            patch.object(AeriesData, '_get_form_request_verification_token', return_value='form_token'):
+        mock_session.return_value.post.return_value.status_code = 200
+        run_apply(plan_path='plan.json', s_cookie='s_cookie')
+
+    mock_post = mock_session.return_value.post
+    mock_post.assert_called_once()
+    assert mock_post.call_args.kwargs['data']['Assignment.Description'] == 'hw3'
+    assert mock_post.call_args.kwargs['headers']['Cookie'] == \
+        '__RequestVerificationToken_L3RlYWNoZXI1=request_verification_token; s=s_cookie'
+
+
+def test_fetch_google_classroom_and_aeries_data_concurrently():
+    # Google Classroom and Aeries are both mid-fetch at the same time
+    barrier = Barrier(2, timeout=5)
+    google_classroom_data = Mock()
+    google_classroom_data.get_submissions.side_effect = lambda cancel_event: barrier.wait()
+    aeries_data = Mock()
+    aeries_data.extract_gradebook_ids_from_html.side_effect = lambda: barrier.wait()
+
+    _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data, aeries_data=aeries_data)
+
+    google_classroom_data.get_submissions.assert_called_once()
+    aeries_data.extract_gradebook_ids_from_html.assert_called_once()
+    aeries_data.extract_student_ids_to_student_nums_from_html.assert_called_once()
+    aeries_data.extract_assignment_information_from_html.assert_called_once()
+    aeries_data.extract_assignment_submissions_from_html.assert_called_once()
+    aeries_data.extract_gradebook_information_from_html.assert_called_once()
+
+
+def test_fetch_google_classroom_and_aeries_data_api_read_backend():
+    google_classroom_data = Mock()
+    aeries_data = Mock()
+    aeries_data.read_backend = 'api'
+
+    _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data, aeries_data=aeries_data)
+
+    aeries_data.extract_gradebook_ids_from_html.assert_called_once()
+    aeries_data.extract_student_ids_to_student_nums_from_api.assert_called_once()
+    aeries_data.extract_assignment_information_from_api.assert_called_once()
+    aeries_data.extract_assignment_submissions_from_api.assert_called_once()
+    aeries_data.extract_gradebook_information_from_html.assert_called_once()
+    aeries_data.extract_student_ids_to_student_nums_from_html.assert_not_called()
+    aeries_data.extract_assignment_information_from_html.assert_not_called()
+    aeries_data.extract_assignment_submissions_from_html.assert_not_called()
+
+
+def test_fetch_google_classroom_and_aeries_data_failure_cancels_other_side():
+    cancel_event = Event()
+    google_classroom_data = Mock()
+    google_classroom_data.get_submissions.side_effect = ValueError('Period 7 is not a valid period number.')
+    aeries_data = Mock()
+    aeries_data.extract_gradebook_ids_from_html.side_effect = lambda: cancel_event.wait(timeout=5)
+
+    with patch('importer.Event', return_value=cancel_event):
+        with raises(ValueError, match='Period 7 is not a valid period number.'):
+            _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                    aeries_data=aeries_data)
+
+    assert cancel_event.is_set()
+    google_classroom_data.get_submissions.assert_called_once_with(cancel_event=cancel_event)
+    # Aeries stops at its next step, whether or not it had started its first one
+    aeries_data.extract_student_ids_to_student_nums_from_html.assert_not_called()
+
+
+def test_fetch_google_classroom_and_aeries_data_holds_google_classroom_lock():
+    google_classroom_lock = Lock()
+    lock_held_during_fetch = []
+    google_classroom_data = Mock()
+    google_classroom_data.get_submissions.side_effect = \
+        lambda cancel_event: lock_held_during_fetch.append(google_classroom_lock.locked())
+
+    _fetch_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                            aeries_data=Mock(),
+                                            google_classroom_lock=google_classroom_lock)
+
+    assert lock_held_during_fetch == [True]
+    assert not google_classroom_lock.locked()
+
+
 def test_join_google_classroom_and_aeries_data():
     periods_to_assignment_data = {
         1: [GoogleClassroomAssignment(submissions={1: 10, 2: None},
@@ -269,30 +802,26 @@ def test_join_google_classroom_and_aeries_data():
     aeries_data.periods_to_gradebook_information = periods_to_classroom_data
     aeries_data.request_verification_token = 'request_verification_token'
 
+    allocator = AssignmentNumberAllocator()
+    periods_to_names_to_joined_assignments = {
+        1: {'hw1': AeriesAssignmentData(id=80, point_total=10, category='Practice'),
+            'hw2': AeriesAssignmentData(id=81, point_total=5, category='Practice')},
+        2: {'hw1': AeriesAssignmentData(id=91, point_total=5, category='Practice'),
+            'hw3': AeriesAssignmentData(id=90, point_total=10, category='Performance')}
+    }
+
     with patch('importer._get_or_create_aeries_assignment',
-               side_effect=[
-                   (AeriesAssignmentData(id=80,
-                                         point_total=10,
-                                         category='Practice'), 82),
-                   (AeriesAssignmentData(id=81,
-                                         point_total=5,
-                                         category='Practice'), 82),
-                   (AeriesAssignmentData(id=91,
-                                         point_total=5,
-                                         category='Practice'), 92),
-                   (AeriesAssignmentData(id=90,
-                                         point_total=10,
-                                         category='Performance'), 92)
-               ]) as mock_get_or_create_aeries_assignment:
-        with patch('importer._generate_patch_data_for_assignment',
+               side_effect=lambda google_classroom_assignment, aeries_data, period, allocator:
+               periods_to_names_to_joined_assignments[period][google_classroom_assignment.assignment_name]
+               ) as mock_get_or_create_aeries_assignment:
+        with patch('importer._generate_patch_data_for_period',
                    side_effect=[[
                        AssignmentPatchData(student_num=1000,
                                            assignment_number=80,
                                            grade=10),
                        AssignmentPatchData(student_num=2000,
                                            assignment_number=80,
-                                           grade=None)
-                   ], [
+                                           grade=None),
                        AssignmentPatchData(student_num=1000,
                                            assignment_number=81,
                                            grade=3),
@@ -308,8 +837,7 @@ def test_join_google_classroom_and_aeries_data():
                                            grade=10),
                        AssignmentPatchData(student_num=6000,
                                            assignment_number=90,
-                                           grade=None)
-                   ], [
+                                           grade=None),
                        AssignmentPatchData(student_num=5000,
                                            assignment_number=91,
                                            grade=3),
@@ -319,10 +847,11 @@ def test_join_google_classroom_and_aeries_data():
                        AssignmentPatchData(student_num=7000,
                                            assignment_number=91,
                                            grade=1)
-                   ]]) as mock_generate_patch_data_for_assignment:
+                   ]]) as mock_generate_patch_data_for_period:
             assert _join_google_classroom_and_aeries_data(
                 google_classroom_data=google_classroom_data,
-                aeries_data=aeries_data
+                aeries_data=aeries_data,
+                allocator=allocator
             ) == {
                        '12345/S': [
                            AssignmentPatchData(student_num=1000,
@@ -364,41 +893,38 @@ def test_join_google_classroom_and_aeries_data():
                 call(google_classroom_assignment=google_classroom_data.periods_to_assignments[1][0],
                      aeries_data=aeries_data,
                      period=1,
-                     next_assignment_id=82),
+                     allocator=allocator),
                 call(google_classroom_assignment=google_classroom_data.periods_to_assignments[1][1],
                      aeries_data=aeries_data,
                      period=1,
-                     next_assignment_id=82),
+                     allocator=allocator),
                 call(google_classroom_assignment=google_classroom_data.periods_to_assignments[2][0],
                      aeries_data=aeries_data,
                      period=2,
-                     next_assignment_id=91),
+                     allocator=allocator),
                 call(google_classroom_assignment=google_classroom_data.periods_to_assignments[2][1],
                      aeries_data=aeries_data,
                      period=2,
-                     next_assignment_id=92),
-            ])
+                     allocator=allocator),
+            ], any_order=True)
+            # hw3 is new in period 2, so it is reserved the number after hw1
+            assert allocator.gradebook_ids_to_assignment_names_to_numbers == {'12345/S': {}, '6789/F': {'hw3': 91}}
+            assert aeries_data.periods_to_assignment_information == periods_to_names_to_joined_assignments
 
-            mock_generate_patch_data_for_assignment.assert_has_calls([
+            mock_generate_patch_data_for_period.assert_has_calls([
                 call(google_classroom_data=google_classroom_data,
-                     google_classroom_submissions={1: 10, 2: None},
+                     assignment_submissions=[
+                         (80, {1: 10, 2: None}),
+                         (81, {1: 3, 2: 4, 3: 1})
+                     ],
                      aeries_data=aeries_data,
-                     aeries_assignment_id=80,
                      period=1),
                 call(google_classroom_data=google_classroom_data,
-                     google_classroom_submissions={1: 3, 2: 4, 3: 1},
+                     assignment_submissions=[
+                         (91, {1: 10, 2: None}),
+                         (90, {1: 3, 2: 4, 3: 1})
+                     ],
                      aeries_data=aeries_data,
-                     aeries_assignment_id=81,
-                     period=1),
-                call(google_classroom_data=google_classroom_data,
-                     google_classroom_submissions={1: 10, 2: None},
-                     aeries_data=aeries_data,
-                     aeries_assignment_id=91,
-                     period=2),
-                call(google_classroom_data=google_classroom_data,
-                     google_classroom_submissions={1: 3, 2: 4, 3: 1},
-                     aeries_data=aeries_data,
-                     aeries_assignment_id=90,
                      period=2)
             ])
 
@@ -440,6 +966,8 @@ def test_get_or_create_aeries_assignment_creation():
                       return_value=AeriesAssignmentData(id=80,
                                                         point_total=10,
                                                         category='Practice')) as mock_create_aeries_assignment:
+        allocator = AssignmentNumberAllocator()
+        allocator.reserve(gradebook_id='12345/F', existing_numbers=[79], assignment_names=['hw2'])
         assert _get_or_create_aeries_assignment(
             google_classroom_assignment=GoogleClassroomAssignment(submissions={1: 3, 2: 4, 3: 1},
                                                                   assignment_name='hw2',
@@ -447,10 +975,10 @@ def test_get_or_create_aeries_assignment_creation():
                                                                   category='Practice'),
             aeries_data=aeries_data,
             period=1,
-            next_assignment_id=80
-        ) == (AeriesAssignmentData(id=80,
-                                   point_total=10,
-                                   category='Practice'), 81)
+            allocator=allocator
+        ) == AeriesAssignmentData(id=80,
+                                  point_total=10,
+                                  category='Practice')
 
         mock_create_aeries_assignment.assert_has_calls([
             call(gradebook_number='12345',
@@ -508,10 +1036,10 @@ def test_get_or_create_aeries_assignment_patch():
                                                                   category='Practice'),
             aeries_data=aeries_data,
             period=1,
-            next_assignment_id=91
-        ) == (AeriesAssignmentData(id=80,
-                                   point_total=10,
-                                   category='Practice'), 91)
+            allocator=AssignmentNumberAllocator()
+        ) == AeriesAssignmentData(id=80,
+                                  point_total=10,
+                                  category='Practice')
         mock_patch_aeries_assignment.assert_has_calls([
             call(gradebook_number='12345',
                  assignment_id=80,
@@ -564,10 +1092,10 @@ def test_get_or_create_aeries_assignment_existing():
                                                               category='Practice'),
         aeries_data=aeries_data,
         period=1,
-        next_assignment_id=91
-    ) == (AeriesAssignmentData(id=80,
-                               point_total=5,
-                               category='Practice'), 91)
+        allocator=AssignmentNumberAllocator()
+    ) == AeriesAssignmentData(id=80,
+                              point_total=5,
+                              category='Practice')
 
 
 def test_get_or_create_aeries_assignment_exception():
@@ -592,6 +1120,7 @@ def test_get_or_create_aeries_assignment_exception():
 
     mock_google_classroom_data = Mock()
     mock_google_classroom_data.periods_to_assignments = periods_to_assignment_data
+    mock_google_classroom_data.periods_to_changed_assignment_names = {}
 
     periods_to_gradebook_ids = {
         1: '12345/S',
@@ -651,15 +1180,14 @@ def test_get_or_create_aeries_assignment_exception():
 
     with raises(ValueError, match='Expected gradebook number to be of pattern <number>/<S or F>, '
                                   'but was Bad Format/F'):
-        with patch('importer._generate_patch_data_for_assignment',
+        with patch('importer._generate_patch_data_for_period',
                    side_effect=[[
                        AssignmentPatchData(student_num=1000,
                                            assignment_number=80,
                                            grade=10),
                        AssignmentPatchData(student_num=2000,
                                            assignment_number=80,
-                                           grade=None)
-                   ], [
+                                           grade=None),
                        AssignmentPatchData(student_num=1000,
                                            assignment_number=81,
                                            grade=3),
@@ -676,31 +1204,425 @@ def test_get_or_create_aeries_assignment_exception():
                        AssignmentPatchData(student_num=6000,
                                            assignment_number=90,
                                            grade=None)
-                   ]]) as mock_generate_patch_data_for_assignment:
+                   ]]) as mock_generate_patch_data_for_period:
             _join_google_classroom_and_aeries_data(
                 google_classroom_data=mock_google_classroom_data,
                 aeries_data=aeries_data
             )
 
-            mock_generate_patch_data_for_assignment.assert_has_calls([
+            mock_generate_patch_data_for_period.assert_has_calls([
                 call(google_classroom_data=mock_google_classroom_data,
-                     google_classroom_submissions={1: 10, 2: None},
+                     assignment_submissions=[
+                         (80, {1: 10, 2: None}),
+                         (81, {1: 3, 2: 4, 3: 1})
+                     ],
                      aeries_data=aeries_data,
-                     aeries_assignment_id=80,
                      period=1),
                 call(google_classroom_data=mock_google_classroom_data,
-                     google_classroom_submissions={1: 3, 2: 4, 3: 1},
+                     assignment_submissions=[
+                         (90, {1: 10, 2: None})
+                     ],
                      aeries_data=aeries_data,
-                     aeries_assignment_id=81,
-                     period=1),
-                call(google_classroom_data=mock_google_classroom_data,
-                     google_classroom_submissions={1: 10, 2: None},
-                     aeries_data=aeries_data,
-                     aeries_assignment_id=90,
                      period=2)
             ])
 
 
+def test_join_google_classroom_and_aeries_data_creates_assignments_concurrently():
+    # Both creations are in flight at once, and each gets its own reserved assignment number
+    barrier = Barrier(2, timeout=5)
+    google_classroom_data = GoogleClassroomData(periods=[1], classroom_service=Mock())
+    google_classroom_data.periods_to_assignments = {
+        1: [GoogleClassroomAssignment(submissions={1: 3}, assignment_name='hw1', point_total=5, category='Practice'),
+            GoogleClassroomAssignment(submissions={1: 4}, assignment_name='hw2', point_total=5, category='Practice')]
+    }
+
+    aeries_data = AeriesData(periods=[1], s_cookie='s_cookie', max_write_workers=2)
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F'}
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 1000}}
+    aeries_data.periods_to_assignment_information = {
+        1: {'old': AeriesAssignmentData(id=7, point_total=5, category='Practice')}
+    }
+    aeries_data.periods_to_assignment_submissions = {1: {}}
+    aeries_data.periods_to_gradebook_information = {
+        1: AeriesClassroomData(categories={'Practice': AeriesCategory(id=1, name='Practice', weight=1.0)},
+                               end_term_dates={'F': Arrow(2022, 1, 22)})
+    }
+
+    def create_aeries_assignment(gradebook_number, assignment_id, assignment_name, point_total, category,
+                                 end_term_date):
+        barrier.wait()
+        return AeriesAssignmentData(id=assignment_id, point_total=point_total, category=category.name)
+
+    with patch.object(aeries_data, 'create_aeries_assignment',
+                      side_effect=create_aeries_assignment) as mock_create_aeries_assignment:
+        assert _join_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                      aeries_data=aeries_data) == {
+            '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=8, grade=3),
+                        AssignmentPatchData(student_num=1000, assignment_number=9, grade=4)]
+        }
+
+        mock_create_aeries_assignment.assert_has_calls([
+            call(gradebook_number='12345', assignment_id=8, assignment_name='hw1', point_total=5,
+                 category=ANY, end_term_date=ANY),
+            call(gradebook_number='12345', assignment_id=9, assignment_name='hw2', point_total=5,
+                 category=ANY, end_term_date=ANY)
+        ], any_order=True)
+
+
+def test_join_google_classroom_and_aeries_data_skips_unchanged_assignments():
+    google_classroom_data = GoogleClassroomData(periods=[1], classroom_service=Mock())
+    google_classroom_data.periods_to_assignments = {
+        1: [GoogleClassroomAssignment(submissions={1: 3}, assignment_name='hw1', point_total=5, category='Practice'),
+            GoogleClassroomAssignment(submissions={1: 4}, assignment_name='hw2', point_total=5, category='Practice')]
+    }
+    google_classroom_data.periods_to_changed_assignment_names = {1: {'hw2'}}
+
+    aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F'}
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 1000}}
+    aeries_data.periods_to_assignment_information = {
+        1: {'hw1': AeriesAssignmentData(id=1, point_total=5, category='Practice'),
+            'hw2': AeriesAssignmentData(id=2, point_total=5, category='Practice')}
+    }
+    aeries_data.periods_to_assignment_submissions = {1: {1: {1000: '2'}, 2: {1000: '2'}}}
+    aeries_data.periods_to_gradebook_information = {
+        1: AeriesClassroomData(categories={'Practice': AeriesCategory(id=1, name='Practice', weight=1.0)},
+                               end_term_dates={'F': Arrow(2022, 1, 22)})
+    }
+
+    assert _join_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                  aeries_data=aeries_data) == {
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=2, grade=4)]
+    }
+
+
+def _mirror_test_data() -> tuple[GoogleClassroomData, AeriesData]:
+    google_classroom_data = GoogleClassroomData(periods=[1], classroom_service=Mock())
+    google_classroom_data.periods_to_assignments = {
+        1: [GoogleClassroomAssignment(submissions={1: 5, 2: 0}, assignment_name='hw1', point_total=5,
+                                      category='Practice')]
+    }
+
+    aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F'}
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 1000, 2: 2000}}
+    aeries_data.periods_to_assignment_information = {
+        1: {'hw1': AeriesAssignmentData(id=1, point_total=5, category='Practice')}
+    }
+    aeries_data.periods_to_assignment_submissions = {1: {1: {1000: '5', 2000: 'MI'}}}
+    aeries_data.periods_to_gradebook_information = {
+        1: AeriesClassroomData(categories={'Practice': AeriesCategory(id=1, name='Practice', weight=1.0)},
+                               end_term_dates={'F': Arrow(2022, 1, 22)})
+    }
+    return google_classroom_data, aeries_data
+
+
+@mark.parametrize('change,differs', (
+        (lambda google_classroom_data, aeries_data: None, False),
+        (lambda google_classroom_data, aeries_data:
+         aeries_data.periods_to_assignment_submissions[1][1].update({1000: '4'}), True),
+        (lambda google_classroom_data, aeries_data: aeries_data.periods_to_assignment_information[1].clear(), True),
+        (lambda google_classroom_data, aeries_data: aeries_data.periods_to_assignment_information[1].update(
+            {'hw1': AeriesAssignmentData(id=1, point_total=10, category='Practice')}), True),
+        (lambda google_classroom_data, aeries_data:
+         google_classroom_data.periods_to_assignments[1][0].submissions.update({3: 2}), True)
+))
+def test_period_differs_from_aeries(change, differs):
+    google_classroom_data, aeries_data = _mirror_test_data()
+    change(google_classroom_data, aeries_data)
+
+    assert _period_differs_from_aeries(google_classroom_data=google_classroom_data,
+                                       aeries_data=aeries_data,
+                                       period=1) == differs
+
+
+def test_fetch_with_gradebook_mirror_reads_only_changed_periods():
+    google_classroom_data, mirrored_aeries_data = _mirror_test_data()
+    google_classroom_data.periods = [1, 2]
+    google_classroom_data.periods_to_assignments[2] = [
+        GoogleClassroomAssignment(submissions={3: 7}, assignment_name='quiz', point_total=10, category='Practice')
+    ]
+    google_classroom_data.get_submissions = Mock()
+
+    def load_aeries_data(aeries_data, periods):
+        for attribute in ('periods_to_gradebook_ids', 'periods_to_student_ids_to_student_nums',
+                          'periods_to_assignment_information', 'periods_to_assignment_submissions'):
+            getattr(aeries_data, attribute).update(getattr(mirrored_aeries_data, attribute))
+        aeries_data.periods_to_gradebook_ids[2] = '67890/F'
+        aeries_data.periods_to_student_ids_to_student_nums[2] = {3: 3000}
+        aeries_data.periods_to_assignment_information[2] = {
+            'quiz': AeriesAssignmentData(id=4, point_total=10, category='Practice')
+        }
+        # The mirrored score is out of date
+        aeries_data.periods_to_assignment_submissions[2] = {4: {3000: '6'}}
+        return [1, 2]
+
+    gradebook_mirror = Mock()
+    gradebook_mirror.load_aeries_data.side_effect = load_aeries_data
+    gradebook_mirror.is_full_verify_due.return_value = False
+
+    read_aeries_data = AeriesData(periods=[2], s_cookie='s_cookie')
+    read_aeries_data.periods_to_gradebook_ids = {2: '67890/F'}
+    read_aeries_data.periods_to_student_ids_to_student_nums = {2: {3: 3000}}
+    read_aeries_data.periods_to_assignment_information = {
+        2: {'quiz': AeriesAssignmentData(id=4, point_total=10, category='Practice')}
+    }
+    read_aeries_data.periods_to_assignment_submissions = {2: {4: {3000: '7'}}}
+    read_aeries_data.periods_to_gradebook_information = {2: Mock()}
+    create_aeries_data = Mock(return_value=read_aeries_data)
+
+    aeries_data = AeriesData(periods=[1, 2], s_cookie='s_cookie')
+    with patch('importer._fetch_aeries_data') as mock_fetch_aeries_data, \
+            patch.object(aeries_data, 'extract_gradebook_ids_from_html') as mock_extract_gradebook_ids_from_html:
+        _fetch_with_gradebook_mirror(google_classroom_data=google_classroom_data,
+                                     aeries_data=aeries_data,
+                                     create_aeries_data=create_aeries_data,
+                                     gradebook_mirror=gradebook_mirror)
+
+    google_classroom_data.get_submissions.assert_called_once()
+    mock_extract_gradebook_ids_from_html.assert_called_once_with()
+    create_aeries_data.assert_called_once_with(periods=[2])
+    mock_fetch_aeries_data.assert_called_once_with(aeries_data=read_aeries_data, cancel_event=ANY)
+    assert aeries_data.periods_to_assignment_submissions == {1: {1: {1000: '5', 2000: 'MI'}}, 2: {4: {3000: '7'}}}
+    gradebook_mirror.save_aeries_data.assert_called_once_with(aeries_data=aeries_data, periods=[2])
+
+
+def test_fetch_with_gradebook_mirror_read_period_sends_request_verification_token():
+    google_classroom_data, mirrored_aeries_data = _mirror_test_data()
+    google_classroom_data.get_submissions = Mock()
+    # hw2 is new, so period 1 is read from Aeries and hw2 is created
+    google_classroom_data.periods_to_assignments[1].append(
+        GoogleClassroomAssignment(submissions={1: 3}, assignment_name='hw2', point_total=5, category='Practice')
+    )
+    gradebook_mirror = Mock()
+    gradebook_mirror.load_aeries_data.return_value = []
+
+    mirrored_aeries_data.request_verification_token = 'request_verification_token'
+    create_aeries_data = Mock(return_value=mirrored_aeries_data)
+
+    with patch('aeries_utils.requests.Session'):
+        aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
+    with patch('importer._fetch_aeries_data'), patch.object(aeries_data, 'extract_gradebook_ids_from_html'):
+        _fetch_with_gradebook_mirror(google_classroom_data=google_classroom_data,
+                                     aeries_data=aeries_data,
+                                     create_aeries_data=create_aeries_data,
+                                     gradebook_mirror=gradebook_mirror)
+
+    with patch.object(aeries_data, '_get_form_request_verification_token', return_value='form_token'):
+        aeries_data.session.post.return_value.status_code = 200
+        _get_or_create_aeries_assignment(google_classroom_assignment=google_classroom_data.periods_to_assignments[1][1],
+                                         aeries_data=aeries_data,
+                                         period=1,
+                                         allocator=AssignmentNumberAllocator())
+
+    assert aeries_data.session.post.call_args.kwargs['headers']['Cookie'] == \
+        '__RequestVerificationToken_L3RlYWNoZXI1=request_verification_token; s=s_cookie'
+
+
+def test_fetch_with_gradebook_mirror_unchanged():
+    google_classroom_data, mirrored_aeries_data = _mirror_test_data()
+    google_classroom_data.get_submissions = Mock()
+    gradebook_mirror = Mock()
+    gradebook_mirror.load_aeries_data.return_value = [1]
+    gradebook_mirror.is_full_verify_due.return_value = False
+    create_aeries_data = Mock()
+
+    with patch('importer._fetch_aeries_data') as mock_fetch_aeries_data, \
+            patch.object(mirrored_aeries_data, 'extract_gradebook_ids_from_html'):
+        _fetch_with_gradebook_mirror(google_classroom_data=google_classroom_data,
+                                     aeries_data=mirrored_aeries_data,
+                                     create_aeries_data=create_aeries_data,
+                                     gradebook_mirror=gradebook_mirror)
+
+    create_aeries_data.assert_not_called()
+    mock_fetch_aeries_data.assert_not_called()
+    gradebook_mirror.save_aeries_data.assert_not_called()
+
+
+def test_fetch_with_gradebook_mirror_reads_periods_due_a_full_verify():
+    google_classroom_data, mirrored_aeries_data = _mirror_test_data()
+    google_classroom_data.get_submissions = Mock()
+    # Matches the mirror, but its last full verify is stale
+    gradebook_mirror = Mock()
+    gradebook_mirror.load_aeries_data.return_value = [1]
+    gradebook_mirror.is_full_verify_due.return_value = True
+
+    read_aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
+    read_aeries_data.periods_to_gradebook_ids = {1: '12345/F'}
+    read_aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 1000, 2: 2000}}
+    read_aeries_data.periods_to_assignment_information = {
+        1: {'hw1': AeriesAssignmentData(id=1, point_total=5, category='Practice')}
+    }
+    # Edited in Aeries since the mirror was saved
+    read_aeries_data.periods_to_assignment_submissions = {1: {1: {1000: '4', 2000: 'MI'}}}
+    read_aeries_data.periods_to_gradebook_information = {1: Mock()}
+    create_aeries_data = Mock(return_value=read_aeries_data)
+
+    with patch('importer._fetch_aeries_data') as mock_fetch_aeries_data, \
+            patch.object(mirrored_aeries_data, 'extract_gradebook_ids_from_html'):
+        _fetch_with_gradebook_mirror(google_classroom_data=google_classroom_data,
+                                     aeries_data=mirrored_aeries_data,
+                                     create_aeries_data=create_aeries_data,
+                                     gradebook_mirror=gradebook_mirror)
+
+    gradebook_mirror.is_full_verify_due.assert_called_once_with(gradebook_id='12345/F')
+    create_aeries_data.assert_called_once_with(periods=[1])
+    mock_fetch_aeries_data.assert_called_once_with(aeries_data=read_aeries_data, cancel_event=ANY)
+    assert mirrored_aeries_data.periods_to_assignment_submissions == {1: {1: {1000: '4', 2000: 'MI'}}}
+
+
+def test_write_and_validate_grades_updates_gradebook_mirror():
+    google_classroom_data = Mock()
+    aeries_data = Mock()
+    aeries_data.periods_to_gradebook_ids = {1: '12345/F', 2: '67890/F'}
+    succeeded = {'12345/F': [AssignmentPatchData(student_num=1000, assignment_number=1, grade=5)]}
+    grade_update_summary = GradeUpdateSummary(succeeded=succeeded, failed=[])
+    aeries_data.update_grades_in_aeries.return_value = grade_update_summary
+    gradebook_mirror = Mock()
+    # Period 2 is due a full verify
+    gradebook_mirror.get_assignment_fingerprints.side_effect = \
+        lambda gradebook_id: {'hw1': 'fingerprint'} if gradebook_id == '12345/F' else None
+
+    with patch('importer._join_google_classroom_and_aeries_data', return_value={}) as mock_join:
+        with patch('importer._record_assignment_fingerprints') as mock_record_assignment_fingerprints:
+            with patch('importer.Validator'):
+                _write_and_validate_grades(google_classroom_data=google_classroom_data,
+                                           aeries_data=aeries_data,
+                                           periods=[1, 2],
+                                           spot_check_sample_size=3,
+                                           gradebook_mirror=gradebook_mirror)
+
+    mock_join.assert_called_once_with(google_classroom_data=google_classroom_data,
+                                      aeries_data=aeries_data,
+                                      allocator=None,
+                                      gradebook_ids_to_fingerprints={'12345/F': {'hw1': 'fingerprint'}})
+    mock_record_assignment_fingerprints.assert_called_once_with(
+        google_classroom_data=google_classroom_data,
+        aeries_data=aeries_data,
+        periods=[1, 2],
+        grade_update_summary=grade_update_summary,
+        gradebook_mirror=gradebook_mirror,
+        gradebook_ids_to_fingerprints={'12345/F': {'hw1': 'fingerprint'}}
+    )
+    gradebook_mirror.save_aeries_data.assert_called_once_with(aeries_data=aeries_data, periods=[1, 2])
+
+
+def test_join_google_classroom_and_aeries_data_skips_fingerprinted_assignments():
+    google_classroom_data, aeries_data = _mirror_test_data()
+    google_classroom_data.periods_to_assignments[1].append(
+        GoogleClassroomAssignment(submissions={1: 2, 2: 3}, assignment_name='hw2', point_total=5, category='Practice')
+    )
+    aeries_data.periods_to_assignment_information[1]['hw2'] = AeriesAssignmentData(id=2, point_total=5,
+                                                                                   category='Practice')
+    # Both assignments differ from Aeries, but hw1 is unchanged since it was last imported
+    aeries_data.periods_to_assignment_submissions[1] = {1: {1000: '1', 2000: '1'}, 2: {1000: '1', 2000: '1'}}
+    hw1 = google_classroom_data.periods_to_assignments[1][0]
+
+    assert _join_google_classroom_and_aeries_data(
+        google_classroom_data=google_classroom_data,
+        aeries_data=aeries_data,
+        gradebook_ids_to_fingerprints={'12345/F': {'hw1': hw1.fingerprint(), 'hw2': 'stale'}}
+    ) == {'12345/F': [AssignmentPatchData(student_num=1000, assignment_number=2, grade=2),
+                      AssignmentPatchData(student_num=2000, assignment_number=2, grade=3)]}
+
+    # Without fingerprints for the gradebook, every assignment is compared
+    assert len(_join_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                                      aeries_data=aeries_data,
+                                                      gradebook_ids_to_fingerprints={})['12345/F']) == 4
+
+
+@mark.parametrize('aeries_assignments', ({}, {'hw1': AeriesAssignmentData(id=1, point_total=10, category='Practice')}))
+def test_join_google_classroom_and_aeries_data_compares_fingerprinted_assignments_changed_in_aeries(
+        aeries_assignments):
+    google_classroom_data, aeries_data = _mirror_test_data()
+    # hw1 is unchanged since it was last imported, but was then deleted or edited in Aeries
+    aeries_data.periods_to_assignment_information[1] = aeries_assignments
+    hw1 = google_classroom_data.periods_to_assignments[1][0]
+    assignment_writes = []
+
+    _join_google_classroom_and_aeries_data(google_classroom_data=google_classroom_data,
+                                           aeries_data=aeries_data,
+                                           gradebook_ids_to_fingerprints={'12345/F': {'hw1': hw1.fingerprint()}},
+                                           assignment_writes=assignment_writes)
+
+    assert [assignment_write.assignment_name for assignment_write in assignment_writes] == ['hw1']
+    assert aeries_data.periods_to_assignment_information[1]['hw1'].point_total == 5
+
+
+def test_record_assignment_fingerprints():
+    google_classroom_data, aeries_data = _mirror_test_data()
+    google_classroom_data.periods_to_assignments[1].append(
+        GoogleClassroomAssignment(submissions={1: 2}, assignment_name='hw2', point_total=5, category='Practice')
+    )
+    aeries_data.periods_to_assignment_information[1]['hw2'] = AeriesAssignmentData(id=2, point_total=5,
+                                                                                   category='Practice')
+    # hw3 is not in the Aeries gradebook
+    google_classroom_data.periods_to_assignments[1].append(
+        GoogleClassroomAssignment(submissions={1: 4}, assignment_name='hw3', point_total=5, category='Practice')
+    )
+    grade_update_summary = GradeUpdateSummary(succeeded={}, failed=[
+        GradeUpdateFailure(gradebook_id='12345/F',
+                           patch_data=AssignmentPatchData(student_num=1000, assignment_number=2, grade=2),
+                           reason='500')
+    ])
+    gradebook_mirror = Mock()
+
+    _record_assignment_fingerprints(google_classroom_data=google_classroom_data,
+                                    aeries_data=aeries_data,
+                                    periods=[1],
+                                    grade_update_summary=grade_update_summary,
+                                    gradebook_mirror=gradebook_mirror,
+                                    gradebook_ids_to_fingerprints={})
+
+    # hw2 had a failed grade update and hw3 is missing from Aeries, so they are compared to Aeries again next time
+    gradebook_mirror.record_assignment_fingerprints.assert_called_once_with(
+        gradebook_id='12345/F',
+        assignment_names_to_fingerprints={'hw1': google_classroom_data.periods_to_assignments[1][0].fingerprint()},
+        full_verify=True
+    )
+
+
+@mark.parametrize('failed,committed', (([], True),
+                                       ([GradeUpdateFailure(gradebook_id='12345/F', patch_data=Mock(), reason='500')],
+                                        False)))
+def test_write_and_validate_grades_commits_sync_state_after_success(failed, committed):
+    google_classroom_data = Mock()
+    aeries_data = Mock()
+    aeries_data.update_grades_in_aeries.return_value = GradeUpdateSummary(succeeded={}, failed=failed)
+
+    with patch('importer._join_google_classroom_and_aeries_data', return_value={}):
+        with patch('importer.Validator'):
+            _write_and_validate_grades(google_classroom_data=google_classroom_data,
+                                       aeries_data=aeries_data,
+                                       periods=[1],
+                                       spot_check_sample_size=3)
+
+    assert google_classroom_data.commit_sync_state.called == committed
+
+
+def test_assignment_number_allocator_reserves_contiguous_blocks():
+    allocator = AssignmentNumberAllocator()
+
+    assert allocator.reserve(gradebook_id='12345/F', existing_numbers=[1, 5, 3],
+                             assignment_names=['hw1', 'hw2']) == {'hw1': 6, 'hw2': 7}
+    assert allocator.reserve(gradebook_id='23456/S', existing_numbers=[],
+                             assignment_names=['hw1']) == {'hw1': 1}
+    # Numbers already handed out are not reused, even if the caller has not seen those assignments yet
+    assert allocator.reserve(gradebook_id='12345/F', existing_numbers=[1, 5, 3],
+                             assignment_names=['hw3']) == {'hw3': 8}
+
+
+def test_assignment_number_allocator_retry_reuses_reservation():
+    allocator = AssignmentNumberAllocator()
+
+    assert allocator.reserve(gradebook_id='12345/F', existing_numbers=[1],
+                             assignment_names=['hw1', 'hw2']) == {'hw1': 2, 'hw2': 3}
+    assert allocator.reserve(gradebook_id='12345/F', existing_numbers=[1],
+                             assignment_names=['hw2']) == {'hw2': 3}
+    assert allocator.reserve(gradebook_id='12345/F', existing_numbers=[1, 2, 3],
+                             assignment_names=['hw2', 'hw4']) == {'hw2': 3, 'hw4': 4}
+
+
 @mark.parametrize('google_classroom_submissions,aeries_submissions,student_ids_to_student_nums,'
                   'expected_assignment_patch_data', (
                           ({1: None, 2: None}, {1000: '', 2000: '10', 3000: 'MI'}, {1: 1000, 2: 2000, 3: 3000},
@@ -746,27 +1668,26 @@ def test_get_or_create_aeries_assignment_exception():
                                                    assignment_number=80,
                                                    grade=20)
                            ])))
-def test_generate_patch_data_for_assignment(google_classroom_submissions,
-                                            aeries_submissions,
-                                            student_ids_to_student_nums,
-                                            expected_assignment_patch_data):
+def test_generate_patch_data_for_period(google_classroom_submissions,
+                                        aeries_submissions,
+                                        student_ids_to_student_nums,
+                                        expected_assignment_patch_data):
     google_classroom_data = GoogleClassroomData(periods=[1], classroom_service=Mock())
     aeries_data = AeriesData(periods=[1], s_cookie='s_cookie')
     aeries_data.periods_to_student_ids_to_student_nums = {1: student_ids_to_student_nums}
     aeries_data.periods_to_assignment_submissions = {1: {80: aeries_submissions}}
 
-    assignment_patch_data = _generate_patch_data_for_assignment(
+    assignment_patch_data = _generate_patch_data_for_period(
         google_classroom_data=google_classroom_data,
-        google_classroom_submissions=google_classroom_submissions,
+        assignment_submissions=[(80, google_classroom_submissions)],
         aeries_data=aeries_data,
-        aeries_assignment_id=80,
         period=1
     )
 
     assert assignment_patch_data == expected_assignment_patch_data
 
 
-def test_generate_patch_data_for_assignment_exception():
+def test_generate_patch_data_for_period_exception():
     google_classroom_submissions = {
         1000: 10,
         2: None
@@ -792,10 +1713,9 @@ def test_generate_patch_data_for_assignment_exception():
     with raises(ValueError, match='Student John Doe found in Google Classroom who is not enrolled in the Aeries '
                                   'roster. Please check Aeries if they need to added to the class, or if they '
                                   'should be dropped from the Google Classroom roster.'):
-        _generate_patch_data_for_assignment(
+        _generate_patch_data_for_period(
             google_classroom_data=google_classroom_data,
-            google_classroom_submissions=google_classroom_submissions,
+            assignment_submissions=[(80, google_classroom_submissions)],
             aeries_data=aeries_data,
-            aeries_assignment_id=80,
             period=1
         )
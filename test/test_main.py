@@ -1,11 +1,13 @@
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 
 from click import BadOptionUsage
 from click.testing import CliRunner
 from pytest import mark, raises
 
 from aeries_utils import AeriesData
-from main import run_aeries_importer, _split_periods
+from html_parsing import DEFAULT_HTML_PARSER
+from main import run_aeries_importer, _build_classroom_service, _split_periods, apply_aeries_import, \
+    plan_aeries_import
 
 
 @mark.parametrize('periods', ('1,2,3,', '', ',1,2,3', '7', '0', '-1', '1,7'))
@@ -27,17 +29,93 @@ def test_run_aeries_importer():
     mock_classroom_service = Mock()
 
     with patch('main.authenticate', return_value=mock_credentials) as mock_authenticate:
-        with patch('main.build', return_value=mock_classroom_service) as mock_build:
+        with patch('main._build_classroom_service', return_value=mock_classroom_service) as mock_build:
             # with patch('main.get_aeries_cookie', return_value='cookie') as mock_get_aeries_cookie:
-            with patch('main.run_import') as mock_run_import:
+            with patch('importer.run_import') as mock_run_import:
                 CliRunner().invoke(run_aeries_importer,
                                    args=['--periods', '1,2,3', '--s-cookie', 'cookie'],
                                    catch_exceptions=False)
                 mock_authenticate.assert_called_once()
-                mock_build.assert_called_once_with(serviceName='classroom',
-                                                   version='v1',
-                                                   credentials=mock_credentials)
+                mock_build.assert_called_once_with(credentials=mock_credentials)
                 # mock_get_aeries_cookie.assert_called_once()
                 mock_run_import.assert_called_once_with(classroom_service=mock_classroom_service,
                                                         s_cookie='cookie',
-                                                        periods=[1, 2, 3])
+                                                        periods=[1, 2, 3],
+                                                        max_workers=6,
+                                                        max_write_workers=8,
+                                                        html_parser=DEFAULT_HTML_PARSER,
+                                                        spot_check_sample_size=3,
+                                                        max_student_workers=12,
+                                                        pipeline=False,
+                                                        batch_classroom_requests=False,
+                                                        classroom_field_masks=True,
+                                                        returned_grades_only=False,
+                                                        roster_cache_path=None,
+                                                        roster_cache_ttl_seconds=86400,
+                                                        sync_state_path=None,
+                                                        create_classroom_service=ANY,
+                                                        max_classroom_workers=4,
+                                                        aeries_read_backend='html',
+                                                        gradebook_mirror_path=None,
+                                                        full_verify_interval_seconds=604800,
+                                                        write_journal_path=None,
+                                                        resume=False)
+
+
+def test_plan_aeries_import():
+    mock_classroom_service = Mock()
+
+    with patch('main.authenticate'):
+        with patch('main._build_classroom_service', return_value=mock_classroom_service):
+            with patch('importer.run_plan') as mock_run_plan:
+                CliRunner().invoke(plan_aeries_import,
+                                   args=['--periods', '1,2', '--s-cookie', 'cookie', '--plan', 'plan.json'],
+                                   catch_exceptions=False)
+
+    mock_run_plan.assert_called_once_with(classroom_service=mock_classroom_service,
+                                          periods=[1, 2],
+                                          s_cookie='cookie',
+                                          plan_path='plan.json',
+                                          max_workers=6,
+                                          html_parser=DEFAULT_HTML_PARSER,
+                                          batch_classroom_requests=False,
+                                          classroom_field_masks=True,
+                                          returned_grades_only=False,
+                                          roster_cache_path=None,
+                                          roster_cache_ttl_seconds=86400,
+                                          aeries_read_backend='html')
+
+
+def test_apply_aeries_import(tmp_path):
+    plan_path = tmp_path / 'plan.json'
+    plan_path.write_text('{}')
+
+    with patch('main.authenticate') as mock_authenticate:
+        with patch('importer.run_apply') as mock_run_apply:
+            CliRunner().invoke(apply_aeries_import,
+                               args=['--plan', str(plan_path), '--s-cookie', 'cookie'],
+                               catch_exceptions=False)
+
+    # Applying a plan does not touch Google Classroom
+    mock_authenticate.assert_not_called()
+    mock_run_apply.assert_called_once_with(plan_path=str(plan_path),
+                                           s_cookie='cookie',
+                                           max_write_workers=8,
+                                           html_parser=DEFAULT_HTML_PARSER,
+                                           write_journal_path=None)
+
+
+def test_build_classroom_service():
+    mock_credentials = Mock()
+
+    with patch('googleapiclient.discovery.build_from_document') as mock_build_from_document:
+        with patch('google_auth_httplib2.AuthorizedHttp') as mock_authorized_http:
+            assert _build_classroom_service(credentials=mock_credentials) is mock_build_from_document.return_value
+            assert _build_classroom_service(credentials=mock_credentials) is mock_build_from_document.return_value
+
+            mock_authorized_http.assert_called_with(mock_credentials, http=ANY)
+            # Every service is built from the bundled discovery document, which is only parsed once
+            first_call, second_call = mock_build_from_document.call_args_list
+            assert first_call.args[0]['name'] == 'classroom'
+            assert first_call.args[0] is second_call.args[0]
+            assert first_call.kwargs == {'http': mock_authorized_http.return_value}
@@ -0,0 +1,72 @@
+import json
+
+from arrow import Arrow
+from pytest import raises
+
+from aeries_utils import ASSIGNMENT_CREATE, ASSIGNMENT_PATCH, AeriesCategory, AssignmentPatchData, AssignmentWrite
+from patch_plan import PatchPlan, PlannedAssignmentWrite, PlannedGradeWrite, load_patch_plan, save_patch_plan
+
+PATCH_PLAN = PatchPlan(
+    periods=[1, 2],
+    assignment_writes=[
+        PlannedAssignmentWrite(
+            assignment_write=AssignmentWrite(action=ASSIGNMENT_CREATE, gradebook_number='12345', assignment_id=24,
+                                             assignment_name='hw1', point_total=5,
+                                             category=AeriesCategory(name='Practice', weight=40.0, id=1),
+                                             end_term_date=Arrow(2023, 2, 24)),
+            old_point_total=None,
+            old_category=None
+        ),
+        PlannedAssignmentWrite(
+            assignment_write=AssignmentWrite(action=ASSIGNMENT_PATCH, gradebook_number='67890', assignment_id=4,
+                                             assignment_name='quiz', point_total=20,
+                                             category=AeriesCategory(name='Performance', weight=60.0, id=2),
+                                             end_term_date=Arrow(2023, 2, 24)),
+            old_point_total=10,
+            old_category='Practice'
+        )
+    ],
+    grade_writes=[
+        PlannedGradeWrite(gradebook_id='12345/F',
+                          patch_data=AssignmentPatchData(student_num=1000, assignment_number=24, grade=5),
+                          old_score=None),
+        PlannedGradeWrite(gradebook_id='67890/F',
+                          patch_data=AssignmentPatchData(student_num=3000, assignment_number=4, grade=None),
+                          old_score='MI'),
+        PlannedGradeWrite(gradebook_id='12345/F',
+                          patch_data=AssignmentPatchData(student_num=2000, assignment_number=24, grade=0),
+                          old_score='')
+    ]
+)
+
+
+def test_patch_plan_round_trip(tmp_path):
+    path = str(tmp_path / 'plan.json')
+    save_patch_plan(patch_plan=PATCH_PLAN, path=path)
+
+    loaded_patch_plan = load_patch_plan(path=path)
+
+    assert loaded_patch_plan.periods == PATCH_PLAN.periods
+    assert loaded_patch_plan.assignment_writes == PATCH_PLAN.assignment_writes
+    # Grade writes are grouped by gradebook
+    assert loaded_patch_plan.grade_writes == [PATCH_PLAN.grade_writes[0], PATCH_PLAN.grade_writes[2],
+                                              PATCH_PLAN.grade_writes[1]]
+    with open(path) as plan_file:
+        assert json.load(plan_file)['grade_writes'] == {'12345/F': [[24, 1000, None, 5], [24, 2000, '', 0]],
+                                                        '67890/F': [[4, 3000, 'MI', None]]}
+
+
+def test_patch_plan_get_assignment_patch_data():
+    assert PATCH_PLAN.get_assignment_patch_data() == {
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5),
+                    AssignmentPatchData(student_num=2000, assignment_number=24, grade=0)],
+        '67890/F': [AssignmentPatchData(student_num=3000, assignment_number=4, grade=None)]
+    }
+
+
+def test_load_patch_plan_unsupported_version(tmp_path):
+    path = tmp_path / 'plan.json'
+    path.write_text('{"version": 99}')
+
+    with raises(ValueError, match='is not a version 1 patch plan'):
+        load_patch_plan(path=str(path))
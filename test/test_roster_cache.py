@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from roster_cache import CourseRoster, RosterCache
+
+
+def test_roster_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'roster_cache.json')
+    with patch('roster_cache.time', return_value=1000):
+        roster_cache = RosterCache(path=path, ttl_seconds=60)
+        roster_cache.set_periods_to_course_ids(periods_to_course_ids={1: '10', 2: '20'})
+        roster_cache.set_roster(course_id='10',
+                                user_ids_to_student_ids={'100': 12345, '200': 67890},
+                                student_ids_to_names={12345: 'Alice Bob', 67890: 'Carol Dee'})
+        roster_cache.save()
+
+    with patch('roster_cache.time', return_value=1059):
+        loaded_roster_cache = RosterCache(path=path, ttl_seconds=60)
+        assert loaded_roster_cache.get_periods_to_course_ids(periods=[2, 1]) == {2: '20', 1: '10'}
+        assert loaded_roster_cache.get_roster(course_id='10') == CourseRoster(
+            user_ids_to_student_ids={'100': 12345, '200': 67890},
+            student_ids_to_names={12345: 'Alice Bob', 67890: 'Carol Dee'},
+            fetched_at=1000
+        )
+        assert loaded_roster_cache.get_roster(course_id='20') is None
+
+
+def test_roster_cache_expires_entries(tmp_path):
+    path = str(tmp_path / 'roster_cache.json')
+    with patch('roster_cache.time', return_value=1000):
+        roster_cache = RosterCache(path=path, ttl_seconds=60)
+        roster_cache.set_periods_to_course_ids(periods_to_course_ids={1: 10})
+        roster_cache.set_roster(course_id=10, user_ids_to_student_ids={100: 12345}, student_ids_to_names={})
+        roster_cache.save()
+
+    with patch('roster_cache.time', return_value=1060):
+        loaded_roster_cache = RosterCache(path=path, ttl_seconds=60)
+        assert loaded_roster_cache.get_periods_to_course_ids(periods=[1]) is None
+        assert loaded_roster_cache.get_roster(course_id=10) is None
+
+
+def test_roster_cache_keeps_periods_set_separately(tmp_path):
+    path = str(tmp_path / 'roster_cache.json')
+    roster_cache = RosterCache(path=path, ttl_seconds=60)
+    with patch('roster_cache.time', return_value=1000):
+        roster_cache.set_periods_to_course_ids(periods_to_course_ids={1: 10})
+    with patch('roster_cache.time', return_value=1030):
+        roster_cache.set_periods_to_course_ids(periods_to_course_ids={2: 20})
+    roster_cache.save()
+
+    with patch('roster_cache.time', return_value=1059):
+        loaded_roster_cache = RosterCache(path=path, ttl_seconds=60)
+        assert loaded_roster_cache.get_periods_to_course_ids(periods=[1, 2]) == {1: 10, 2: 20}
+    with patch('roster_cache.time', return_value=1060):
+        assert loaded_roster_cache.get_periods_to_course_ids(periods=[1, 2]) is None
+        assert loaded_roster_cache.get_periods_to_course_ids(periods=[2]) == {2: 20}
+
+
+def test_roster_cache_missing_period():
+    roster_cache = RosterCache()
+    roster_cache.set_periods_to_course_ids(periods_to_course_ids={1: 10})
+
+    assert roster_cache.get_periods_to_course_ids(periods=[1]) == {1: 10}
+    assert roster_cache.get_periods_to_course_ids(periods=[1, 2]) is None
+
+
+def test_roster_cache_without_path_is_not_saved(tmp_path):
+    roster_cache = RosterCache()
+    roster_cache.set_roster(course_id=10, user_ids_to_student_ids={100: 12345}, student_ids_to_names={})
+    roster_cache.save()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_roster_cache_ignores_unreadable_file(tmp_path):
+    path = tmp_path / 'roster_cache.json'
+    path.write_text('{"version": 2, "courses": [{}]}')
+
+    with patch('click.echo') as mock_echo:
+        roster_cache = RosterCache(path=str(path))
+        assert roster_cache.get_periods_to_course_ids(periods=[1]) is None
+        mock_echo.assert_called_once()
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from pytest import mark
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+# Modules too heavy to import at CLI startup. They are imported only once a command actually runs.
+DEFERRED_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'google_auth_httplib2', 'httplib2', 'selenium',
+                    'webdriver_manager', 'bs4', 'curl_cffi', 'lxml', 'arrow', 'numpy', 'importer')
+
+
+def _imported_modules(code: str) -> list[str]:
+    """
+    Runs the code in a fresh interpreter with -X importtime, and returns every module it imported.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=SRC_DIR, capture_output=True, text=True, check=True)
+
+    return [line.split('|')[-1].strip() for line in result.stderr.splitlines()
+            if line.startswith('import time:') and 'cumulative' not in line]
+
+
+def _deferred_modules(imported_modules: list[str]) -> list[str]:
+    return [module for module in imported_modules if module.split('.')[0] in DEFERRED_MODULES]
+
+
+def test_cli_startup_defers_heavy_imports():
+    assert _deferred_modules(imported_modules=_imported_modules(code='import main')) == []
+
+
+@mark.parametrize('command', ('run_aeries_importer', 'plan_aeries_import', 'apply_aeries_import'))
+def test_cli_help_defers_heavy_imports(command):
+    imported_modules = _imported_modules(code=f'import main; main.{command}(["--help"])')
+
+    assert _deferred_modules(imported_modules=imported_modules) == []
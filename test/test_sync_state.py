@@ -0,0 +1,25 @@
+from unittest.mock import patch
+
+from arrow import Arrow
+
+from sync_state import SyncState
+
+
+def test_sync_state_round_trip(tmp_path):
+    path = str(tmp_path / 'sync_state.json')
+    sync_state = SyncState(path=path)
+    assert sync_state.get_watermark(course_id='10') is None
+
+    sync_state.set_watermark(course_id='10', watermark=Arrow(2024, 3, 7, 8, 30, 15, 123000))
+    sync_state.save()
+
+    assert SyncState(path=path).get_watermark(course_id='10') == Arrow(2024, 3, 7, 8, 30, 15, 123000)
+
+
+def test_sync_state_ignores_unreadable_file(tmp_path):
+    path = tmp_path / 'sync_state.json'
+    path.write_text('{"version": 1, "watermarks": [["10", "yesterday"]]}')
+
+    with patch('click.echo') as mock_echo:
+        assert SyncState(path=str(path)).get_watermark(course_id='10') is None
+        mock_echo.assert_called_once()
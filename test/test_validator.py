@@ -22,7 +22,14 @@ def test_validator_generate_discrepancy_report():
             end_term_dates={'S': Arrow(2021, 6, 4), 'F': Arrow(2021, 6, 4)}
         )
     }
-    validator = Validator(periods=periods, google_classroom_data=google_classroom_data, aeries_data=aeries_data)
+    aeries_data.periods_to_student_ids_to_student_nums = {
+        1: {1: 1, 2: 2, 3: 3, 4: 4},
+        2: {1: 1, 2: 2, 3: 3, 4: 4}
+    }
+    validator = Validator(periods=periods,
+                          google_classroom_data=google_classroom_data,
+                          aeries_data=aeries_data,
+                          spot_check_sample_size=1)
 
     mock_google_classroom_grades = {
         1: 90,
@@ -31,7 +38,7 @@ def test_validator_generate_discrepancy_report():
         4: 60
     }
 
-    aeries_data.periods_to_student_ids_to_overall_grades = {
+    local_overall_grades = {
         1: {
             1: 90.15,
             2: 80,
@@ -39,15 +46,35 @@ def test_validator_generate_discrepancy_report():
             4: 69.9
         },
         2: {
-            1: 90.15,
+            1: 90,
             2: 80,
-            3: 100,
-            4: 69.9
+            3: 70
         }
     }
+    fetched_overall_grades = {
+        1: {1: 90.15, 2: 80, 3: 100, 4: 69.9},
+        # Aeries disagrees with the local calculation for student 3
+        2: {2: 80, 3: 71, 4: 60}
+    }
+    aeries_data.periods_to_student_ids_to_overall_grades = {
+        period: dict(student_ids_to_overall_grades)
+        for period, student_ids_to_overall_grades in local_overall_grades.items()
+    }
+
+    def fetch_aeries_overall_grades(periods_to_student_ids):
+        fetched = {period: {student_id: fetched_overall_grades[period][student_id] for student_id in student_ids}
+                   for period, student_ids in periods_to_student_ids.items()}
+        for period, student_ids_to_overall_grades in fetched.items():
+            aeries_data.periods_to_student_ids_to_overall_grades[period].update(student_ids_to_overall_grades)
+        return fetched
+
+    aeries_data.compute_aeries_overall_grades.return_value = local_overall_grades
+    aeries_data.fetch_aeries_overall_grades.side_effect = fetch_aeries_overall_grades
 
-    with patch.object(google_classroom_data, 'get_overall_grades',
-                      return_value=mock_google_classroom_grades) as mock_get_overall_grades:
+    with (patch.object(google_classroom_data, 'get_overall_grades',
+                       return_value=mock_google_classroom_grades) as mock_get_overall_grades,
+          patch('validator.random.sample', side_effect=lambda population, k: population[-k:]) as mock_sample,
+          patch('click.echo') as mock_echo):
         validator.generate_discrepancy_report()
         assert validator.periods_to_student_overall_grade_discrepancies == {
             1: {
@@ -59,12 +86,8 @@ def test_validator_generate_discrepancy_report():
                                            aeries_overall_grade=69.9)
             },
             2: {
-                1: OverallGradeDiscrepancy(google_classroom_overall_grade=90,
-                                           aeries_overall_grade=90.15),
                 3: OverallGradeDiscrepancy(google_classroom_overall_grade=70,
-                                           aeries_overall_grade=100),
-                4: OverallGradeDiscrepancy(google_classroom_overall_grade=60,
-                                           aeries_overall_grade=69.9)
+                                           aeries_overall_grade=71)
             }
         }
 
@@ -72,6 +95,35 @@ def test_validator_generate_discrepancy_report():
             call(period=1, categories_to_weights={'Practice': 0.5, 'Performance': 0.5}),
             call(period=2, categories_to_weights={'Practice': 0.3, 'Participation': 0.7})
         ])
+        aeries_data.compute_aeries_overall_grades.assert_called_once()
+        # Only mismatches, students missing a local grade and the spot-check sample are loaded from Aeries
+        aeries_data.fetch_aeries_overall_grades.assert_called_once_with(periods_to_student_ids={1: [1, 3, 4, 2],
+                                                                                                2: [4, 3]})
+        mock_sample.assert_has_calls([call([2], k=1), call([1, 2, 3], k=1)])
+        mock_echo.assert_called_once_with('Warning: Period 2 student 3 has an overall grade of 71 in Aeries, but 70 '
+                                          'was calculated locally. Using the Aeries grade.')
+
+
+def test_validator_generate_discrepancy_report_no_spot_checks():
+    google_classroom_data = Mock()
+    aeries_data = Mock()
+    aeries_data.periods_to_gradebook_information = {
+        1: AeriesClassroomData(categories={'Practice': AeriesCategory(id=1, name='Practice', weight=1.0)},
+                               end_term_dates={'S': Arrow(2021, 6, 4)})
+    }
+    aeries_data.periods_to_student_ids_to_student_nums = {1: {1: 1, 2: 2}}
+    aeries_data.compute_aeries_overall_grades.return_value = {1: {1: 90, 2: 80}}
+    aeries_data.periods_to_student_ids_to_overall_grades = {1: {1: 90, 2: 80}}
+    google_classroom_data.get_overall_grades.return_value = {1: 90, 2: 80}
+    validator = Validator(periods=[1],
+                          google_classroom_data=google_classroom_data,
+                          aeries_data=aeries_data,
+                          spot_check_sample_size=0)
+
+    validator.generate_discrepancy_report()
+
+    assert validator.periods_to_student_overall_grade_discrepancies == {}
+    aeries_data.fetch_aeries_overall_grades.assert_not_called()
 
 
 def test_log_discrepancies_empty():
@@ -8,10 +8,10 @@ def test_get_aeries_cookie():
     mock_driver = Mock()
 
     aeries_data = Mock()
-    with patch('web_driver.ChromeDriverManager',
+    with patch('webdriver_manager.chrome.ChromeDriverManager',
                return_value=mock_chrome_driver_manager) as mock_chrome_driver_manager_create:
-        with patch('web_driver.webdriver.Chrome', return_value=mock_driver) as mock_webdriver:
-            with patch('web_driver.AeriesData', return_value=aeries_data) as mock_aeries_data_create:
+        with patch('selenium.webdriver.Chrome', return_value=mock_driver) as mock_webdriver:
+            with patch('aeries_utils.AeriesData', return_value=aeries_data) as mock_aeries_data_create:
                 with patch('web_driver.sys') as mock_sys_exit:
                     mock_webdriver.return_value.get_cookie.return_value = {'value': 'cookie'}
                     assert get_aeries_cookie() == 'cookie'
@@ -33,10 +33,10 @@ def test_get_aeries_cookie_invalid_cookie():
     mock_driver = Mock()
 
     aeries_data = Mock()
-    with patch('web_driver.ChromeDriverManager',
+    with patch('webdriver_manager.chrome.ChromeDriverManager',
                return_value=mock_chrome_driver_manager) as mock_chrome_driver_manager_create:
-        with patch('web_driver.webdriver.Chrome', return_value=mock_driver) as mock_webdriver:
-            with patch('web_driver.AeriesData', return_value=aeries_data) as mock_aeries_data_create:
+        with patch('selenium.webdriver.Chrome', return_value=mock_driver) as mock_webdriver:
+            with patch('aeries_utils.AeriesData', return_value=aeries_data) as mock_aeries_data_create:
                 mock_aeries_data_create.return_value.probe.side_effect = AttributeError
                 with patch('web_driver.sys.exit') as mock_sys_exit:
                     mock_webdriver.return_value.get_cookie.return_value = {'value': 'cookie'}
@@ -0,0 +1,109 @@
+from arrow import Arrow
+from pytest import raises
+
+from aeries_utils import ASSIGNMENT_CREATE, AeriesCategory, AssignmentPatchData, AssignmentWrite
+from write_journal import UnacknowledgedWrites, WriteJournal
+
+ASSIGNMENT_WRITE = AssignmentWrite(action=ASSIGNMENT_CREATE, gradebook_number='12345', assignment_id=24,
+                                   assignment_name='hw1', point_total=50,
+                                   category=AeriesCategory(name='Practice', weight=40.0, id=1),
+                                   end_term_date=Arrow(2023, 2, 24))
+
+
+def test_write_journal_resume_returns_unacknowledged_writes(tmp_path):
+    path = str(tmp_path / 'write_journal.jsonl')
+    write_journal = WriteJournal(path=path)
+    write_journal.start()
+    write_journal.plan_assignment_write(assignment_write=ASSIGNMENT_WRITE)
+    write_journal.plan_grade_updates(assignment_patch_data={
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5),
+                    AssignmentPatchData(student_num=2000, assignment_number=24, grade=None)],
+        '67890/F': [AssignmentPatchData(student_num=3000, assignment_number=4, grade=0)]
+    })
+    write_journal.acknowledge_grade_updates(gradebook_id='12345/F',
+                                            patch_datas=[AssignmentPatchData(student_num=1000, assignment_number=24,
+                                                                             grade=5)])
+    write_journal.close()
+
+    assert WriteJournal(path=path).resume() == UnacknowledgedWrites(
+        assignment_writes=[ASSIGNMENT_WRITE],
+        assignment_patch_data={'12345/F': [AssignmentPatchData(student_num=2000, assignment_number=24, grade=None)],
+                               '67890/F': [AssignmentPatchData(student_num=3000, assignment_number=4, grade=0)]}
+    )
+
+
+def test_write_journal_resume_appends(tmp_path):
+    path = str(tmp_path / 'write_journal.jsonl')
+    write_journal = WriteJournal(path=path)
+    write_journal.start()
+    write_journal.plan_assignment_write(assignment_write=ASSIGNMENT_WRITE)
+    write_journal.close()
+
+    resumed_write_journal = WriteJournal(path=path)
+    assert resumed_write_journal.resume().assignment_writes == [ASSIGNMENT_WRITE]
+    resumed_write_journal.acknowledge_assignment_write(assignment_write=ASSIGNMENT_WRITE)
+    resumed_write_journal.close()
+
+    assert WriteJournal(path=path).resume() == UnacknowledgedWrites(assignment_writes=[], assignment_patch_data={})
+
+
+def test_write_journal_replanned_write_stays_unacknowledged(tmp_path):
+    path = str(tmp_path / 'write_journal.jsonl')
+    write_journal = WriteJournal(path=path)
+    write_journal.start()
+    write_journal.plan_grade_updates(assignment_patch_data={
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5)]
+    })
+    write_journal.plan_grade_updates(assignment_patch_data={
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=4)]
+    })
+    # The acknowledgement of the first grade arrives after the second grade was planned
+    write_journal.acknowledge_grade_updates(gradebook_id='12345/F',
+                                            patch_datas=[AssignmentPatchData(student_num=1000, assignment_number=24,
+                                                                             grade=5)])
+    write_journal.close()
+
+    assert WriteJournal(path=path).resume().assignment_patch_data == {
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=4)]
+    }
+
+
+def test_write_journal_ignores_incomplete_last_entry(tmp_path):
+    path = tmp_path / 'write_journal.jsonl'
+    write_journal = WriteJournal(path=str(path))
+    write_journal.start()
+    write_journal.plan_grade_updates(assignment_patch_data={
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5)]
+    })
+    write_journal.close()
+    with open(path, 'a') as journal_file:
+        journal_file.write('{"entry": "acknowledged", "write": "grade_up')
+
+    assert WriteJournal(path=str(path)).resume().assignment_patch_data == {
+        '12345/F': [AssignmentPatchData(student_num=1000, assignment_number=24, grade=5)]
+    }
+
+
+def test_write_journal_unreadable(tmp_path):
+    path = tmp_path / 'write_journal.jsonl'
+    path.write_text('{"version": 1}\nnot json\n{"entry": "planned"}\n')
+    with raises(ValueError, match='unreadable entry on line 2'):
+        WriteJournal(path=str(path)).resume()
+
+    path.write_text('{"version": 99}\n')
+    with raises(ValueError, match='is not a version 1 write journal'):
+        WriteJournal(path=str(path)).resume()
+
+
+def test_write_journal_not_started(tmp_path):
+    with raises(ValueError, match='has not been started or resumed'):
+        WriteJournal(path=str(tmp_path / 'write_journal.jsonl')).plan_assignment_write(
+            assignment_write=ASSIGNMENT_WRITE
+        )
+
+
+def test_write_journal_context_manager_closes(tmp_path):
+    with WriteJournal(path=str(tmp_path / 'write_journal.jsonl')) as write_journal:
+        write_journal.start()
+
+    assert write_journal.journal_file is None